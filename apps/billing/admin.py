@@ -1,4 +1,5 @@
 from django.contrib import admin, messages
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from apps.billing.models import SageX3TransactionInformation, Transaction, TransactionItem
@@ -27,6 +28,28 @@ class TransactionAdmin(admin.ModelAdmin):
 admin.site.register(Transaction, TransactionAdmin)
 
 
+class RetryListFilter(admin.SimpleListFilter):
+    """
+    Filter the transactions by their automatic retry.
+    """
+
+    title = _("automatic retry")
+    parameter_name = "retry"
+
+    def lookups(self, request, model_admin):
+        return (
+            ("due", _("Due")),
+            ("scheduled", _("Scheduled")),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == "due":
+            return queryset.filter(next_retry_at__lte=timezone.now())
+        if self.value() == "scheduled":
+            return queryset.filter(next_retry_at__gt=timezone.now())
+        return queryset
+
+
 class SageX3TransactionInformationAdmin(admin.ModelAdmin):
     list_display = (
         "transaction",
@@ -35,18 +58,31 @@ class SageX3TransactionInformationAdmin(admin.ModelAdmin):
     )
     list_filter = [
         "status",
+        RetryListFilter,
     ]
     search_fields = (
         "transaction_id",
         "status",
     )
+    # the xml payloads are stored compressed or archived on the storage, so they are shown as read
+    readonly_fields = (
+        "input_xml",
+        "output_xml",
+        "payload_archive_key",
+    )
 
     @admin.action(description="Retry to SageX3")
     def retry_sage_transaction(self, request, queryset):
-        for sageX3TransactionInformation in queryset:
-            transaction = sageX3TransactionInformation.transaction
-            transaction_id = sageX3TransactionInformation.transaction.transaction_id
-            if TransactionService(transaction).run_steps_to_send_transaction():
+        transactions = [
+            sageX3TransactionInformation.transaction
+            for sageX3TransactionInformation in queryset.select_related("transaction").prefetch_related(
+                "transaction__transaction_items"
+            )
+        ]
+        # the selected transactions are sent even if already sent or dead lettered, as asked by the user
+        for result in TransactionService.send_transactions(transactions, force=True):
+            transaction_id = result.item.transaction_id
+            if result.result:
                 self.message_user(
                     request,
                     _(
@@ -65,7 +101,13 @@ class SageX3TransactionInformationAdmin(admin.ModelAdmin):
                     messages.ERROR,
                 )
 
-    actions = [retry_sage_transaction]
+    @admin.action(description="Requeue the dead letters")
+    def requeue_dead_letters(self, request, queryset):
+        transaction_ids = queryset.values_list("transaction__transaction_id", flat=True)
+        count = TransactionService.requeue_dead_letters(transaction_ids=transaction_ids)
+        self.message_user(request, _("%s dead letter transactions were requeued.") % count, messages.SUCCESS)
+
+    actions = [retry_sage_transaction, requeue_dead_letters]
 
 
 admin.site.register(SageX3TransactionInformation, SageX3TransactionInformationAdmin)
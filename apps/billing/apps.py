@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class BillingConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.billing"
+
+    def ready(self):
+        from apps.billing.services.processor_service import SageX3Processor
+        from apps.util.countries import country_names
+
+        # the country names sent on the invoices are resolved on startup, instead of on the first invoice
+        country_names(SageX3Processor.COUNTRY_NAME_LANGUAGE)
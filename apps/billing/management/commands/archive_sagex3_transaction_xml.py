@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from apps.billing.services.payload_archive_service import PayloadArchiveService
+
+
+class Command(BaseCommand):
+    """
+
+    This command archives on the default storage the xml payloads of the transactions sent with success
+    to Sage X3 some days ago, removing them from the database.
+
+    How to use:
+
+        python manage.py archive_sagex3_transaction_xml
+
+        python manage.py archive_sagex3_transaction_xml --age-days=30 --batch-size=1000
+
+    """
+
+    help = "This command will archive the xml payloads of the old transactions sent with success to Sage X3"
+
+    def add_arguments(self, parser):
+        """
+        Add command line arguments to this Django Command.
+        """
+        parser.add_argument(
+            "--age-days",
+            type=int,
+            required=False,
+            help="The days since the transactions were sent, by default the TRANSACTION_PAYLOAD_ARCHIVE_AGE_DAYS",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            required=False,
+            help="The number of transactions on each bundle, by default the TRANSACTION_PAYLOAD_ARCHIVE_BATCH_SIZE",
+        )
+
+    def handle(self, *args, **kwargs) -> None:
+        counters = PayloadArchiveService(age_days=kwargs["age_days"], batch_size=kwargs["batch_size"]).archive()
+        self.stdout.write(
+            f"\n----- {counters['transactions']} Transactions were archived "
+            f"on {counters['bundles']} bundles -----\n"
+        )
@@ -0,0 +1,120 @@
+import timeit
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction as db_transaction
+from django.utils import translation
+
+from apps.billing.models import Transaction, TransactionItem
+from apps.billing.services.processor_service import SageX3Processor
+from apps.util.countries import country_name
+
+
+class Command(BaseCommand):
+    """
+
+    This command measures the cost of generating the `Sage X3` request data of a single invoice,
+    for invoices with a different number of items.
+    It also compares the cost of resolving the Portuguese name of the invoice country
+    with the translation of `django_countries` and with the precomputed country names.
+
+    The transactions used on the benchmark are created inside a database transaction that is rolled back at the end.
+
+    How to use:
+
+        python manage.py benchmark_sagex3_processor
+
+        python manage.py benchmark_sagex3_processor --items 1 10 100 --iterations=1000
+
+    """
+
+    help = "This command will measure the time to generate the Sage X3 request data per invoice"
+
+    def add_arguments(self, parser):
+        """
+        Add command line arguments to this Django Command.
+        """
+        parser.add_argument(
+            "--items",
+            type=int,
+            nargs="+",
+            default=[1, 10, 100],
+            help="The number of items of each benchmarked invoice",
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=1000, help="The number of invoices generated for each number of items"
+        )
+
+    def handle(self, *args, **kwargs) -> str | None:
+        iterations = kwargs["iterations"]
+        # a long-lived processor, as the one used to send the transactions
+        processor = SageX3Processor()
+        with db_transaction.atomic():
+            for items_count in kwargs["items"]:
+                transaction = self._create_transaction(items_count)
+                # the best of a few repetitions, so the noise of the machine doesn't count
+                elapsed = min(timeit.repeat(lambda: processor.generate_data(transaction), number=iterations, repeat=5))
+                self.stdout.write(
+                    f"{items_count} items: {elapsed / iterations * 1_000_000:.1f} µs per invoice "
+                    f"({len(processor.generate_data(transaction))} bytes)\n"
+                )
+            self._benchmark_country_name(transaction.country_code, iterations)
+            db_transaction.set_rollback(True)
+
+    def _benchmark_country_name(self, country, iterations: int) -> None:
+        def translated():
+            with translation.override(SageX3Processor.COUNTRY_NAME_LANGUAGE):
+                return country.name
+
+        def precomputed():
+            return country_name(country, SageX3Processor.COUNTRY_NAME_LANGUAGE)
+
+        results = [
+            min(timeit.repeat(func, number=iterations, repeat=5)) / iterations * 1_000_000
+            for func in (translated, precomputed)
+        ]
+        self.stdout.write(
+            f"country name: {results[0]:.2f} µs per invoice translated, {results[1]:.2f} µs precomputed\n"
+        )
+
+    @staticmethod
+    def _create_transaction(items_count: int) -> Transaction:
+        """
+        Create a transaction with the given number of items and load it with its items,
+        so the benchmark doesn't include the database queries.
+        """
+        transaction = Transaction.objects.create(
+            transaction_id=f"BENCHMARK-{items_count}",
+            client_name="Ana Rosário Maria",
+            email="ana.maria@example.com",
+            address_line_1="Estrada Nacional nº1",
+            address_line_2="Apartado 1",
+            city="Lisboa",
+            postal_code="1000-001",
+            country_code="PT",
+            vat_identification_country="PT",
+            vat_identification_number="123456789",
+            total_amount_exclude_vat=Decimal("81.30") * items_count,
+            total_amount_include_vat=Decimal("100.00") * items_count,
+            transaction_type="credit",
+        )
+        TransactionItem.objects.bulk_create(
+            [
+                TransactionItem(
+                    transaction=transaction,
+                    description=f"Course number {i} & friends",
+                    vat_tax=Decimal("0.23"),
+                    unit_price_excl_vat=Decimal("81.30"),
+                    unit_price_incl_vat=Decimal("100.00"),
+                    organization_code="ORG",
+                    product_id=f"course-v1:ORG+C{i}+2024_T1",
+                    product_code=f"C{i}",
+                )
+                for i in range(items_count)
+            ]
+        )
+        return (
+            Transaction.objects.select_related("sage_x3_transaction_information")
+            .prefetch_related("transaction_items")
+            .get(pk=transaction.pk)
+        )
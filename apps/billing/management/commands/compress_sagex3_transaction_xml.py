@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction as db_transaction
+from django.db.models import Q
+
+from apps.billing.models import SageX3TransactionInformation
+
+
+class Command(BaseCommand):
+    """
+
+    This command compresses the xml payloads of the Sage X3 transactions saved before they were stored
+    compressed, in batches, each one on its own database transaction.
+
+    How to use:
+
+        python manage.py compress_sagex3_transaction_xml
+
+        python manage.py compress_sagex3_transaction_xml --batch-size=1000
+
+    """
+
+    help = "This command will compress the xml payloads of the Sage X3 transactions stored as text"
+
+    def add_arguments(self, parser):
+        """
+        Add command line arguments to this Django Command.
+        """
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="The number of transactions compressed on each batch"
+        )
+
+    def handle(self, *args, **kwargs) -> None:
+        batch_size = kwargs["batch_size"]
+        text_fields = [f"{payload}_text" for payload in SageX3TransactionInformation.PAYLOADS]
+        not_compressed = Q()
+        for field in text_fields:
+            not_compressed |= Q(**{f"{field}__isnull": False})
+
+        last_pk = 0
+        counters = {"transactions": 0, "text_bytes": 0, "compressed_bytes": 0}
+        while True:
+            with db_transaction.atomic():
+                # the rows are locked so a concurrent send can't have its new payloads overwritten
+                rows = list(
+                    SageX3TransactionInformation.all_objects.select_for_update()
+                    .filter(not_compressed, pk__gt=last_pk)
+                    .order_by("pk")
+                    .only("pk", *text_fields)[:batch_size]
+                )
+                if not rows:
+                    break
+                for payload in SageX3TransactionInformation.PAYLOADS:
+                    self.__compress(rows, payload, counters)
+            last_pk = rows[-1].pk
+            counters["transactions"] += len(rows)
+            self.stdout.write(f"Compressed {counters['transactions']} transactions...")
+
+        self.stdout.write(
+            f"\n----- {counters['transactions']} Transactions were compressed -----\n"
+            f"\nFrom {counters['text_bytes']} bytes to {counters['compressed_bytes']} bytes\n"
+        )
+
+    @staticmethod
+    def __compress(rows: list[SageX3TransactionInformation], payload: str, counters: dict) -> None:
+        """
+        Compress the `payload` of the rows that have it as text, with a single bulk update.
+        """
+        to_update = []
+        for row in rows:
+            text = getattr(row, f"{payload}_text")
+            if text is None:
+                continue
+            columns = SageX3TransactionInformation.payload_columns(payload, text)
+            for field, value in columns.items():
+                setattr(row, field, value)
+            counters["text_bytes"] += len(text.encode("utf-8"))
+            counters["compressed_bytes"] += len(columns[f"{payload}_compressed"])
+            to_update.append(row)
+        if to_update:
+            SageX3TransactionInformation.all_objects.bulk_update(
+                to_update, [f"{payload}_text", f"{payload}_compressed"]
+            )
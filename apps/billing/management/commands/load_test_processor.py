@@ -0,0 +1,154 @@
+import time
+from decimal import Decimal
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from safedelete import HARD_DELETE
+
+from apps.billing.management.commands.run_stand_in_server import add_stand_in_arguments, stand_in_config
+from apps.billing.models import Transaction, TransactionItem
+from apps.billing.services.receipt_host_service import ReceiptDocumentHost
+from apps.billing.services.transaction_service import TransactionService
+from apps.billing.stand_in_server import StandInServer
+from apps.util.concurrency import percentile, run_concurrently
+
+
+class Command(BaseCommand):
+    """
+
+    This command drives transactions end-to-end against the stand-in server of `Sage X3` and `iLink`:
+    each transaction is sent to `Sage X3` and then its receipt link is requested to `iLink`,
+    reporting the throughput and latency percentiles of each step.
+
+    By default a stand-in server is started on this process, with the given latency, error rate
+    and throughput, use `--url` to run against a server started with the `run_stand_in_server` command.
+    The transactions are created for the test and deleted at the end, unless `--keep` is used.
+
+    How to use:
+
+        python manage.py load_test_processor --transactions=200 --workers=8
+
+        python manage.py load_test_processor --transactions=200 --workers=8 --latency=200 --error-rate=0.05
+
+        python manage.py load_test_processor --url=http://127.0.0.1:8099/
+
+    """
+
+    help = "This command will measure the throughput and latency of sending transactions to a stand-in Sage X3"
+
+    def add_arguments(self, parser):
+        """
+        Add command line arguments to this Django Command.
+        """
+        add_stand_in_arguments(parser)
+        parser.add_argument("--transactions", type=int, default=100, help="The number of transactions to send")
+        parser.add_argument("--items", type=int, default=1, help="The number of items of each transaction")
+        parser.add_argument("--workers", type=int, default=1, help="The number of transactions sent concurrently")
+        parser.add_argument(
+            "--url", type=str, required=False, help="The url of a running stand-in server, by default one is started"
+        )
+        parser.add_argument("--keep", action="store_true", help="Keep the transactions created for the test")
+
+    def handle(self, *args, **kwargs) -> None:
+        server = None
+        url = kwargs["url"]
+        if not url:
+            server = StandInServer(("127.0.0.1", 0), stand_in_config(kwargs))
+            server.start_in_background()
+            url = server.url
+
+        prefix = f"LOAD-TEST-{uuid4().hex[:8]}"
+        transactions = self._create_transactions(prefix, kwargs["transactions"], kwargs["items"])
+        try:
+            with override_settings(TRANSACTION_PROCESSOR_URL=url, RECEIPT_HOST_URL=url):
+                sent = self._run_step(
+                    "SEND",
+                    lambda transaction: TransactionService(transaction).run_steps_to_send_transaction(),
+                    transactions,
+                    kwargs["workers"],
+                )
+                self._run_step(
+                    "RECEIPT",
+                    lambda transaction: ReceiptDocumentHost().get_document(document_id=transaction.document_id),
+                    sent,
+                    kwargs["workers"],
+                )
+        finally:
+            if not kwargs["keep"]:
+                Transaction.all_objects.filter(transaction_id__startswith=prefix).delete(force_policy=HARD_DELETE)
+            if server:
+                server.shutdown()
+                server.server_close()
+                self.stdout.write(f"\nRequests served by the stand-in server: {server.stats}\n")
+
+    def _run_step(self, name: str, func, transactions: list[Transaction], workers: int) -> list[Transaction]:
+        """
+        Run a step for each transaction, reporting its throughput and latencies,
+        and return the transactions whose step has succeeded.
+        """
+        succeeded = []
+        latencies = []
+        start = time.perf_counter()
+        for result in run_concurrently(func, transactions, workers=workers):
+            latencies.append(result.elapsed)
+            if result.exception is None and result.result:
+                succeeded.append(result.item)
+        finish = time.perf_counter() - start
+
+        latencies.sort()
+        throughput = len(latencies) / finish if finish else 0.0
+        self.stdout.write(
+            f"\n{name}: {len(succeeded)} succeeded {len(latencies) - len(succeeded)} failed "
+            f"THROUGHPUT: {throughput:.2f} tx/s "
+            + " ".join(f"p{p}: {percentile(latencies, p) * 1000:.0f} ms" for p in (50, 95, 99))
+            + "\n"
+        )
+        return succeeded
+
+    @staticmethod
+    def _create_transactions(prefix: str, count: int, items_count: int) -> list[Transaction]:
+        """
+        Create the transactions of the test and load them with their items.
+        """
+        Transaction.objects.bulk_create(
+            [
+                Transaction(
+                    transaction_id=f"{prefix}-{i}",
+                    client_name="Ana Rosário Maria",
+                    email="ana.maria@example.com",
+                    address_line_1="Estrada Nacional nº1",
+                    city="Lisboa",
+                    postal_code="1000-001",
+                    country_code="PT",
+                    vat_identification_country="PT",
+                    vat_identification_number="123456789",
+                    total_amount_exclude_vat=Decimal("81.30") * items_count,
+                    total_amount_include_vat=Decimal("100.00") * items_count,
+                    transaction_type="credit",
+                )
+                for i in range(count)
+            ]
+        )
+        transactions = list(Transaction.objects.filter(transaction_id__startswith=prefix))
+        TransactionItem.objects.bulk_create(
+            [
+                TransactionItem(
+                    transaction=transaction,
+                    description=f"Course number {i}",
+                    vat_tax=Decimal("0.23"),
+                    unit_price_excl_vat=Decimal("81.30"),
+                    unit_price_incl_vat=Decimal("100.00"),
+                    organization_code="ORG",
+                    product_id=f"course-v1:ORG+C{i}+2024_T1",
+                    product_code=f"C{i}",
+                )
+                for transaction in transactions
+                for i in range(items_count)
+            ]
+        )
+        return list(
+            Transaction.objects.filter(transaction_id__startswith=prefix)
+            .prefetch_related("transaction_items")
+            .order_by("pk")
+        )
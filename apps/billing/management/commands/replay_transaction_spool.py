@@ -0,0 +1,104 @@
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from apps.billing.models import SageX3TransactionInformation, Transaction
+from apps.billing.services.spool_processor import SPOOL_PREFIX, SageX3SpoolProcessor
+from apps.billing.services.transaction_service import TransactionService
+from apps.billing.tasks import DEFERRED_INFORMATION_FIELDS
+from apps.util.spool import read_spool, spool_files
+
+
+class Command(BaseCommand):
+    """
+
+    This command sends the transactions written to the spool files by the spool processor
+    to the `TRANSACTION_SPOOL_REPLAY_PROCESSOR`, streaming the files in batches, the oldest first.
+
+    The request data on the spool is sent as it is. The transactions that are no longer spooled,
+    like the ones already replayed, are skipped, and the failed sends are retried as any other failure.
+    Each file is deleted after being replayed, unless `--keep` is given.
+    The files still open are also replayed when abandoned, as when their processes were killed,
+    or they have been idle for `TRANSACTION_SPOOL_MAX_AGE` seconds.
+
+    How to use:
+
+        python manage.py replay_transaction_spool
+
+        python manage.py replay_transaction_spool --batch-size=100 --workers=8 --include-open --keep
+
+    """
+
+    help = "This command will send the spooled transactions to the transaction processor"
+
+    def add_arguments(self, parser):
+        """
+        Add command line arguments to this Django Command.
+        """
+        parser.add_argument(
+            "--directory", type=str, required=False, help="The spool directory, by default TRANSACTION_SPOOL_DIR"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=50, help="The number of transactions loaded and sent on each batch"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=1, help="The number of transactions sent concurrently to the processor"
+        )
+        parser.add_argument(
+            "--include-open",
+            action="store_true",
+            help="Also replay all the files still open, only when the processes writing them are no longer running",
+        )
+        parser.add_argument("--keep", action="store_true", help="Keep the spool files after being replayed")
+
+    def handle(self, *args, **kwargs) -> None:
+        directory = kwargs["directory"] or getattr(settings, "TRANSACTION_SPOOL_DIR")
+        processor = import_string(getattr(settings, "TRANSACTION_SPOOL_REPLAY_PROCESSOR"))()
+        counters = {"success": 0, "failed": 0, "skipped": 0}
+        start = time.time()
+        try:
+            files = spool_files(
+                directory,
+                SPOOL_PREFIX,
+                include_open=kwargs["include_open"],
+                max_age=getattr(settings, "TRANSACTION_SPOOL_MAX_AGE"),
+            )
+            for path in files:
+                self.__replay_file(path, processor, kwargs["batch_size"], kwargs["workers"], counters)
+                if not kwargs["keep"]:
+                    # an abandoned file may have been closed meanwhile by its writer, and is skipped when replayed again
+                    path.unlink(missing_ok=True)
+                self.stdout.write(f"Replayed {path.name}...")
+        finally:
+            processor.close()
+
+        self.stdout.write(
+            f"\n----- {len(files)} spool files were replayed in {time.time() - start:.1f} s -----\n"
+            f"\nSENT: {counters['success']} FAILED: {counters['failed']} SKIPPED: {counters['skipped']}\n"
+        )
+
+    @staticmethod
+    def __replay_file(path: Path, processor, batch_size: int, workers: int, counters: dict) -> None:
+        records = read_spool(path)
+        while batch := list(islice(records, batch_size)):
+            # a transaction spooled more than once is sent with its last data
+            payloads = {record["pk"]: record["data"].encode(SageX3SpoolProcessor.ENCODING) for record in batch}
+            transactions = (
+                Transaction.objects.filter(
+                    pk__in=payloads, sage_x3_transaction_information__status=SageX3TransactionInformation.SPOOLED
+                )
+                .select_related("sage_x3_transaction_information")
+                .defer(*DEFERRED_INFORMATION_FIELDS)
+                .prefetch_related("transaction_items")
+                .order_by("pk")
+            )
+            results = TransactionService.send_transactions(
+                transactions, workers=workers, processor=processor, payloads=payloads
+            )
+            counters["skipped"] += len(payloads) - len(results)
+            for result in results:
+                counters["success" if result.result else "failed"] += 1
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from apps.billing.services.transaction_service import TransactionService
+
+
+class Command(BaseCommand):
+    """
+
+    This command requeues the Sage X3 transactions moved to dead letter, after failing
+    `TRANSACTION_RETRY_MAX_ATTEMPTS` times, so they are retried again by the periodic retry task,
+    like after fixing their data. By default all the dead letters are requeued.
+
+    How to use:
+
+        python manage.py requeue_dead_letter_transactions
+
+        python manage.py requeue_dead_letter_transactions --transaction_id=XXXX --transaction_id=YYYY
+
+    """
+
+    help = "This command will requeue the dead letter transactions to be retried to send to sage X3"
+
+    def add_arguments(self, parser):
+        """
+        Add command line arguments to this Django Command.
+        """
+        parser.add_argument(
+            "--transaction_id",
+            type=str,
+            action="append",
+            required=False,
+            help="The transaction_id of a dead letter to requeue, it can be given many times",
+        )
+
+    def handle(self, *args, **kwargs) -> None:
+        count = TransactionService.requeue_dead_letters(transaction_ids=kwargs["transaction_id"])
+        self.stdout.write(f"\n----- {count} dead letter transactions were requeued -----\n")
@@ -3,6 +3,7 @@ import time
 from django.core.management.base import BaseCommand
 
 from apps.billing.services.transaction_service import TransactionService
+from apps.util.concurrency import percentile
 
 
 class Command(BaseCommand):
@@ -17,6 +18,8 @@ class Command(BaseCommand):
 
         python manage.py retry_sage_transactions --transaction_id=XXXX
 
+        python manage.py retry_sage_transactions --workers=8 --max-in-flight=8
+
     """
 
     help = "This command will collect all transactions failed and retry to send to sage X3"
@@ -28,13 +31,30 @@ class Command(BaseCommand):
         parser.add_argument(
             "--transaction_id", type=str, required=False, help="The transaction_id to retry to send to SageX3"
         )
+        parser.add_argument(
+            "--workers", type=int, default=1, help="The number of transactions sent concurrently to SageX3"
+        )
+        parser.add_argument(
+            "--max-in-flight",
+            type=int,
+            required=False,
+            help="The maximum number of transactions being sent at the same time, by default the number of workers",
+        )
 
     def handle(self, *args, **kwargs) -> str | None:
         transaction_id = kwargs["transaction_id"]
         start = time.time()
         self.stdout.write("\nGetting failed transactions with Sage X3...\n")
-        counters = TransactionService.retry_sending_transactions(transaction_id=transaction_id)
+        counters = TransactionService.retry_sending_transactions(
+            transaction_id=transaction_id, workers=kwargs["workers"], max_in_flight=kwargs["max_in_flight"]
+        )
         finish = time.time() - start
         self.stdout.write(f"\n----- {counters['total_count']} Transactions were retried -----\n")
         self.stdout.write(f"\nSUCCESSFULL RETRIES: {counters['success']} FAILED RETRIES: {counters['failed']}\n")
         self.stdout.write(f"\nThe time to retry all transactions was {finish}\n")
+        latencies = sorted(counters["latencies"])
+        throughput = len(latencies) / finish if finish else 0.0
+        self.stdout.write(
+            f"\nTHROUGHPUT: {throughput:.2f} tx/s "
+            f"LATENCY p50: {percentile(latencies, 50) * 1000:.0f} ms p95: {percentile(latencies, 95) * 1000:.0f} ms\n"
+        )
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+
+from apps.billing.stand_in_server import StandInConfig, StandInServer
+
+
+class Command(BaseCommand):
+    """
+
+    This command runs a local HTTP server that stands in for `Sage X3` and `iLink`,
+    replaying their mocked responses with the configured latency, error rate and throughput,
+    to measure the application against them by pointing `TRANSACTION_PROCESSOR_URL` and
+    `RECEIPT_HOST_URL` to it.
+
+    How to use:
+
+        python manage.py run_stand_in_server
+
+        python manage.py run_stand_in_server --port=8099 --latency=200 --jitter=50 --error-rate=0.05 --max-rps=20
+
+    """
+
+    help = "This command will run a local stand-in server of Sage X3 and iLink"
+
+    def add_arguments(self, parser):
+        """
+        Add command line arguments to this Django Command.
+        """
+        add_stand_in_arguments(parser)
+        parser.add_argument("--host", type=str, default="127.0.0.1", help="The address where the server listens")
+        parser.add_argument("--port", type=int, default=8099, help="The port where the server listens")
+
+    def handle(self, *args, **kwargs) -> None:
+        server = StandInServer((kwargs["host"], kwargs["port"]), stand_in_config(kwargs))
+        self.stdout.write(f"\nStand-in server of Sage X3 and iLink listening on {server.url}\n")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"\nRequests served: {server.stats}\n")
+
+
+def add_stand_in_arguments(parser) -> None:
+    """
+    The arguments to configure the behaviour of the stand-in server.
+    """
+    parser.add_argument("--latency", type=float, default=0, help="The milliseconds each response takes")
+    parser.add_argument("--jitter", type=float, default=0, help="The maximum random milliseconds added to the latency")
+    parser.add_argument(
+        "--error-rate", type=float, default=0, help="The ratio, from 0 to 1, of requests that fail with an error 500"
+    )
+    parser.add_argument(
+        "--max-rps", type=float, required=False, help="The maximum requests served per second, by default unlimited"
+    )
+
+
+def stand_in_config(kwargs: dict) -> StandInConfig:
+    return StandInConfig(
+        latency=kwargs["latency"] / 1000,
+        jitter=kwargs["jitter"] / 1000,
+        error_rate=kwargs["error_rate"],
+        max_rps=kwargs["max_rps"],
+    )
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:35
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def schedule_failed_transactions(apps, schema_editor):
+    """
+    The transactions that have already failed are retried on the next run of the periodic task.
+    The pending ones, whose sends may never finish, are retried after the delay of a new pending send.
+    """
+    SageX3TransactionInformation = apps.get_model("billing", "SageX3TransactionInformation")
+    now = timezone.now()
+    SageX3TransactionInformation.objects.filter(status="failed").update(next_retry_at=now)
+    SageX3TransactionInformation.objects.filter(status="pending").update(
+        next_retry_at=now + timedelta(seconds=getattr(settings, "TRANSACTION_RETRY_BACKOFF_BASE"))
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("billing", "0007_remove_transactionitem_discount_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sagex3transactioninformation",
+            name="next_retry_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When the send will be automatically retried, empty if it won't be retried automatically",
+                null=True,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sagex3transactioninformation",
+            index=models.Index(fields=["status", "next_retry_at"], name="sagex3_info_status_retry_idx"),
+        ),
+        migrations.RunPython(schedule_failed_transactions, migrations.RunPython.noop),
+    ]
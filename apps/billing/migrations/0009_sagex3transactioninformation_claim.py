@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("billing", "0008_sagex3transactioninformation_next_retry_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sagex3transactioninformation",
+            name="claimed_by",
+            field=models.CharField(
+                blank=True,
+                help_text="The worker that has claimed the transaction to send it",
+                max_length=255,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="sagex3transactioninformation",
+            name="claimed_until",
+            field=models.DateTimeField(
+                blank=True, help_text="When the claim expires, so another worker can send the transaction", null=True
+            ),
+        ),
+    ]
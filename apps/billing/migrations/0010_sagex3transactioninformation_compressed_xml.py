@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("billing", "0009_sagex3transactioninformation_claim"),
+    ]
+
+    operations = [
+        # the text columns keep their names, so the existing rows are compressed later, in batches,
+        # with the compress_sagex3_transaction_xml command
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameField(
+                    model_name="sagex3transactioninformation",
+                    old_name="input_xml",
+                    new_name="input_xml_text",
+                ),
+                migrations.RenameField(
+                    model_name="sagex3transactioninformation",
+                    old_name="output_xml",
+                    new_name="output_xml_text",
+                ),
+                migrations.AlterField(
+                    model_name="sagex3transactioninformation",
+                    name="input_xml_text",
+                    field=models.TextField(blank=True, db_column="input_xml", editable=False, null=True),
+                ),
+                migrations.AlterField(
+                    model_name="sagex3transactioninformation",
+                    name="output_xml_text",
+                    field=models.TextField(blank=True, db_column="output_xml", editable=False, null=True),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="sagex3transactioninformation",
+            name="input_xml_compressed",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="sagex3transactioninformation",
+            name="output_xml_compressed",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("billing", "0010_sagex3transactioninformation_compressed_xml"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sagex3transactioninformation",
+            name="payload_archive_key",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="The key on the storage of the bundle where the xml payloads are archived",
+                max_length=255,
+                null=True,
+            ),
+        ),
+    ]
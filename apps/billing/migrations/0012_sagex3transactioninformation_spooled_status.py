@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("billing", "0011_sagex3transactioninformation_payload_archive_key"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="sagex3transactioninformation",
+            name="status",
+            field=models.CharField(
+                choices=[("pending", "pending"), ("success", "success"), ("failed", "failed"), ("spooled", "spooled")],
+                default="pending",
+                max_length=255,
+            ),
+        ),
+    ]
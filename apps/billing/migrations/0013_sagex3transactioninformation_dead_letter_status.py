@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_exhausted_to_dead_letter(apps, schema_editor):
+    """
+    The failed transactions that have already been retried the maximum number of times are dead letters.
+    """
+    SageX3TransactionInformation = apps.get_model("billing", "SageX3TransactionInformation")
+    SageX3TransactionInformation.objects.filter(
+        status="failed", retries__gte=getattr(settings, "TRANSACTION_RETRY_MAX_ATTEMPTS")
+    ).update(status="dead_letter", next_retry_at=None)
+
+
+def move_dead_letter_to_failed(apps, schema_editor):
+    SageX3TransactionInformation = apps.get_model("billing", "SageX3TransactionInformation")
+    SageX3TransactionInformation.objects.filter(status="dead_letter").update(status="failed")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("billing", "0012_sagex3transactioninformation_spooled_status"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="sagex3transactioninformation",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "pending"),
+                    ("success", "success"),
+                    ("failed", "failed"),
+                    ("spooled", "spooled"),
+                    ("dead_letter", "dead_letter"),
+                ],
+                default="pending",
+                max_length=255,
+            ),
+        ),
+        migrations.RunPython(move_exhausted_to_dead_letter, move_dead_letter_to_failed),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("billing", "0013_sagex3transactioninformation_dead_letter_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="receipt_file_url",
+            field=models.CharField(
+                blank=True,
+                help_text="The link of the receipt on the receipt host, resolved after the transaction is sent",
+                max_length=2048,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="receipt_resolved_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,8 +1,12 @@
 from django.conf import settings
 from django.db import models
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from django_countries.fields import CountryField
+from safedelete.managers import SafeDeleteManager
 
+from apps.util.archive import read_bundle
+from apps.util.compression import compress_text, decompress_text
 from apps.util.constants import TRANSACTION_TYPE
 from apps.util.models import BaseModel
 
@@ -36,6 +40,7 @@ class Transaction(BaseModel):
     - Total amount including VAT
     - Currency
     - Document Id
+    - Receipt file url, with when it was resolved on the receipt host
 
     """
 
@@ -59,6 +64,13 @@ class Transaction(BaseModel):
     transaction_type = models.CharField(max_length=15, choices=TRANSACTION_TYPE)
     transaction_date = models.DateTimeField(auto_now_add=True)
     document_id = models.CharField(max_length=150, null=True, blank=True)
+    receipt_file_url = models.CharField(
+        max_length=2048,
+        null=True,
+        blank=True,
+        help_text=_("The link of the receipt on the receipt host, resolved after the transaction is sent"),
+    )
+    receipt_resolved_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.transaction_id
@@ -125,19 +137,45 @@ class TransactionItem(BaseModel):
         return self.product_id
 
 
+class SageX3TransactionInformationManager(SafeDeleteManager):
+    """
+    The default manager of `SageX3TransactionInformation`, it doesn't load the xml payloads,
+    that are loaded when accessed.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().defer(*SageX3TransactionInformation.PAYLOAD_FIELDS)
+
+
 class SageX3TransactionInformation(BaseModel):
     """
     Represents the status of a transaction in the Sage X3 system.
+
+    The xml payloads sent to and received from Sage X3 are stored compressed, and are read and written
+    with the `input_xml` and `output_xml` properties. The rows saved before the compression keep them
+    as text, until compressed with the `compress_sagex3_transaction_xml` command.
+    The payloads of old successful sends are archived on the default storage, by the
+    `archive_sagex3_transaction_xml` command, and are read back from there when accessed.
+    The transactions written to the spool files by the spool processor, instead of being sent,
+    are `spooled` until sent with the `replay_transaction_spool` command.
+    The sends that keep failing after `TRANSACTION_RETRY_MAX_ATTEMPTS` are moved to `dead_letter`,
+    and aren't retried anymore until requeued with the `requeue_dead_letter_transactions` command.
     """
 
     PENDING = "pending"
     SUCCESS = "success"
     FAILED = "failed"
+    SPOOLED = "spooled"
+    DEAD_LETTER = "dead_letter"
     STATE_CHOICES = (
         (PENDING, PENDING),
         (SUCCESS, SUCCESS),
         (FAILED, FAILED),
+        (SPOOLED, SPOOLED),
+        (DEAD_LETTER, DEAD_LETTER),
     )
+    # the statuses of the transactions not yet sent, that can be claimed to be sent
+    SENDABLE_STATUSES = (PENDING, FAILED, SPOOLED)
 
     transaction = models.OneToOneField(
         Transaction, related_name="sage_x3_transaction_information", on_delete=models.CASCADE
@@ -151,9 +189,97 @@ class SageX3TransactionInformation(BaseModel):
         max_length=50,
         help_text=_("The transaction series, by default we should use FRN, to fix date issues use FRX"),
     )
-    input_xml = models.TextField(null=True, blank=True)
-    output_xml = models.TextField(null=True, blank=True)
+    input_xml_text = models.TextField(db_column="input_xml", null=True, blank=True, editable=False)
+    output_xml_text = models.TextField(db_column="output_xml", null=True, blank=True, editable=False)
+    input_xml_compressed = models.BinaryField(null=True, blank=True)
+    output_xml_compressed = models.BinaryField(null=True, blank=True)
+    payload_archive_key = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text=_("The key on the storage of the bundle where the xml payloads are archived"),
+    )
     error_messages = models.TextField(null=True, blank=True)
+    next_retry_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_("When the send will be automatically retried, empty if it won't be retried automatically"),
+    )
+    claimed_by = models.CharField(
+        max_length=255, null=True, blank=True, help_text=_("The worker that has claimed the transaction to send it")
+    )
+    claimed_until = models.DateTimeField(
+        null=True, blank=True, help_text=_("When the claim expires, so another worker can send the transaction")
+    )
+
+    objects = SageX3TransactionInformationManager()
+
+    PAYLOADS = ("input_xml", "output_xml")
+    PAYLOAD_FIELDS = tuple(f"{payload}_{suffix}" for payload in PAYLOADS for suffix in ("text", "compressed"))
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_retry_at"], name="sagex3_info_status_retry_idx"),
+        ]
+
+    @staticmethod
+    def payload_columns(payload: str, value: str | bytes | None) -> dict:
+        """
+        The columns to write an xml payload, compressed.
+        """
+        return {f"{payload}_compressed": compress_text(value), f"{payload}_text": None}
+
+    @staticmethod
+    def archive_entry_name(pk: int, payload: str) -> str:
+        """
+        The name of the entry of a payload on the archive bundle.
+        """
+        return f"{pk}/{payload}.xml"
+
+    @cached_property
+    def archived_payloads(self) -> dict:
+        """
+        The xml payloads archived on the storage, all read at once from their bundle.
+        """
+        if not self.payload_archive_key:
+            return {}
+        entry_names = {self.archive_entry_name(self.pk, payload): payload for payload in self.PAYLOADS}
+        entries = read_bundle(self.payload_archive_key, entry_names)
+        return {entry_names[name]: content.decode("utf-8") for name, content in entries.items()}
+
+    def __get_payload(self, payload: str) -> str | None:
+        deferred = self.get_deferred_fields().intersection(self.PAYLOAD_FIELDS)
+        if deferred:
+            # all the payloads are loaded with a single query, as they are usually read together
+            self.refresh_from_db(fields=list(deferred))
+        compressed = getattr(self, f"{payload}_compressed")
+        if compressed is not None:
+            return decompress_text(compressed)
+        text = getattr(self, f"{payload}_text")
+        if text is not None:
+            return text
+        return self.archived_payloads.get(payload)
+
+    def __set_payload(self, payload: str, value: str | bytes | None) -> None:
+        for field, column_value in self.payload_columns(payload, value).items():
+            setattr(self, field, column_value)
+
+    @property
+    def input_xml(self) -> str | None:
+        return self.__get_payload("input_xml")
+
+    @input_xml.setter
+    def input_xml(self, value: str | bytes | None) -> None:
+        self.__set_payload("input_xml", value)
+
+    @property
+    def output_xml(self) -> str | None:
+        return self.__get_payload("output_xml")
+
+    @output_xml.setter
+    def output_xml(self, value: str | bytes | None) -> None:
+        self.__set_payload("output_xml", value)
 
     @property
     def processor_custom_fields(self):
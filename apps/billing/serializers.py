@@ -1,14 +1,23 @@
+import logging
+from collections import defaultdict
 from decimal import ROUND_HALF_UP, Decimal
 
 from django.conf import settings
+from django.db import transaction as db_transaction
 from django_countries.serializers import CountryFieldMixin
 from rest_framework import serializers
 
-from apps.billing.models import Transaction, TransactionItem
-from apps.billing.tasks import create_and_async_send_transactions_to_processor_task
+from apps.billing.models import SageX3TransactionInformation, Transaction, TransactionItem
+from apps.billing.services.transaction_service import TransactionService
+from apps.billing.tasks import (
+    create_and_async_send_transactions_to_processor_task,
+    send_transactions_to_processor_task,
+)
 from apps.organization.models import Organization
 from apps.shared_revenue.models import RevenueConfiguration
 
+log = logging.getLogger(__name__)
+
 
 class TransactionItemSerializer(CountryFieldMixin, serializers.ModelSerializer):
     """
@@ -84,14 +93,67 @@ class TransactionItemSerializerForAPI(serializers.ModelSerializer):
         ]
 
 
+class ProcessTransactionListSerializerForAPI(serializers.ListSerializer):
+    """
+    List serializer used to persist a batch of already validated transactions at once.
+
+    Instead of creating each transaction and each of its items with a single INSERT, all the
+    transactions, items and Sage X3 information of the batch are created using `bulk_create`
+    inside a single database transaction. The sending of the batch to the transaction processor
+    is queued as a single task after the database transaction has been committed.
+    """
+
+    def create(self, validated_data: list[dict]) -> list[dict]:
+        with db_transaction.atomic():
+            transactions = [
+                Transaction(**{key: value for key, value in data.items() if key != "items"}) for data in validated_data
+            ]
+            Transaction.objects.bulk_create(transactions)
+
+            # Some databases, like MySQL, don't return the primary keys of the bulk created rows.
+            if any(transaction.pk is None for transaction in transactions):
+                pks = dict(
+                    Transaction.objects.filter(
+                        transaction_id__in=[transaction.transaction_id for transaction in transactions]
+                    ).values_list("transaction_id", "pk")
+                )
+                for transaction in transactions:
+                    transaction.pk = pks[transaction.transaction_id]
+
+            items: list[TransactionItem] = [
+                TransactionItem(**{**item, "transaction": transaction})
+                for transaction, data in zip(transactions, validated_data)
+                for item in data.get("items", [])
+            ]
+            TransactionItem.objects.bulk_create(items)
+            self.child._execute_shared_revenue_resources(items=items)
+
+            transactions_to_send = [
+                transaction for transaction in transactions if not float(transaction.total_amount_include_vat) == 0
+            ]
+            # scheduled, so a send that never finishes is retried by the periodic retry task
+            next_retry_at = TransactionService.pending_retry_at()
+            SageX3TransactionInformation.objects.bulk_create(
+                [
+                    SageX3TransactionInformation(transaction=transaction, next_retry_at=next_retry_at)
+                    for transaction in transactions_to_send
+                ]
+            )
+            transaction_pks = [transaction.pk for transaction in transactions_to_send]
+            if transaction_pks:
+                db_transaction.on_commit(lambda: send_transactions_to_processor_task.delay(transaction_pks))
+
+        return validated_data
+
+
 class ProcessTransactionSerializerForAPI(CountryFieldMixin, serializers.ModelSerializer):
     """
     Serializer for processing transactions on API.
     This serializer is responsible for validating and processing transaction data. It includes methods for creating
     transactions, executing shared revenue resources, and converting transaction data to internal and external formats.
     Methods:
-        _execute_shared_revenue_resources(organization: Organization, product_id: str): Checks if a revenue configuration
-            exists for the given organization and product ID, and creates one if it doesn't exist.
+        _execute_shared_revenue_resources(items: list[TransactionItem]): Checks if the organizations and the revenue
+            configurations exist for the given items, and creates the ones that don't exist.
         _execute_billing_resources(validate_data: dict): Creates a transaction and a transaction item from the given data.
         create(validate_data): Creates a transaction, a transaction item, and a revenue configuration from the given data.
         to_internal_value(data): Converts the given data to an internal format.
@@ -122,21 +184,79 @@ class ProcessTransactionSerializerForAPI(CountryFieldMixin, serializers.ModelSer
             "payment_type",
             "transaction_date",
         ]
+        list_serializer_class = ProcessTransactionListSerializerForAPI
 
-    def _execute_shared_revenue_resources(
-        self,
-        organization: Organization,
-        product_id: str,
-    ):
+    def _execute_shared_revenue_resources(self, items: list[TransactionItem]) -> None:
+        """
+        Guarantee that an `Organization` and a `RevenueConfiguration` exist for each
+        (organization_code, product_id) pair of the given items.
+
+        The pairs are resolved as a set, so the number of queries doesn't depend on the number
+        of items, only the missing organizations and revenue configurations are created.
+
+        A new revenue configuration isn't created if there is already one for the same organization
+        and product or if its default partner percentage would exceed 100% for that product.
+        An error creating the revenue configurations is only logged, but an error on the organizations is raised.
+        """
+        if not items:
+            return
+
+        # the organizations are needed by the transaction, so their errors aren't swallowed
+        organizations = self._get_or_create_organizations({item.organization_code for item in items})
         try:
-            revenue_configuration_exists = RevenueConfiguration(
-                organization=organization,
-                product_id=product_id,
-            ).has_concurrent_revenue_configuration()
-            if not revenue_configuration_exists:
-                RevenueConfiguration.objects.create(**{"organization": organization, "product_id": product_id})
+            with db_transaction.atomic():
+                product_ids = {item.product_id for item in items}
+                existing_pairs = set()
+                percentages = defaultdict(Decimal)
+                for organization_id, product_id, partner_percentage in RevenueConfiguration.objects.filter(
+                    product_id__in=product_ids
+                ).values_list("organization_id", "product_id", "partner_percentage"):
+                    existing_pairs.add((organization_id, product_id))
+                    percentages[product_id] += partner_percentage
+
+                default_percentage = Decimal(
+                    str(RevenueConfiguration._meta.get_field("partner_percentage").get_default())
+                )
+                configurations_to_create: list[RevenueConfiguration] = []
+                for item in items:
+                    organization = organizations[item.organization_code]
+                    pair = (organization.pk, item.product_id)
+                    if pair in existing_pairs or percentages[item.product_id] + default_percentage > 1:
+                        continue
+
+                    existing_pairs.add(pair)
+                    percentages[item.product_id] += default_percentage
+                    configurations_to_create.append(
+                        RevenueConfiguration(organization=organization, product_id=item.product_id)
+                    )
+
+                if configurations_to_create:
+                    RevenueConfiguration.objects.bulk_create(configurations_to_create)
         except Exception:
-            return True
+            log.exception("Error creating the revenue configurations")
+
+    @staticmethod
+    def _get_or_create_organizations(short_names: set[str]) -> dict[str, Organization]:
+        """
+        Return the organizations by short name, creating the missing ones.
+        """
+        organizations = {
+            organization.short_name: organization
+            for organization in Organization.objects.filter(short_name__in=short_names)
+        }
+        missing_short_names = short_names - organizations.keys()
+        if missing_short_names:
+            Organization.objects.bulk_create(
+                [Organization(short_name=short_name) for short_name in missing_short_names],
+                ignore_conflicts=True,
+            )
+            organizations.update(
+                {
+                    organization.short_name: organization
+                    for organization in Organization.all_objects.filter(short_name__in=missing_short_names)
+                }
+            )
+        return organizations
 
     def _execute_billing_resources(
         self,
@@ -157,18 +277,19 @@ class ProcessTransactionSerializerForAPI(CountryFieldMixin, serializers.ModelSer
 
     def create(self, validated_data):
         transaction, items = self._execute_billing_resources(data=validated_data)
-        for item in items:
-            organization, created = Organization.objects.get_or_create(
-                short_name=item.organization_code,
-                defaults={"short_name": item.organization_code},
-            )
-            self._execute_shared_revenue_resources(
-                organization=organization,
-                product_id=item.product_id,
-            )
+        self._execute_shared_revenue_resources(items=items)
 
         if not float(transaction.total_amount_include_vat) == 0:
-            create_and_async_send_transactions_to_processor_task(transaction=transaction)
+            # mark the transaction as pending to be sent and only queue the sending after the commit,
+            # so the worker always finds the transaction and the request doesn't wait for the processor.
+            # It is scheduled, so a send that never finishes is retried by the periodic retry task.
+            SageX3TransactionInformation.objects.create(
+                transaction=transaction, next_retry_at=TransactionService.pending_retry_at()
+            )
+            transaction_pk = transaction.pk
+            db_transaction.on_commit(
+                lambda: create_and_async_send_transactions_to_processor_task.delay(transaction_pk)
+            )
 
         return validated_data
 
@@ -1,4 +1,8 @@
-from apps.billing.models import Transaction
+from typing import Sequence
+
+from apps.billing.models import SageX3TransactionInformation, Transaction
+from apps.util.circuit_breaker import CircuitBreaker
+from apps.util.concurrency import TaskResult, run_concurrently
 
 
 class TransactionProcessorInterface:
@@ -6,22 +10,90 @@ class TransactionProcessorInterface:
     This class represents an interface to be implemented as a contract.
 
     Each new transaction processor needs to implements its logic by signing to this class.
+
+    A processor is long-lived: `get_processor` builds a single instance per process, that is shared
+    by all the sends, so it can keep state like settings, HTTP pools or caches. The `generate_data`
+    and `send` methods receive the transaction, and can be called concurrently from several threads.
+
+    A processor can also be bound to a single transaction, to use the `data` property and
+    the `send_transaction_to_processor` method.
+
+    The `SENT_STATUS` is the status saved after a send without errors, a processor that only keeps
+    the transactions to be sent later uses `SPOOLED` instead of `SUCCESS`.
     """
 
+    SENT_STATUS = SageX3TransactionInformation.SUCCESS
+
     transaction: Transaction = None
 
-    def __init__(self, transaction: Transaction) -> None:
+    def __init__(self, transaction: Transaction | None = None) -> None:
         self.transaction = transaction
+        self._data = None
+
+    def generate_data(self, transaction: Transaction) -> bytes:
+        """
+        Generates the request data from the transaction, as expected for the service.
+        """
+        raise Exception("This method needs to be implemented")
+
+    def send(self, transaction: Transaction, data: bytes):
+        """
+        Sends the request data, generated with `generate_data`, of the transaction to the processor.
+        """
+        raise Exception("This method needs to be implemented")
 
     def send_transaction_to_processor(self) -> dict:
         """
         This method sends the transaction to the processor.
         """
-        raise Exception("This method needs to be implemented")
+        return self.send(self.transaction, self.data)
+
+    def send_transactions_to_processor(
+        self,
+        transactions: Sequence[tuple[Transaction, bytes]],
+        workers: int = 1,
+        max_in_flight: int | None = None,
+    ) -> list[TaskResult]:
+        """
+        Sends a batch of transactions, pairs of a transaction and its data generated with `generate_data`,
+        returning a `TaskResult` per transaction, in the same order, with the transaction as item and
+        the response of the processor as result, or the exception raised when sending it.
+
+        By default each transaction is sent with `send`, by a pool of `workers` threads with at most
+        `max_in_flight` transactions being sent at the same time. The processors whose service accepts
+        many documents on a single call can override it to send the whole batch at once.
+        """
+        results: list[TaskResult | None] = [None] * len(transactions)
+        for task in run_concurrently(
+            lambda item: self.send(item[1], item[2]),
+            ((index, transaction, data) for index, (transaction, data) in enumerate(transactions)),
+            workers=workers,
+            max_in_flight=max_in_flight,
+        ):
+            index, transaction, _ = task.item
+            results[index] = TaskResult(
+                item=transaction, result=task.result, exception=task.exception, elapsed=task.elapsed
+            )
+        return results
+
+    def circuit_breaker(self) -> CircuitBreaker | None:
+        """
+        The circuit breaker around the service of the processor, or None if it hasn't one.
+        """
+        return None
+
+    def close(self) -> None:
+        """
+        Release the resources kept by the processor, when it is no longer used.
+        """
 
     @property
     def data(self):
         """
         Generates the request data from the transaction, as expected for the service.
+
+        It uses memoization to prevent the generation of data multiple times unnecessary.
         """
-        raise Exception("This method needs to be implemented")
+        if not self._data:
+            self._data = self.generate_data(self.transaction)
+        return self._data
@@ -0,0 +1,92 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from apps.billing.models import SageX3TransactionInformation
+from apps.util.archive import write_bundle
+
+log = logging.getLogger(__name__)
+
+
+class PayloadArchiveService:
+    """
+    Archives the xml payloads of the transactions sent with success to Sage X3 some days ago,
+    so they are removed from the database.
+
+    The payloads of each batch of transactions are written to a zip bundle on the default storage,
+    and the database only keeps the key of the bundle, to read them back when needed.
+    """
+
+    def __init__(self, age_days: int | None = None, batch_size: int | None = None) -> None:
+        self.age_days = age_days if age_days is not None else getattr(settings, "TRANSACTION_PAYLOAD_ARCHIVE_AGE_DAYS")
+        self.batch_size = batch_size or getattr(settings, "TRANSACTION_PAYLOAD_ARCHIVE_BATCH_SIZE")
+
+    @staticmethod
+    def __candidates(cutoff: datetime) -> QuerySet:
+        """
+        The `SageX3TransactionInformation` sent with success before the `cutoff` whose payloads are on the database.
+        A transaction sent again after the `cutoff` isn't a candidate anymore.
+        """
+        with_payload = Q()
+        for field in SageX3TransactionInformation.PAYLOAD_FIELDS:
+            with_payload |= Q(**{f"{field}__isnull": False})
+        return SageX3TransactionInformation.objects.filter(
+            with_payload,
+            status=SageX3TransactionInformation.SUCCESS,
+            payload_archive_key__isnull=True,
+            updated_at__lt=cutoff,
+        ).order_by("pk")
+
+    @staticmethod
+    def __entries(rows: list[SageX3TransactionInformation]) -> Iterator[tuple[str, str]]:
+        for row in rows:
+            for payload in SageX3TransactionInformation.PAYLOADS:
+                content = getattr(row, payload)
+                if content is not None:
+                    yield SageX3TransactionInformation.archive_entry_name(row.pk, payload), content
+
+    @staticmethod
+    def __bundle_name(rows: list[SageX3TransactionInformation]) -> str:
+        prefix = getattr(settings, "TRANSACTION_PAYLOAD_ARCHIVE_PREFIX")
+        return f"{prefix}/{timezone.now():%Y/%m/%d}/{rows[0].pk}-{rows[-1].pk}.zip"
+
+    def archive(self) -> dict:
+        """
+        Archive the payloads of all the candidates, one bundle per batch, returning the counters
+        of the archived transactions and of the written bundles.
+
+        A bundle is written before its rows are updated, on a conditional UPDATE, so a transaction
+        sent again meanwhile keeps its new payloads.
+        """
+        cutoff = timezone.now() - timedelta(days=self.age_days)
+        counters = {"transactions": 0, "bundles": 0}
+        last_pk = 0
+        while True:
+            rows = list(
+                self.__class__.__candidates(cutoff)
+                .filter(pk__gt=last_pk)
+                # the payloads deferred by the manager are loaded on the same query, with the archive key,
+                # as a missing payload falls back to the archive
+                .defer(None)
+                .only("pk", "payload_archive_key", *SageX3TransactionInformation.PAYLOAD_FIELDS)[: self.batch_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1].pk
+
+            key = write_bundle(self.__class__.__bundle_name(rows), self.__class__.__entries(rows))
+            archived = (
+                self.__class__.__candidates(cutoff)
+                .filter(pk__in=[row.pk for row in rows])
+                .update(
+                    payload_archive_key=key, **{field: None for field in SageX3TransactionInformation.PAYLOAD_FIELDS}
+                )
+            )
+            log.info("Archived the payloads of %s transactions to %s", archived, key)
+            counters["transactions"] += archived
+            counters["bundles"] += 1
+        return counters
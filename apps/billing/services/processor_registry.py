@@ -0,0 +1,50 @@
+import atexit
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from apps.billing.services.financial_processor_service import TransactionProcessorInterface
+
+_processor: TransactionProcessorInterface | None = None
+_processor_lock = threading.Lock()
+
+
+def get_processor() -> TransactionProcessorInterface:
+    """
+    Return the process wide transaction processor, the class on the `TRANSACTION_PROCESSOR` setting,
+    building it on the first call.
+
+    The processor is long-lived, so its settings and state are shared by all the sends of the process.
+    """
+    global _processor
+    processor = _processor
+    if processor is None:
+        with _processor_lock:
+            if _processor is None:
+                _processor = import_string(getattr(settings, "TRANSACTION_PROCESSOR"))()
+            processor = _processor
+    return processor
+
+
+def reset_processor() -> None:
+    """
+    Close and forget the process wide transaction processor, the next `get_processor` builds a new one.
+    """
+    global _processor
+    with _processor_lock:
+        processor, _processor = _processor, None
+    if processor is not None:
+        processor.close()
+
+
+# the processor is closed when the process stops, like to close the files it is writing
+atexit.register(reset_processor)
+
+
+@receiver(setting_changed)
+def _reset_processor_on_setting_changed(**kwargs) -> None:
+    # the processor keeps the settings read when it was built, like when they are overridden on the tests
+    reset_processor()
@@ -1,29 +1,107 @@
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 
 import requests
 from django.conf import settings
-from django.utils import translation
 
 from apps.billing.models import Transaction, TransactionItem
 from apps.billing.services.financial_processor_service import TransactionProcessorInterface
+from apps.util.circuit_breaker import CircuitBreaker, CircuitBreakerOpenError
+from apps.util.countries import country_name
+from apps.util.http_session import get_pooled_session
 
+# The envelope of the `Sage X3` request is compiled once, the values are filled on a single pass.
+_ENVELOPE_TEMPLATE = """
+<soapenv:Envelope
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+    xmlns:xsd="http://www.w3.org/2001/XMLSchema"
+    xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
+    xmlns:wss="http://www.adonix.com/WSS">
+    <soapenv:Header/>
+    <soapenv:Body>
+        <wss:save soapenv:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">
+            <callContext xsi:type="wss:CAdxCallContext">
+                <codeLang xsi:type="xsd:string">POR</codeLang>
+                <poolAlias xsi:type="xsd:string">{pool_alias}</poolAlias>
+                <poolId xsi:type="xsd:string">?</poolId>
+                <requestConfig xsi:type="xsd:string">adxwss.beautify=true</requestConfig>
+            </callContext>
+            <publicName xsi:type="xsd:string">YWSSIH</publicName>
+            <objectXml xsi:type="xsd:string"><![CDATA[<?xml version="1.0" encoding="{encoding}" ?>
+            <PARAM>
+                <GRP ID="SIH0_1">
+                    <FLD NAME="SALFCY">SED</FLD>
+                    <FLD NAME="SIVTYP">{series}</FLD>
+                    <FLD NAME="NUM"></FLD>
+                    <FLD NAME="INVREF">{transaction_id}</FLD>
+                    <FLD NAME="INVDAT">{transaction_date}</FLD>
+                    <FLD NAME="BPCINV">9999</FLD>
+                    <FLD NAME="CUR">EUR</FLD>
+                </GRP>
+                <GRP ID="SIH1_6">
+                    <FLD NAME="VACBPR">{vacbpr}</FLD>
+                    <FLD NAME="PRITYP">2</FLD>
+                </GRP>
+                <GRP ID="SIH1_7">
+                    <FLD NAME="STOMVTFLG">1</FLD>
+                </GRP>
+                <GRP ID="SIH2_2">
+                    <FLD NAME="PTE">PTTRFPP</FLD>
+                </GRP>
+                <GRP ID="YIL_2">
+                    <FLD NAME="YCRY" TYPE="Char">{vat_identification_country}</FLD>
+                    <FLD NAME="YCRYNAM" TYPE="Char">{country_name}</FLD>
+                    <FLD NAME="YPOSCOD" TYPE="Char">{postal_code}</FLD>
+                    <FLD NAME="YCTY" TYPE="Char">{city}</FLD>
+                    <FLD NAME="YBPIEECNUM" TYPE="Char">{vat_identification_country}{vat_identification_number}</FLD>
+                    <FLD NAME="YILINKMAIL" TYPE="Char">{email}</FLD>
+                    <FLD NAME="YPAM" TYPE="Char">{transaction_type}</FLD>
+                    <LST NAME="YBPRNAM" SIZE="2" TYPE="Char">
+                        <ITM>{client_name}</ITM>
+                    </LST>
+                    <LST NAME="YBPAADDLIG" SIZE="3" TYPE="Char">
+                        <ITM>{address_line_1}</ITM>
+                        <ITM>{address_line_2}</ITM>
+                    </LST>
+                </GRP>
+                <TAB ID="SIH4_1">{items}
+                </TAB>
+            </PARAM>
+        ]]></objectXml>
+        </wss:save>
+    </soapenv:Body>
+</soapenv:Envelope>"""
 
-class SageX3Processor(TransactionProcessorInterface):
 
+def _escape(value) -> str:
+    """
+    Escape a value to be used as the text of a xml element.
+
+    Most of the values don't have any special character, so those are returned without paying the escape.
+    """
+    value = str(value)
+    if "&" in value or "<" in value or ">" in value:
+        return escape(value)
+    return value
+
+
+class SageX3Processor(TransactionProcessorInterface):
     ENCODING = "utf-8"
+    COUNTRY_NAME_LANGUAGE = "pt"
 
     """
     This class is a transaction processor. It means that by implementing the `TransactionProcessorInterface` type,
     it can be replaced by another implementation.
 
-    The two methods `send_transaction_to_processor` and `check_transaction_in_processor` come from `TransactionProcessorInterface`,
+    The two methods `generate_data` and `send` come from `TransactionProcessorInterface`,
     it signs the interface contract to implement the business logic.
+    The settings are read once, when the processor is built, as it is long-lived and shared by all the sends.
 
     This implementation is based on the `Sage X3` saas business logic, so it means that all the particular `Sage X3` functionalities
     need to be implemented here as private methods.
     """
 
-    def __init__(self, transaction: Transaction) -> None:
+    def __init__(self, transaction: Transaction | None = None) -> None:
         super().__init__(transaction)
         self.__processor_url = getattr(settings, "TRANSACTION_PROCESSOR_URL")
         self.__pool_alias = getattr(settings, "POOL_ALIAS")
@@ -31,160 +109,147 @@ class SageX3Processor(TransactionProcessorInterface):
         self.__vacbpr = getattr(settings, "GEOGRAPHIC_ACTIVITY_VACBPR_FIELD")
         self.__user_processor_auth = getattr(settings, "USER_PROCESSOR_AUTH")
         self.__user_processor_password = getattr(settings, "USER_PROCESSOR_PASSWORD")
-        self.__data = None
+        self.__timeout = (
+            getattr(settings, "TRANSACTION_PROCESSOR_CONNECT_TIMEOUT"),
+            getattr(settings, "TRANSACTION_PROCESSOR_READ_TIMEOUT"),
+        )
+        self.__default_series = getattr(settings, "DEFAULT_SERIES")
+        self.__circuit_breaker = self.circuit_breaker()
+
+    @staticmethod
+    def _session():
+        """
+        The process wide HTTP session used to call the `Sage X3` service.
+
+        It keeps the connections alive between sends, so each invoice doesn't pay a new TCP and TLS handshake.
+        """
+        return get_pooled_session(
+            name="sage_x3",
+            pool_size=getattr(settings, "TRANSACTION_PROCESSOR_POOL_SIZE"),
+            connect_retries=getattr(settings, "TRANSACTION_PROCESSOR_CONNECT_RETRIES"),
+        )
+
+    @staticmethod
+    def circuit_breaker() -> CircuitBreaker:
+        """
+        The circuit breaker around the `Sage X3` service, shared by all the workers through the Django cache.
+        """
+        return CircuitBreaker(
+            name="sage_x3",
+            failure_threshold=getattr(settings, "TRANSACTION_PROCESSOR_CIRCUIT_BREAKER_FAILURE_THRESHOLD"),
+            reset_timeout=getattr(settings, "TRANSACTION_PROCESSOR_CIRCUIT_BREAKER_RESET_TIMEOUT"),
+        )
 
-    def _series(self):
+    def _series(self, transaction: Transaction):
         info = None
         try:
-            info = getattr(self.transaction, "sage_x3_transaction_information")
+            info = getattr(transaction, "sage_x3_transaction_information")
         except Exception:
             pass
         if info:
             return info.series
         else:
-            return getattr(settings, "DEFAULT_SERIES")
+            return self.__default_series
 
-    def send_transaction_to_processor(self) -> dict:
+    def send(self, transaction: Transaction, data: bytes) -> dict:
         """
         This method sends the transaction informations to the `Sage X3` service.
+
+        While the circuit breaker is open it raises `CircuitBreakerOpenError` without calling the service,
+        the connection errors, timeouts and server errors count as failures of the circuit breaker.
         """
-        response = requests.post(
-            url=self.__processor_url,
-            data=self.data,
-            headers={"Content-type": f"text/xml; charset={self.ENCODING}", "SOAPAction": "''"},
-            auth=(
-                self.__user_processor_auth,
-                self.__user_processor_password,
-            ),
-        ).content
-
-        return response
+        circuit_breaker = self.__circuit_breaker
+        if not circuit_breaker.allow_request():
+            raise CircuitBreakerOpenError(f"The circuit breaker {circuit_breaker.name} is open")
+
+        try:
+            response = self._session().post(
+                url=self.__processor_url,
+                data=data,
+                headers={"Content-type": f"text/xml; charset={self.ENCODING}", "SOAPAction": "''"},
+                auth=(
+                    self.__user_processor_auth,
+                    self.__user_processor_password,
+                ),
+                timeout=self.__timeout,
+            )
+        except requests.exceptions.RequestException:
+            circuit_breaker.record_failure()
+            raise
+
+        if response.status_code >= 500:
+            circuit_breaker.record_failure()
+        else:
+            circuit_breaker.record_success()
+
+        return response.content
 
     def __generate_items_as_xml(self, items: list[TransactionItem]) -> str:
         """
         This method generates items from a transaction as xml text,
         as expected for the `Sage X3` service.
         """
-
-        items_as_xml = ""
+        vacitm1 = _escape(self.__vacitm1)
+        lines = []
         for item in items:
-            items_as_xml = f"""
-            {items_as_xml}
-            <LIN>
-                <FLD NAME="ITMREF">N0001</FLD>
-                <FLD NAME="ITMDES">{item.description}</FLD>
-                <FLD NAME="ITMDES1">{item.description}</FLD>
-                <FLD NAME="QTY">{item.quantity}</FLD>
-                <FLD NAME="STU">UN</FLD>
-                <FLD NAME="GROPRI">{item.unit_price_incl_vat}</FLD>
-                <FLD NAME="DISCRGVAL1">{item.discount_rate * 100}</FLD>
-                <FLD NAME="VACITM1">{self.__vacitm1}</FLD>
-            </LIN>
-            """
-
-        return items_as_xml
-
-    @property
-    def data(self) -> str:
+            description = _escape(item.description)
+            lines.append(
+                f"""
+                <LIN>
+                    <FLD NAME="ITMREF">N0001</FLD>
+                    <FLD NAME="ITMDES">{description}</FLD>
+                    <FLD NAME="ITMDES1">{description}</FLD>
+                    <FLD NAME="QTY">{item.quantity}</FLD>
+                    <FLD NAME="STU">UN</FLD>
+                    <FLD NAME="GROPRI">{item.unit_price_incl_vat}</FLD>
+                    <FLD NAME="DISCRGVAL1">{item.discount_rate * 100}</FLD>
+                    <FLD NAME="VACITM1">{vacitm1}</FLD>
+                </LIN>"""
+            )
+        return "".join(lines)
+
+    def generate_data(self, transaction: Transaction) -> bytes:
         """
         This method generates the request data as xml text from a transaction,
-        as expected for the `Sage X3` service.
-
-        It uses memoization to prevent the generation of data multiple times unnecessary.
+        as expected for the `Sage X3` service, encoded.
         """
-        if not self.__data:
-            self.__data = self.__generate_data().encode(self.ENCODING, "ignore")
-        return self.__data
+        return self.__generate_data(transaction).encode(self.ENCODING, "ignore")
 
-    def __generate_data(self) -> str:
+    def __generate_data(self, transaction: Transaction) -> str:
         """
         This method generates the request data as xml text from a transaction,
         as expected for the `Sage X3` service.
+
+        The whole envelope is generated on a single pass over a precompiled template
+        and all the values are escaped, so they can't break the xml.
         """
-        transaction: Transaction = self.transaction
         items: list[TransactionItem] = transaction.transaction_items.all()
-        items_as_xml = self.__generate_items_as_xml(items=items)
 
-        transaction_id = transaction.transaction_id
-        transaction_date = str(transaction.transaction_date.date().strftime("%Y%m%d"))
-        vat_identification_country = getattr(transaction, "vat_identification_country", "")
-        city = getattr(transaction, "city", "")
-        with translation.override("PT"):  # We have to send the Country name in Portuguese
-            country_code = getattr(transaction, "country_code")
-            country_name = country_code.name if country_code else ""
+        # We have to send the Country name in Portuguese
+        invoice_country_name = country_name(getattr(transaction, "country_code"), self.COUNTRY_NAME_LANGUAGE)
         postal_code = transaction.postal_code
         postal_code = postal_code.replace("-", "").replace(" ", "") if postal_code else ""
-        vat_identification_number = str(transaction.vat_identification_number or "")
-        email = str(transaction.email or "")
-        transaction_type = str(transaction.transaction_type or "")
-        client_name = str(transaction.client_name or "")
-        address_line_1 = str(transaction.address_line_1 or "")
-        address_line_2 = str(transaction.address_line_2 or "")
-
-        objectXML = f"""
-            <PARAM>
-                <GRP ID="SIH0_1">
-                    <FLD NAME="SALFCY">SED</FLD>
-                    <FLD NAME="SIVTYP">{self._series()}</FLD>
-                    <FLD NAME="NUM"></FLD>
-                    <FLD NAME="INVREF">{transaction_id}</FLD>
-                    <FLD NAME="INVDAT">{transaction_date}</FLD>
-                    <FLD NAME="BPCINV">9999</FLD>
-                    <FLD NAME="CUR">EUR</FLD>
-                </GRP>
-                <GRP ID="SIH1_6">
-                    <FLD NAME="VACBPR">{self.__vacbpr}</FLD>
-                    <FLD NAME="PRITYP">2</FLD>
-                </GRP>
-                <GRP ID="SIH1_7">
-                    <FLD NAME="STOMVTFLG">1</FLD>
-                </GRP>
-                <GRP ID="SIH2_2">
-                    <FLD NAME="PTE">PTTRFPP</FLD>
-                </GRP>
-                <GRP ID="YIL_2">
-                    <FLD NAME="YCRY" TYPE="Char">{vat_identification_country}</FLD>
-                    <FLD NAME="YCRYNAM" TYPE="Char">{country_name}</FLD>
-                    <FLD NAME="YPOSCOD" TYPE="Char">{postal_code}</FLD>
-                    <FLD NAME="YCTY" TYPE="Char">{city}</FLD>
-                    <FLD NAME="YBPIEECNUM" TYPE="Char">{vat_identification_country}{vat_identification_number}</FLD>
-                    <FLD NAME="YILINKMAIL" TYPE="Char">{email}</FLD>
-                    <FLD NAME="YPAM" TYPE="Char">{transaction_type}</FLD>
-                    <LST NAME="YBPRNAM" SIZE="2" TYPE="Char">
-                        <ITM>{client_name}</ITM>
-                    </LST>
-                    <LST NAME="YBPAADDLIG" SIZE="3" TYPE="Char">
-                        <ITM>{address_line_1}</ITM>
-                        <ITM>{address_line_2}</ITM>
-                    </LST>
-                </GRP>
-                <TAB ID="SIH4_1">{items_as_xml}</TAB>
-            </PARAM>
-        """
-        # objectXML = self.__class__._pretty_format_xml(objectXML, space="\t")
+        vat_identification_country = getattr(transaction, "vat_identification_country", "")
 
-        data = f"""
-<soapenv:Envelope
-    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
-    xmlns:xsd="http://www.w3.org/2001/XMLSchema"
-    xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
-    xmlns:wss="http://www.adonix.com/WSS">
-    <soapenv:Header/>
-    <soapenv:Body>
-        <wss:save soapenv:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">
-            <callContext xsi:type="wss:CAdxCallContext">
-                <codeLang xsi:type="xsd:string">POR</codeLang>
-                <poolAlias xsi:type="xsd:string">{self.__pool_alias}</poolAlias>
-                <poolId xsi:type="xsd:string">?</poolId>
-                <requestConfig xsi:type="xsd:string">adxwss.beautify=true</requestConfig>
-            </callContext>
-            <publicName xsi:type="xsd:string">YWSSIH</publicName>
-            <objectXml xsi:type="xsd:string"><![CDATA[<?xml version="1.0" encoding="{self.ENCODING}" ?>
-{objectXML}]]></objectXml>
-        </wss:save>
-    </soapenv:Body>
-</soapenv:Envelope>"""
-        return data
+        return _ENVELOPE_TEMPLATE.format(
+            encoding=self.ENCODING,
+            pool_alias=_escape(self.__pool_alias),
+            series=_escape(self._series(transaction)),
+            transaction_id=_escape(transaction.transaction_id),
+            transaction_date=transaction.transaction_date.date().strftime("%Y%m%d"),
+            vacbpr=_escape(self.__vacbpr),
+            vat_identification_country=_escape(vat_identification_country),
+            country_name=_escape(invoice_country_name),
+            postal_code=_escape(postal_code),
+            city=_escape(getattr(transaction, "city", "")),
+            vat_identification_number=_escape(transaction.vat_identification_number or ""),
+            email=_escape(transaction.email or ""),
+            transaction_type=_escape(transaction.transaction_type or ""),
+            client_name=_escape(transaction.client_name or ""),
+            address_line_1=_escape(transaction.address_line_1 or ""),
+            address_line_2=_escape(transaction.address_line_2 or ""),
+            items=self.__generate_items_as_xml(items=items),
+        )
 
     @staticmethod
     def _pretty_format_xml(data, space="  ", level=0):
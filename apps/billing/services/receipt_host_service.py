@@ -1,12 +1,62 @@
+import time
+from functools import reduce
+from operator import or_
+from urllib.parse import quote
+
 import requests
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+
+from apps.billing.models import Transaction
+from apps.util.concurrency import TaskResult, run_concurrently
+from apps.util.http_session import get_pooled_session
+
+# cached instead of the link of a document that isn't on the receipt host yet
+_NOT_FOUND = "not-found"
+# cached for a short time instead of the link of a document, after an error of the receipt host, with its kind
+_ERROR = "error:"
 
 
 class ReceiptDocumentHost:
+    """
+    The receipt host, `iLink`, where the documents created on the transaction processor are published.
+
+    The links of the documents are cached on the Django cache for `RECEIPT_LINK_CACHE_TIMEOUT` seconds,
+    and the documents not found, as the ones not published yet, for `RECEIPT_LINK_NOT_FOUND_CACHE_TIMEOUT`.
+    The concurrent lookups of the same document, from any process sharing the cache, are coalesced
+    on a single call to the receipt host, and its errors are cached for `RECEIPT_LINK_ERROR_CACHE_TIMEOUT`,
+    so the lookups waiting for it fail with it. The calls have connect and read timeouts, so a slow receipt host
+    raises a `requests.exceptions.Timeout` instead of holding the caller.
+    """
+
     def __init__(self) -> None:
         self.__receipt_host_url = getattr(settings, "RECEIPT_HOST_URL")
         self.__receipt_bearer_token = getattr(settings, "RECEIPT_BEARER_TOKEN")
         self.__receipt_entity_public_key = getattr(settings, "RECEIPT_ENTITY_PUBLIC_KEY")
+        self.__cache_timeout = getattr(settings, "RECEIPT_LINK_CACHE_TIMEOUT")
+        self.__not_found_cache_timeout = getattr(settings, "RECEIPT_LINK_NOT_FOUND_CACHE_TIMEOUT")
+        self.__error_cache_timeout = getattr(settings, "RECEIPT_LINK_ERROR_CACHE_TIMEOUT")
+        self.__wait_interval = getattr(settings, "RECEIPT_LINK_WAIT_INTERVAL")
+        connect_timeout = getattr(settings, "RECEIPT_HOST_CONNECT_TIMEOUT")
+        read_timeout = getattr(settings, "RECEIPT_HOST_READ_TIMEOUT")
+        self.__timeout = (connect_timeout, read_timeout)
+        # the longest that a call to the receipt host can take, with the retries to connect
+        self.__lock_timeout = (getattr(settings, "RECEIPT_HOST_CONNECT_RETRIES") + 1) * connect_timeout + read_timeout
+
+    @staticmethod
+    def _session():
+        """
+        The process wide HTTP session used to call the receipt host.
+
+        It keeps the connections alive between the lookups, on a bounded pool shared by all the threads.
+        """
+        return get_pooled_session(
+            name="receipt_host",
+            pool_size=getattr(settings, "RECEIPT_HOST_POOL_SIZE"),
+            connect_retries=getattr(settings, "RECEIPT_HOST_CONNECT_RETRIES"),
+        )
 
     def __check_status_code(self, response: requests.Response):
         try:
@@ -14,29 +64,181 @@ class ReceiptDocumentHost:
         except Exception:
             raise requests.exceptions.RequestException(response=response)
 
-    def __raise_document_not_found(self):
+    def __document_not_found(self) -> requests.exceptions.RequestException:
         not_found_response = requests.Response()
         not_found_response.status_code = 404
-        raise requests.exceptions.RequestException(response=not_found_response)
+        return requests.exceptions.RequestException(response=not_found_response)
+
+    def __raise_document_not_found(self):
+        raise self.__document_not_found()
+
+    @staticmethod
+    def __error_marker(e: requests.exceptions.RequestException) -> str:
+        if isinstance(e, requests.exceptions.Timeout):
+            return f"{_ERROR}timeout"
+        if isinstance(e, requests.exceptions.ConnectionError):
+            return f"{_ERROR}connection"
+        return f"{_ERROR}{e.response.status_code if e.response is not None else 500}"
+
+    @staticmethod
+    def __cached_error(marker: str) -> requests.exceptions.RequestException:
+        """
+        The error of the receipt host as cached by `__error_marker`, for the lookups that waited for it.
+        """
+        kind = marker.removeprefix(_ERROR)
+        if kind == "timeout":
+            return requests.exceptions.Timeout("The receipt host has just timed out")
+        if kind == "connection":
+            return requests.exceptions.ConnectionError("The receipt host has just been unavailable")
+        error_response = requests.Response()
+        error_response.status_code = int(kind)
+        return requests.exceptions.RequestException("The receipt host has just failed", response=error_response)
+
+    def __from_cache(self, value: str) -> str:
+        """
+        The link of a document as cached, raising the error of the receipt host cached instead.
+        """
+        if value == _NOT_FOUND:
+            self.__raise_document_not_found()
+        if value.startswith(_ERROR):
+            raise self.__cached_error(value)
+        return value
+
+    @staticmethod
+    def cache_key(document_id: str) -> str:
+        # quoted, so the key has no spaces or control characters whatever the document id
+        return f"receipt-link:{quote(document_id, safe='')}"
 
     def get_document(self, document_id: str):
         """
-        This method gets the file url, it calls the receipt host giving the required parameters.
+        This method gets the file url, from the cache or calling the receipt host.
 
         The `document_id` is a transaction parameter, it is the returned id from the transaction processor.
-        The `__receipt_bearer_token` is set in the environment.
+        A document not found is cached for a shorter time, so the repeated polls of a document not yet
+        published don't reach the receipt host every time. The other errors are only cached for a few seconds.
+
+        On a miss, only the caller that adds the lock of the document to the cache calls the receipt host,
+        the others wait for its result, or its error, to be cached. The lock expires after the longest that
+        a call to the receipt host can take, with its timeouts, so if the caller holding it dies one of
+        the waiters takes it. A waiter that doesn't get a result in that time raises a timeout.
         """
 
         if not document_id:
             self.__raise_document_not_found()
 
-        response = requests.get(
+        key = self.__class__.cache_key(document_id)
+        lock_key = f"{key}:lock"
+        deadline = time.monotonic() + self.__lock_timeout
+        while True:
+            file_url = cache.get(key)
+            if file_url is not None:
+                return self.__from_cache(file_url)
+            if cache.add(lock_key, True, timeout=self.__lock_timeout):
+                try:
+                    return self.__fetch_and_cache_document(document_id, key)
+                finally:
+                    cache.delete(lock_key)
+            if time.monotonic() >= deadline:
+                raise requests.exceptions.Timeout("Timed out waiting for the receipt host")
+            time.sleep(self.__wait_interval)
+
+    def get_transaction_receipt_link(self, transaction: Transaction) -> str:
+        """
+        The link of the receipt of the transaction, as saved on it once resolved, without calling the receipt host.
+        Otherwise it is got with `get_document` and saved on the transaction, as it doesn't change anymore,
+        unless the transaction has been sent again meanwhile, creating another document.
+        """
+        if transaction.receipt_file_url:
+            return transaction.receipt_file_url
+
+        file_url = self.get_document(document_id=transaction.document_id)
+        now = timezone.now()
+        if Transaction.objects.filter(pk=transaction.pk, document_id=transaction.document_id).update(
+            receipt_file_url=file_url, receipt_resolved_at=now, updated_at=now
+        ):
+            transaction.receipt_file_url = file_url
+            transaction.receipt_resolved_at = now
+        return file_url
+
+    def get_transactions_receipt_links(self, transactions: list[Transaction], workers: int = 1) -> list[TaskResult]:
+        """
+        The receipt links of many transactions, a `TaskResult` per transaction, in the same order,
+        with the transaction as item and the link as result, or the exception raised getting it.
+
+        The links saved on the transactions and the cached ones, read with a single cache call, are answered
+        without calling the receipt host, the others are got with `get_document` by a pool of `workers` threads.
+        The new links are saved on the transactions with a single query, from the calling thread,
+        except on the ones sent again meanwhile, creating another document.
+        """
+        results: list[TaskResult | None] = [None] * len(transactions)
+        missing = []
+        for index, transaction in enumerate(transactions):
+            if transaction.receipt_file_url:
+                results[index] = TaskResult(item=transaction, result=transaction.receipt_file_url)
+            elif not transaction.document_id:
+                results[index] = TaskResult(item=transaction, exception=self.__document_not_found())
+            else:
+                missing.append(index)
+
+        cached = cache.get_many([self.__class__.cache_key(transactions[index].document_id) for index in missing])
+        to_fetch = []
+        for index in missing:
+            transaction = transactions[index]
+            file_url = cached.get(self.__class__.cache_key(transaction.document_id))
+            if file_url is None:
+                to_fetch.append(index)
+                continue
+            try:
+                results[index] = TaskResult(item=transaction, result=self.__from_cache(file_url))
+            except requests.exceptions.RequestException as e:
+                results[index] = TaskResult(item=transaction, exception=e)
+
+        for task in run_concurrently(
+            lambda index: self.get_document(document_id=transactions[index].document_id), to_fetch, workers=workers
+        ):
+            results[task.item] = TaskResult(
+                item=transactions[task.item], result=task.result, exception=task.exception, elapsed=task.elapsed
+            )
+
+        resolved = [results[index] for index in missing if results[index].exception is None]
+        if resolved:
+            now = timezone.now()
+            Transaction.objects.filter(
+                reduce(or_, (Q(pk=task.item.pk, document_id=task.item.document_id) for task in resolved))
+            ).update(
+                receipt_file_url=Case(*(When(pk=task.item.pk, then=Value(task.result)) for task in resolved)),
+                receipt_resolved_at=now,
+                updated_at=now,
+            )
+        return results
+
+    def __fetch_and_cache_document(self, document_id: str, key: str):
+        try:
+            file_url = self.__fetch_document(document_id)
+        except requests.exceptions.RequestException as e:
+            if e.response is not None and e.response.status_code == 404:
+                cache.set(key, _NOT_FOUND, timeout=self.__not_found_cache_timeout)
+            else:
+                cache.set(key, self.__error_marker(e), timeout=self.__error_cache_timeout)
+            raise
+        cache.set(key, file_url, timeout=self.__cache_timeout)
+        return file_url
+
+    def __fetch_document(self, document_id: str):
+        """
+        This method gets the file url, it calls the receipt host giving the required parameters.
+
+        The `__receipt_bearer_token` is set in the environment.
+        """
+
+        response = self._session().get(
             url=f"{self.__receipt_host_url}",
             params={"document_number": document_id, "document_type": "issued"},
             headers={
                 "entity": self.__receipt_entity_public_key,
                 "Authorization": f"Bearer {self.__receipt_bearer_token}",
             },
+            timeout=self.__timeout,
         )
         self.__check_status_code(response=response)
         response = response.json()
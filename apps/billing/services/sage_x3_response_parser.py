@@ -0,0 +1,143 @@
+from xml.parsers import expat
+
+DUPLICATE_MESSAGE = "Nº Fatura NAU já registada no documento: "
+
+
+class DocumentIdNotFoundError(ValueError):
+    """
+    Raised when the `Sage X3` response has no document id, as when the invoice was rejected.
+    """
+
+
+class _DocumentIdFound(Exception):
+    """
+    Raised from the parser handlers to stop the parsing as soon as the document id is known.
+    """
+
+    def __init__(self, document_id: str) -> None:
+        super().__init__(document_id)
+        self.document_id = document_id
+
+
+def _local_name(name: str) -> str:
+    """
+    Return the element name without its namespace prefix, e.g. `soapenv:Body` -> `Body`.
+    """
+    return name.rpartition(":")[2]
+
+
+class _ResultXmlParser:
+    """
+    Incremental parser of the `resultXml` document embedded on the `Sage X3` response.
+
+    It receives the document in chunks, as they are read by the envelope parser,
+    and raises `_DocumentIdFound` on the end of the first non empty `NUM` field.
+    """
+
+    def __init__(self) -> None:
+        self.__started = False
+        self.__in_num = False
+        self.__num = []
+        self.__parser = expat.ParserCreate()
+        self.__parser.StartElementHandler = self.__start_element
+        self.__parser.EndElementHandler = self.__end_element
+        self.__parser.CharacterDataHandler = self.__character_data
+
+    @property
+    def started(self) -> bool:
+        return self.__started
+
+    def feed(self, data: str) -> None:
+        self.__started = True
+        self.__parser.Parse(data, False)
+
+    def close(self) -> None:
+        self.__parser.Parse("", True)
+
+    def __start_element(self, name: str, attributes: dict) -> None:
+        if name == "FLD" and attributes.get("NAME") == "NUM":
+            self.__in_num = True
+            self.__num = []
+
+    def __end_element(self, name: str) -> None:
+        if self.__in_num:
+            self.__in_num = False
+            document_id = "".join(self.__num)
+            if document_id:
+                raise _DocumentIdFound(document_id)
+
+    def __character_data(self, data: str) -> None:
+        if self.__in_num:
+            self.__num.append(data)
+
+
+class _EnvelopeParser:
+    """
+    Streaming parser of the `Sage X3` SOAP response envelope.
+
+    Only the text of the `resultXml` element and of the `multiRef/message` elements is looked at,
+    the rest of the envelope is skipped without building any tree.
+    """
+
+    def __init__(self) -> None:
+        self.__path = []
+        self.__result_xml_parser = None
+        self.__message = []
+        self.__parser = expat.ParserCreate()
+        self.__parser.buffer_text = True
+        self.__parser.StartElementHandler = self.__start_element
+        self.__parser.EndElementHandler = self.__end_element
+        self.__parser.CharacterDataHandler = self.__character_data
+
+    def parse(self, response: bytes | str) -> str:
+        try:
+            self.__parser.Parse(response, True)
+        except _DocumentIdFound as found:
+            return found.document_id
+        raise DocumentIdNotFoundError(
+            f"The Sage X3 response has no document id, message={''.join(self.__message) or None}"
+        )
+
+    def __start_element(self, name: str, attributes: dict) -> None:
+        name = _local_name(name)
+        if name == "resultXml":
+            self.__result_xml_parser = _ResultXmlParser()
+        elif name == "message" and self.__path and self.__path[-1] == "multiRef":
+            self.__message = []
+        self.__path.append(name)
+
+    def __end_element(self, name: str) -> None:
+        name = self.__path.pop()
+        if name == "resultXml":
+            result_xml_parser, self.__result_xml_parser = self.__result_xml_parser, None
+            if result_xml_parser.started:
+                result_xml_parser.close()
+        elif name == "message" and self.__path and self.__path[-1] == "multiRef":
+            message = "".join(self.__message)
+            if DUPLICATE_MESSAGE in message:
+                raise _DocumentIdFound(message.replace(DUPLICATE_MESSAGE, ""))
+
+    def __character_data(self, data: str) -> None:
+        if not self.__path:
+            return
+        name = self.__path[-1]
+        if name == "resultXml":
+            # the whitespace before the embedded xml declaration would make it invalid
+            if not self.__result_xml_parser.started:
+                data = data.lstrip()
+            if data:
+                self.__result_xml_parser.feed(data)
+        elif name == "message" and len(self.__path) > 1 and self.__path[-2] == "multiRef":
+            self.__message.append(data)
+
+
+def extract_document_id(response: bytes | str) -> str:
+    """
+    Extracts the document_id from the `Sage X3` response.
+
+    The document id is the `NUM` field of the created invoice, or the document referred by the
+    message returned when the invoice was already registered. Otherwise, as when the invoice was
+    rejected, it raises `DocumentIdNotFoundError` with the message of the response.
+    The response is parsed in a single pass that stops as soon as the document id is found.
+    """
+    return _EnvelopeParser().parse(response)
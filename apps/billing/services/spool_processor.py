@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.utils import timezone
+
+from apps.billing.models import SageX3TransactionInformation, Transaction
+from apps.billing.services.processor_service import SageX3Processor
+from apps.util.spool import SpoolWriter
+
+# the prefix of the names of the spool files
+SPOOL_PREFIX = "sagex3-spool"
+
+
+class SageX3SpoolProcessor(SageX3Processor):
+    """
+    This class is a transaction processor that, instead of calling the `Sage X3` service, appends the
+    generated request data to rotating and compressed spool files, on the `TRANSACTION_SPOOL_DIR` directory.
+
+    The transactions are saved as `spooled`, and are sent to `Sage X3` later with the
+    `replay_transaction_spool` command. It is used to measure the ingest without the ERP,
+    and to keep receiving transactions during long ERP maintenances without failing them.
+    """
+
+    SENT_STATUS = SageX3TransactionInformation.SPOOLED
+
+    def __init__(self, transaction: Transaction | None = None) -> None:
+        super().__init__(transaction)
+        self.__writer = SpoolWriter(
+            directory=getattr(settings, "TRANSACTION_SPOOL_DIR"),
+            prefix=SPOOL_PREFIX,
+            max_records=getattr(settings, "TRANSACTION_SPOOL_MAX_RECORDS"),
+            max_age=getattr(settings, "TRANSACTION_SPOOL_MAX_AGE"),
+            fsync=getattr(settings, "TRANSACTION_SPOOL_FSYNC"),
+        )
+
+    def send(self, transaction: Transaction, data: bytes) -> str:
+        """
+        Append the request data of the transaction to the spool, returning the name of the spool file.
+        """
+        path = self.__writer.write(
+            {
+                "pk": transaction.pk,
+                "transaction_id": transaction.transaction_id,
+                "spooled_at": timezone.now().isoformat(),
+                "data": data.decode(self.ENCODING),
+            }
+        )
+        return path.name
+
+    def close(self) -> None:
+        """
+        Close the spool file being written, so it can be replayed.
+        """
+        self.__writer.close()
@@ -1,11 +1,23 @@
 import logging
+import os
+import socket
 import traceback
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterable, Iterator, Mapping
+from uuid import uuid4
 
-import xmltodict
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import F, Q, QuerySet
+from django.utils import timezone
 
 from apps.billing.models import SageX3TransactionInformation, Transaction
 from apps.billing.services.financial_processor_service import TransactionProcessorInterface
-from apps.billing.services.processor_service import SageX3Processor
+from apps.billing.services.processor_registry import get_processor
+from apps.billing.services.sage_x3_response_parser import extract_document_id
+from apps.util.circuit_breaker import CircuitBreakerOpenError
+from apps.util.concurrency import TaskResult
 
 log = logging.getLogger(__name__)
 
@@ -19,68 +31,298 @@ class TransactionService:
     def __init__(
         self,
         transaction: Transaction,
-        *args,
-        **kwargs,
+        claim_token: str | None = None,
+        processor: TransactionProcessorInterface | None = None,
+        force: bool = False,
     ) -> None:
         """
         Initialize a TransactionService and save the necessary information marking
         that there is a pending transaction to be sent.
+
+        The transaction is sent with the `processor`, by default the process wide processor
+        of the `TRANSACTION_PROCESSOR` setting.
+        The `claim_token` identifies who is sending the transaction, when it has already been claimed
+        in a batch with `claim_retry_candidates`, otherwise a new one is generated.
+        Only the transactions not yet sent are claimed, unless the send is forced.
         """
         self.transaction = transaction
-        self.__processor: TransactionProcessorInterface = SageX3Processor(transaction, *args, **kwargs)
+        self.__claim_token = claim_token or self.__class__.new_claim_token()
+        self.__claimed = False
+        self.__force = force
+        self.__processor: TransactionProcessorInterface = processor or get_processor()
+
+    @staticmethod
+    def new_claim_token() -> str:
+        """
+        A new unique identifier of a worker claiming transactions to send.
+        """
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:12]}"
+
+    @staticmethod
+    def __unclaimed(now: datetime, claim_token: str | None = None, force: bool = False) -> Q:
+        """
+        The condition of the `SageX3TransactionInformation` that can be claimed now,
+        the ones never claimed, with an expired claim or already claimed with the `claim_token`.
 
-    def __save_transaction_xml(self, transaction: Transaction, informations: dict) -> None:
+        Unless forced, only the transactions not yet sent can be claimed, so a worker whose claim
+        has expired meanwhile never sends again a transaction already sent by another one.
+        """
+        condition = Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
+        if claim_token:
+            condition |= Q(claimed_by=claim_token)
+        if not force:
+            condition &= Q(status__in=SageX3TransactionInformation.SENDABLE_STATUSES)
+        return condition
+
+    @staticmethod
+    def __claim_until(now: datetime) -> datetime:
+        return now + timedelta(seconds=getattr(settings, "TRANSACTION_PROCESSOR_CLAIM_TIMEOUT"))
+
+    def __save_transaction_xml(self, transaction: Transaction, informations: dict, claim: bool = False) -> bool:
         """
         Saves the XML content of a transaction to the database.
 
-        This function attempts to get or create a SageX3TransactionInformation object
-        with the given transaction. If the SageX3TransactionInformation object doesn't exist,
-        it creates one with the provided XML content. If an exception occurs during
-        this process, it prints the exception message.
+        This function uses the SageX3TransactionInformation object of the given transaction,
+        as loaded with it, or loads it without its xml payloads. If the SageX3TransactionInformation
+        object doesn't exist, it creates one with the provided XML content.
+        Otherwise a single UPDATE statement writes only the given columns, and a failure increments the
+        retries on the database, so concurrent workers can't lose any retry. The failure that reaches
+        `TRANSACTION_RETRY_MAX_ATTEMPTS` retries is saved as a dead letter.
+
+        The xml payloads of the `informations` are written compressed.
+        With `claim` the transaction is only saved if it can be claimed, so no other worker is sending it,
+        and it returns if it was saved. Otherwise the claim of this service is released.
+        If an exception occurs during this process, it logs the exception message.
         """
         try:
-            transaction.refresh_from_db()
-            obj, created = SageX3TransactionInformation.objects.get_or_create(
-                transaction=transaction, defaults={**informations}
-            )
-            if not created:
-                if informations["status"] == SageX3TransactionInformation.FAILED:
-                    obj.retries += 1
-                for key, value in informations.items():
-                    setattr(obj, key, value)
-                obj.save()
+            status = informations["status"]
+            now = timezone.now()
+            columns = {}
+            for key, value in informations.items():
+                if key in SageX3TransactionInformation.PAYLOADS:
+                    columns.update(SageX3TransactionInformation.payload_columns(key, value))
+                else:
+                    columns[key] = value
+            if claim:
+                claim_changes = {"claimed_by": self.__claim_token, "claimed_until": self.__class__.__claim_until(now)}
+            elif self.__claimed:
+                claim_changes = {"claimed_by": None, "claimed_until": None}
+            else:
+                claim_changes = {}
+
+            obj = self.__class__.__get_transaction_information(transaction)
+            if obj is None:
+                obj, created = SageX3TransactionInformation.objects.get_or_create(
+                    transaction=transaction,
+                    defaults={
+                        **columns,
+                        **claim_changes,
+                        "next_retry_at": self.__class__.__next_retry_at(status, retries=0),
+                    },
+                )
+                transaction.sage_x3_transaction_information = obj
+                if created:
+                    self.__claimed = claim
+                    return True
+
+            retries = obj.retries + 1 if status == SageX3TransactionInformation.FAILED else obj.retries
+            if status == SageX3TransactionInformation.FAILED and retries >= getattr(
+                settings, "TRANSACTION_RETRY_MAX_ATTEMPTS"
+            ):
+                # the send won't succeed by retrying it, like with invalid data, it is only retried when requeued
+                log.warning(
+                    "The transaction %s is a dead letter after %s retries", transaction.transaction_id, retries
+                )
+                status = columns["status"] = SageX3TransactionInformation.DEAD_LETTER
+            changes = {
+                **columns,
+                **claim_changes,
+                "next_retry_at": self.__class__.__next_retry_at(status, retries=retries),
+                "updated_at": now,
+            }
+            updates = {**changes}
+            if status in (SageX3TransactionInformation.FAILED, SageX3TransactionInformation.DEAD_LETTER):
+                updates["retries"] = F("retries") + 1
+            queryset = SageX3TransactionInformation.objects.filter(pk=obj.pk)
+            if claim:
+                queryset = queryset.filter(self.__class__.__unclaimed(now, self.__claim_token, self.__force))
+            if not queryset.update(**updates):
+                return False
+            self.__claimed = claim
+
+            # keep the loaded object as it is on the database, without reading it back
+            for key, value in changes.items():
+                setattr(obj, key, value)
+            obj.retries = retries
+            return True
 
         except Exception as e:
             log.exception(f"Some error has occurred saving the transaction xml e={e}")
             raise e
 
+    def __release_claim(self) -> None:
+        """
+        Release the claim of this service on the transaction, so it can be sent by other workers.
+        """
+        if self.__claimed:
+            SageX3TransactionInformation.objects.filter(
+                transaction=self.transaction, claimed_by=self.__claim_token
+            ).update(claimed_by=None, claimed_until=None)
+            self.__claimed = False
+
+    @staticmethod
+    def __get_transaction_information(transaction: Transaction) -> SageX3TransactionInformation | None:
+        """
+        The SageX3TransactionInformation of the transaction, as loaded with it or cached by a previous save,
+        otherwise it is loaded by the default manager, without the xml payloads that are only written.
+        """
+        obj = Transaction.sage_x3_transaction_information.related.get_cached_value(transaction, default=None)
+        if obj is not None:
+            return obj
+        obj = SageX3TransactionInformation.objects.filter(transaction=transaction).first()
+        if obj is not None:
+            transaction.sage_x3_transaction_information = obj
+        return obj
+
+    @staticmethod
+    def __next_retry_at(status: str, retries: int) -> datetime | None:
+        """
+        When the send should be automatically retried, using an exponential backoff on the number of retries.
+
+        A pending send is also scheduled, so it is retried if it never finishes, but only after the delay
+        of its next failure. After the maximum number of attempts the send isn't retried automatically anymore.
+        """
+        if status in (
+            SageX3TransactionInformation.SUCCESS,
+            SageX3TransactionInformation.SPOOLED,
+        ) or retries >= getattr(settings, "TRANSACTION_RETRY_MAX_ATTEMPTS"):
+            return None
+        exponent = max(retries - 1, 0) if status == SageX3TransactionInformation.FAILED else retries
+        delay = min(
+            getattr(settings, "TRANSACTION_RETRY_BACKOFF_BASE") * 2**exponent,
+            getattr(settings, "TRANSACTION_RETRY_BACKOFF_MAX"),
+        )
+        return timezone.now() + timedelta(seconds=delay)
+
+    @staticmethod
+    def pending_retry_at() -> datetime | None:
+        """
+        When a new pending send is automatically retried, if it never finishes,
+        like when its task is lost or its worker dies before sending it.
+        """
+        return TransactionService.__next_retry_at(SageX3TransactionInformation.PENDING, retries=0)
+
     @staticmethod
     def __extract_document_id_from_response(response) -> str:
         """
-        Extracts the document_id from the Sage X3 response or None if didn't find it.
+        Extracts the document_id from the Sage X3 response, raising `DocumentIdNotFoundError` if it isn't there,
+        as when the invoice was rejected.
+
+        The response is streamed through a parser that stops on the first `NUM` field,
+        instead of converting the envelope and the embedded result xml to dicts.
+        """
+        return extract_document_id(response)
+
+    def __prepare_send(self, data: bytes | None = None) -> bytes | None:
+        """
+        Generate the data of the transaction, unless given, and save it before sending, claiming the transaction
+        so no other worker sends it at the same time. Returns the data, or None if it was already claimed.
+        """
+        if data is None:
+            data = self.__processor.generate_data(self.transaction)
+        log.info("Send transaction to SageX3 input_xml: %s", data)
+
+        if not self.__save_transaction_xml(
+            informations={
+                "input_xml": data,
+                "error_messages": "",
+                "status": SageX3TransactionInformation.PENDING,
+            },
+            transaction=self.transaction,
+            claim=True,
+        ):
+            log.info("The transaction %s is being sent by another worker", self.transaction.transaction_id)
+            return None
+        return data
+
+    def __save_response(self, response) -> None:
+        """
+        Save the response of the processor and the document_id it has created,
+        and queue the resolution of the link of its receipt.
+
+        When the processor has only kept the transaction, to be sent later, just its status is saved.
+        A response without a document_id, as of a rejected invoice, raises after the response is saved,
+        so the send is saved as failed, keeping the response.
         """
-        response_as_json = dict(xmltodict.parse(response))
-        response_as_json = response_as_json["soapenv:Envelope"]["soapenv:Body"]
+        log.info("Receiving from SageX3 the response: %s", response)
+
+        status = self.__processor.SENT_STATUS
+        if status != SageX3TransactionInformation.SUCCESS:
+            self.__save_transaction_xml(
+                informations={"error_messages": "", "status": status}, transaction=self.transaction
+            )
+            return
+
+        self.__save_transaction_xml(
+            informations={
+                "output_xml": str(response),
+                "error_messages": "",
+                "status": SageX3TransactionInformation.SUCCESS,
+            },
+            transaction=self.transaction,
+        )
 
-        if "multiRef" in list(dict(response_as_json).keys()):
-            message = "Nº Fatura NAU já registada no documento: "
-            if message in response_as_json["multiRef"]["message"]:
-                document_id = response_as_json["multiRef"]["message"].replace(message, "")
+        # save the document_id so we know what have been created on SageX3,
+        # clearing the receipt link of the previous document when it is sent again
+        document_id = self.__class__.__extract_document_id_from_response(response)
+        Transaction.objects.filter(pk=self.transaction.pk).update(
+            document_id=document_id, receipt_file_url=None, receipt_resolved_at=None, updated_at=timezone.now()
+        )
+        self.transaction.document_id = document_id
+        self.transaction.receipt_file_url = None
+        self.transaction.receipt_resolved_at = None
 
-                return document_id
+        if getattr(settings, "RECEIPT_HOST_URL"):
+            # imported here, as the tasks use this service
+            from apps.billing.tasks import resolve_receipt_link_task
 
-        result = xmltodict.parse(response_as_json["wss:saveResponse"]["saveReturn"]["resultXml"]["#text"])
-        document_id = None
-        for r in result["RESULT"]["GRP"]:
-            for field in r["FLD"]:
-                if field["@NAME"] == "NUM":
-                    document_id = field["#text"]
-                    break
+            # the receipt link is resolved on the background, once the document is saved
+            transaction_pk = self.transaction.pk
+            db_transaction.on_commit(lambda: resolve_receipt_link_task.delay(transaction_pk))
 
-            if document_id:
-                break
+    def __save_exception(self, e: Exception) -> None:
+        """
+        Save the failure of the send, except when the circuit breaker is open.
+        """
+        if isinstance(e, CircuitBreakerOpenError):
+            # the transaction is kept as pending, to be retried when the processor is back
+            log.warning("The transaction %s wasn't sent to processor, %s", self.transaction.transaction_id, e)
+            self.__release_claim()
+            return
 
-        return document_id
+        # log the exception and eat it.
+        log.error(f"An exception has been raised when sending data to processor, exception message={e}", exc_info=e)
+        exception_stack_trace = "".join(traceback.format_exception(e))
+        self.__save_transaction_xml(
+            informations={
+                "error_messages": f"An exception has been raised when sending data to processor, exception message={e} stacktrace={exception_stack_trace}",
+                "status": SageX3TransactionInformation.FAILED,
+            },
+            transaction=self.transaction,
+        )
+
+    def __save_result(self, response=None, exception: Exception | None = None) -> bool:
+        """
+        Save the result of sending the transaction, returning if it has been sent with success.
+        """
+        if exception is None:
+            try:
+                self.__save_response(response)
+                return True
+            except Exception as e:
+                exception = e
+        self.__save_exception(exception)
+        return False
 
     def run_steps_to_send_transaction(self) -> bool:
         """
@@ -88,48 +330,78 @@ class TransactionService:
         returns a boolean indicating if the send has been run with success.
         """
         try:
-            log.info("Send transaction to SageX3 input_xml: %s", self.__processor.data)
+            data = self.__prepare_send()
+            if data is None:
+                return False
+            response = self.__processor.send(self.transaction, data)
+        except Exception as e:
+            return self.__save_result(exception=e)
+        return self.__save_result(response=response)
 
-            # save before sending
-            self.__save_transaction_xml(
-                informations={
-                    "input_xml": self.__processor.data,
-                    "error_messages": "",
-                    "status": SageX3TransactionInformation.PENDING,
-                },
-                transaction=self.transaction,
-            )
+    @staticmethod
+    def send_transactions(
+        transactions: Iterable[Transaction],
+        claim_token: str | None = None,
+        workers: int | None = None,
+        max_in_flight: int | None = None,
+        processor: TransactionProcessorInterface | None = None,
+        payloads: Mapping[int, bytes] | None = None,
+        force: bool = False,
+    ) -> list[TaskResult]:
+        """
+        Send a batch of transactions to the processor, returning a `TaskResult` per transaction,
+        with the transaction as item and if it has been sent with success as result.
 
-            response = self.__processor.send_transaction_to_processor()
-            log.info("Receiving from SageX3 the response: %s", response)
+        The transactions are saved and claimed before, and their results saved after, on the calling thread,
+        while the processor sends the batch with `send_transactions_to_processor`, by default concurrently
+        by a pool of `workers` threads, `TRANSACTION_PROCESSOR_SEND_WORKERS` when not given.
+        The `processor` defaults to the process wide one, and the data of the transactions whose primary key
+        is on `payloads` is sent as it is, instead of being generated.
+        The transactions already sent are skipped, unless `force`.
+        """
+        workers = workers or getattr(settings, "TRANSACTION_PROCESSOR_SEND_WORKERS")
+        claim_token = claim_token or TransactionService.new_claim_token()
+        processor = processor or get_processor()
+        payloads = payloads or {}
+        results = []
+        to_send = []
+        for transaction in transactions:
+            service = TransactionService(transaction, claim_token=claim_token, processor=processor, force=force)
+            try:
+                data = service.__prepare_send(payloads.get(transaction.pk))
+            except Exception as e:
+                results.append(TaskResult(item=transaction, result=service.__save_result(exception=e)))
+                continue
+            if data is None:
+                results.append(TaskResult(item=transaction, result=False))
+            else:
+                to_send.append((service, data))
 
-            # save after sending
-            self.__save_transaction_xml(
-                informations={
-                    "output_xml": str(response),
-                    "error_messages": "",
-                    "status": SageX3TransactionInformation.SUCCESS,
-                },
-                transaction=self.transaction,
-            )
+        sent = processor.send_transactions_to_processor(
+            [(service.transaction, data) for service, data in to_send], workers=workers, max_in_flight=max_in_flight
+        )
+        for (service, _), task in zip(to_send, sent):
+            success = service.__save_result(response=task.result, exception=task.exception)
+            results.append(TaskResult(item=service.transaction, result=success, elapsed=task.elapsed))
+        return results
 
-            # save the document_id so we know what have been created on SageX3
-            document_id = self.__class__.__extract_document_id_from_response(response)
-            self.transaction.document_id = document_id
-            self.transaction.save()
-            return True
-        except Exception as e:
-            # log the exception and eat it.
-            log.exception(f"An exception has been raised when sending data to processor, exception message={e}")
-            exception_stack_trace = traceback.format_exc()
-            self.__save_transaction_xml(
-                informations={
-                    "error_messages": f"An exception has been raised when sending data to processor, exception message={e} stacktrace={exception_stack_trace}",
-                    "status": SageX3TransactionInformation.FAILED,
-                },
-                transaction=self.transaction,
-            )
-            return False
+    @staticmethod
+    def __with_transaction(queryset: QuerySet) -> QuerySet:
+        """
+        The `SageX3TransactionInformation` of the queryset loaded with their transaction and its items
+        and, as by the default manager, without the xml payloads that aren't needed to retry.
+        """
+        return queryset.select_related("transaction").prefetch_related("transaction__transaction_items")
+
+    @staticmethod
+    def __retry_candidates_queryset(transaction_id: str | None) -> QuerySet:
+        """
+        The `SageX3TransactionInformation` that need to be retried, or the one of the `transaction_id`.
+        """
+        queryset = SageX3TransactionInformation.objects.order_by("pk")
+        if transaction_id:
+            return queryset.filter(transaction__transaction_id=transaction_id)
+        return queryset.filter(status__in=[SageX3TransactionInformation.FAILED, SageX3TransactionInformation.PENDING])
 
     @staticmethod
     def sagex3_transaction_info_query(transaction_id: str | None):
@@ -139,36 +411,156 @@ class TransactionService:
 
         This method must always return a list, regardless of its length.
         """
+        return list(
+            TransactionService.__with_transaction(TransactionService.__retry_candidates_queryset(transaction_id))
+        )
 
-        if transaction_id:
-            result = SageX3TransactionInformation.objects.filter(transaction__transaction_id=transaction_id)
+    @staticmethod
+    def claim_retry_candidates(
+        queryset: QuerySet, limit: int, claim_token: str, force: bool = False
+    ) -> list[SageX3TransactionInformation]:
+        """
+        Claim up to `limit` of the `SageX3TransactionInformation` of the queryset, in its order,
+        and return them loaded with their transaction and its items.
 
-            return list(result)
+        The rows being claimed by other workers are skipped, using `SELECT ... FOR UPDATE SKIP LOCKED`
+        where the database supports it, and the claim is a conditional UPDATE, so each row
+        is only claimed by a single worker until its claim expires or is released.
+        Only the transactions not yet sent are claimed, unless `force`.
+        """
+        now = timezone.now()
+        with db_transaction.atomic():
+            pks = list(
+                queryset.filter(TransactionService.__unclaimed(now, force=force))
+                .select_for_update(skip_locked=True)
+                .values_list("pk", flat=True)[:limit]
+            )
+            if not pks:
+                return []
+            SageX3TransactionInformation.objects.filter(pk__in=pks).filter(
+                TransactionService.__unclaimed(now, force=force)
+            ).update(claimed_by=claim_token, claimed_until=TransactionService.__claim_until(now))
+        claimed = SageX3TransactionInformation.objects.filter(pk__in=pks, claimed_by=claim_token)
+        return list(TransactionService.__with_transaction(claimed).order_by(*queryset.query.order_by))
 
-        result = SageX3TransactionInformation.objects.filter(
-            status__in=[SageX3TransactionInformation.FAILED, SageX3TransactionInformation.PENDING]
-        )
+    @staticmethod
+    def iterate_retry_candidates(
+        transaction_id: str | None, claim_token: str, chunk_size: int | None = None
+    ) -> Iterator[SageX3TransactionInformation]:
+        """
+        Iterate over the transactions that need to be retried, or the one of the `transaction_id`,
+        claiming them with the `claim_token`.
 
-        return list(result)
+        The rows are claimed and loaded in chunks of `chunk_size`, with a fixed number of queries per chunk,
+        so a large backlog is retried with constant memory. The rows claimed by other workers are skipped.
+        The transaction of the `transaction_id` is claimed even if it has already been sent, to force its send.
+        """
+        chunk_size = chunk_size or getattr(settings, "TRANSACTION_RETRY_CHUNK_SIZE")
+        candidates = TransactionService.__retry_candidates_queryset(transaction_id)
+        last_pk = 0
+        while True:
+            chunk = TransactionService.claim_retry_candidates(
+                candidates.filter(pk__gt=last_pk),
+                limit=chunk_size,
+                claim_token=claim_token,
+                force=bool(transaction_id),
+            )
+            if not chunk:
+                return
+            yield from chunk
+            last_pk = chunk[-1].pk
 
     @staticmethod
-    def retry_sending_transactions(transaction_id: str | None):
+    def retry_sending_transactions(transaction_id: str | None, workers: int = 1, max_in_flight: int | None = None):
         """
         This method retries sending transactions and also is
         possible to retry an specific one by providing the `transaction_id`.
+
+        With more than one worker the transactions are sent concurrently, by a pool of `workers` threads,
+        with at most `max_in_flight` transactions being sent at the same time.
+        The transactions are claimed before being sent, so many retries can run at the same time.
+        The transaction of the `transaction_id` is sent even if it has already been sent.
+        The returned counters include the latency in seconds of each retry.
         """
+        claim_token = TransactionService.new_claim_token()
+        # the candidates are claimed lazily, at most a batch at a time, so the claims of the last batches
+        # don't expire while the first ones are being sent
+        chunk_size = min(
+            getattr(settings, "TRANSACTION_RETRY_CHUNK_SIZE"),
+            getattr(settings, "TRANSACTION_PROCESSOR_SEND_BATCH_SIZE"),
+        )
+        return TransactionService.__retry(
+            TransactionService.iterate_retry_candidates(
+                transaction_id, claim_token=claim_token, chunk_size=chunk_size
+            ),
+            claim_token=claim_token,
+            workers=workers,
+            max_in_flight=max_in_flight,
+            force=bool(transaction_id),
+        )
 
-        sagex3_to_retry = TransactionService.sagex3_transaction_info_query(transaction_id)
-        counters = {"success": 0, "failed": 0, "total_count": len(sagex3_to_retry)}
+    @staticmethod
+    def retry_due_transactions(batch_size: int | None = None):
+        """
+        This method retries sending the transactions whose automatic retry is due,
+        the ones waiting for longer first and at most `batch_size` of them.
 
-        for sagex3_failed_transaction in sagex3_to_retry:
-            try:
-                if TransactionService(sagex3_failed_transaction.transaction).run_steps_to_send_transaction():
+        It uses the index on the status and `next_retry_at`, and the transactions not yet due,
+        without any automatic retry scheduled or claimed by other workers are left alone.
+        """
+        batch_size = batch_size or getattr(settings, "TRANSACTION_RETRY_BATCH_SIZE")
+        due = SageX3TransactionInformation.objects.filter(
+            status__in=[SageX3TransactionInformation.FAILED, SageX3TransactionInformation.PENDING],
+            next_retry_at__lte=timezone.now(),
+        ).order_by("next_retry_at")
+        claim_token = TransactionService.new_claim_token()
+        return TransactionService.__retry(
+            TransactionService.claim_retry_candidates(due, limit=batch_size, claim_token=claim_token),
+            claim_token=claim_token,
+        )
+
+    @staticmethod
+    def requeue_dead_letters(transaction_ids: Iterable[str] | None = None) -> int:
+        """
+        Move the dead letters, all or the ones of the `transaction_ids`, back to failed with their retries reset,
+        so they are retried by the next run of the periodic retry task, like after fixing their data.
+        Returns the number of requeued transactions.
+        """
+        dead_letters = SageX3TransactionInformation.objects.filter(status=SageX3TransactionInformation.DEAD_LETTER)
+        if transaction_ids is not None:
+            dead_letters = dead_letters.filter(transaction__transaction_id__in=list(transaction_ids))
+        now = timezone.now()
+        return dead_letters.update(
+            status=SageX3TransactionInformation.FAILED, retries=0, next_retry_at=now, updated_at=now
+        )
+
+    @staticmethod
+    def __retry(
+        sagex3_to_retry: Iterable[SageX3TransactionInformation],
+        claim_token: str,
+        workers: int | None = None,
+        max_in_flight: int | None = None,
+        force: bool = False,
+    ):
+        """
+        Retry sending the transactions of the given `SageX3TransactionInformation`,
+        claimed with the `claim_token`, counting the results.
+
+        The transactions are sent in batches of `TRANSACTION_PROCESSOR_SEND_BATCH_SIZE` with `send_transactions`.
+        """
+        counters = {"success": 0, "failed": 0, "total_count": 0, "latencies": []}
+        batch_size = getattr(settings, "TRANSACTION_PROCESSOR_SEND_BATCH_SIZE")
+
+        sagex3_to_retry = iter(sagex3_to_retry)
+        while batch := [sagex3.transaction for sagex3 in islice(sagex3_to_retry, batch_size)]:
+            for task in TransactionService.send_transactions(
+                batch, claim_token=claim_token, workers=workers, max_in_flight=max_in_flight, force=force
+            ):
+                counters["total_count"] += 1
+                counters["latencies"].append(task.elapsed)
+                if task.result:
                     counters["success"] += 1
                 else:
                     counters["failed"] += 1
-            except Exception as e:
-                print(f"Error while retrying: {e}")
-                counters["failed"] += 1
 
         return counters
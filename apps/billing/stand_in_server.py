@@ -0,0 +1,155 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from apps.billing.mocks import ILINK_RESPONSE_MOCK, xml_success_response_mock
+
+log = logging.getLogger(__name__)
+
+_FLD_PATTERN = re.compile(r'<FLD NAME="(\w+)"[^>/]*>([^<]*)</FLD>')
+_ADDRESS_PATTERN = re.compile(r'<LST NAME="YBPAADDLIG"[^>]*>(.*?)</LST>', re.DOTALL)
+
+_NAU_FIELDS = ("SIVTYP", "INVREF", "INVDAT", "BPCINV", "CUR")
+_BILLING_FIELDS = ("VACBPR", "PRITYP")
+_CLIENT_FIELDS = ("YPOSCOD", "YCTY", "YBPIEECNUM", "YILINKMAIL", "YPAM")
+_ITEM_FIELDS = ("ITMREF", "ITMDES", "ITMDES1", "QTY", "STU", "GROPRI", "DISCRGVAL1", "VACITM1")
+
+
+@dataclass
+class StandInConfig:
+    """
+    The behaviour of the stand-in server.
+
+    Each response waits `latency` seconds, plus a random jitter up to `jitter` seconds,
+    a ratio of `error_rate` of the requests fail with a server error, and when `max_rps` is set
+    the requests are served at that rate at most, the others wait on a queue as on a saturated service.
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    max_rps: float | None = None
+
+
+class _RateLimiter:
+    """
+    A thread safe limiter that spaces the requests to serve at most `rate` per second.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.__interval = 1.0 / rate
+        self.__next = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self.__lock:
+            now = time.monotonic()
+            start = max(now, self.__next)
+            self.__next = start + self.__interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def sage_x3_success_response(request_body: str) -> str:
+    """
+    The `Sage X3` response of a successful save of the invoice on the request,
+    the same response that is used to mock `Sage X3` on the tests.
+    """
+    fields = {}
+    for name, value in _FLD_PATTERN.findall(request_body):
+        fields.setdefault(name, value)
+    address = _ADDRESS_PATTERN.search(request_body)
+    return xml_success_response_mock(
+        {
+            "nau_data": {name: fields.get(name, "") for name in _NAU_FIELDS},
+            "billing_data": {name: fields.get(name, "") for name in _BILLING_FIELDS},
+            "client_data": {name: fields.get(name, "") for name in _CLIENT_FIELDS},
+            "transaction_item_data": {name: fields.get(name, "") for name in _ITEM_FIELDS},
+            "address_items": address.group(1).strip() if address else "",
+        }
+    )
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    A local HTTP server that stands in for `Sage X3` and `iLink`, replaying the responses of `apps.billing.mocks`.
+
+    The `POST` requests are answered as the `Sage X3` SOAP service and the `GET` requests as the `iLink` API,
+    whatever their path, so both `TRANSACTION_PROCESSOR_URL` and `RECEIPT_HOST_URL` can point to it.
+    It keeps the count of the requests served, by method and status code, on `stats`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], config: StandInConfig | None = None) -> None:
+        super().__init__(address, StandInRequestHandler)
+        self.config = config or StandInConfig()
+        self.rate_limiter = _RateLimiter(self.config.max_rps) if self.config.max_rps else None
+        self.stats: dict[str, int] = {}
+        self.__stats_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def count(self, method: str, status_code: int) -> None:
+        key = f"{method} {status_code}"
+        with self.__stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def start_in_background(self) -> threading.Thread:
+        """
+        Serve on a daemon thread, until `shutdown` is called.
+        """
+        thread = threading.Thread(target=self.serve_forever, name="stand-in-server", daemon=True)
+        thread.start()
+        return thread
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+    server: StandInServer
+    protocol_version = "HTTP/1.1"
+
+    def __simulate_service(self) -> bool:
+        """
+        Wait as the service would, returning if the request should fail.
+        """
+        config = self.server.config
+        if self.server.rate_limiter:
+            self.server.rate_limiter.wait()
+        delay = config.latency + random.uniform(0, config.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        return random.random() < config.error_rate
+
+    def __respond(self, status_code: int, content_type: str, body: str) -> None:
+        content = body.encode("utf-8")
+        # counted before answering, so the stats already include the request when the client gets the response
+        self.server.count(self.command, status_code)
+        self.send_response(status_code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self) -> None:
+        request_body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8", "ignore")
+        if self.__simulate_service():
+            self.__respond(500, "text/plain; charset=utf-8", "Some not expected error")
+            return
+        self.__respond(200, "text/xml; charset=utf-8", sage_x3_success_response(request_body))
+
+    def do_GET(self) -> None:
+        if self.__simulate_service():
+            self.__respond(500, "application/json", json.dumps({"success": False, "errors": []}))
+            return
+        self.__respond(200, "application/json", json.dumps(ILINK_RESPONSE_MOCK))
+
+    def log_message(self, format: str, *args) -> None:
+        log.debug("%s - %s", self.address_string(), format % args)
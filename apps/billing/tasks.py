@@ -1,18 +1,118 @@
+import logging
+
+import requests
 from celery import shared_task
-from django.db import transaction as db_transaction
+from django.conf import settings
 
-from apps.billing.models import Transaction
+from apps.billing.models import SageX3TransactionInformation, Transaction
+from apps.billing.services.payload_archive_service import PayloadArchiveService
+from apps.billing.services.receipt_host_service import ReceiptDocumentHost
 from apps.billing.services.transaction_service import TransactionService
 
+log = logging.getLogger(__name__)
+
+# the xml payloads are only written when sending, so they aren't loaded
+DEFERRED_INFORMATION_FIELDS = tuple(
+    f"sage_x3_transaction_information__{field}" for field in SageX3TransactionInformation.PAYLOAD_FIELDS
+)
+
 
 @shared_task(name="apps.billing.tasks.create_and_async_send_transactions_to_processor_task")
-def create_and_async_send_transactions_to_processor_task(transaction: Transaction):
-    # create the Transaction Service that will initialize the internal objects
-    # and mark it to pending to be sent.
-    with db_transaction.atomic():
-        TransactionService(transaction=transaction)
+def create_and_async_send_transactions_to_processor_task(transaction_id: int):
+    """
+    Send a transaction to the transaction processor.
 
-    transaction.refresh_from_db()
+    It receives only the primary key of the transaction, so the message can be serialized as json,
+    and loads the transaction with its items on the worker side.
+    """
+    try:
+        transaction = (
+            Transaction.objects.select_related("sage_x3_transaction_information")
+            .defer(*DEFERRED_INFORMATION_FIELDS)
+            .prefetch_related("transaction_items")
+            .get(pk=transaction_id)
+        )
+    except Transaction.DoesNotExist:
+        log.error("The transaction with id=%s to send to the processor doesn't exist", transaction_id)
+        return
 
-    # send
     TransactionService(transaction=transaction).run_steps_to_send_transaction()
+
+
+@shared_task(name="apps.billing.tasks.send_transactions_to_processor_task")
+def send_transactions_to_processor_task(transaction_ids: list[int]):
+    """
+    Send a batch of transactions to the transaction processor.
+
+    It receives only the primary keys of the transactions, so the message can be serialized as json,
+    and loads the transactions with their items using a fixed number of queries.
+    The transactions are sent concurrently, as a batch.
+    """
+    transactions = (
+        Transaction.objects.filter(pk__in=transaction_ids)
+        .select_related("sage_x3_transaction_information")
+        .defer(*DEFERRED_INFORMATION_FIELDS)
+        .prefetch_related("transaction_items")
+    )
+    TransactionService.send_transactions(transactions)
+
+
+@shared_task(name="apps.billing.tasks.retry_due_transactions_task")
+def retry_due_transactions_task() -> dict:
+    """
+    Periodic task that retries the failed sends to the transaction processor whose backoff has elapsed.
+    """
+    counters = TransactionService.retry_due_transactions()
+    log.info(
+        "Retried %s due transactions, success=%s failed=%s",
+        counters["total_count"],
+        counters["success"],
+        counters["failed"],
+    )
+    return {key: counters[key] for key in ("success", "failed", "total_count")}
+
+
+@shared_task(name="apps.billing.tasks.archive_transaction_payloads_task")
+def archive_transaction_payloads_task() -> dict:
+    """
+    Periodic task that archives on the default storage the xml payloads of the old successful sends.
+    """
+    counters = PayloadArchiveService().archive()
+    log.info("Archived the payloads of %s transactions on %s bundles", counters["transactions"], counters["bundles"])
+    return counters
+
+
+@shared_task(name="apps.billing.tasks.resolve_receipt_link_task")
+def resolve_receipt_link_task(transaction_id: int, attempt: int = 0):
+    """
+    Resolve the receipt link of a transaction sent with success, and save it on the transaction,
+    so the receipt link api answers without calling the receipt host.
+
+    While the document isn't published on the receipt host the task is scheduled again, with an
+    exponential backoff, until `RECEIPT_LINK_RESOLVE_MAX_ATTEMPTS` attempts.
+    """
+    transaction = (
+        Transaction.objects.filter(pk=transaction_id)
+        .only("pk", "transaction_id", "document_id", "receipt_file_url")
+        .first()
+    )
+    if transaction is None or not transaction.document_id or transaction.receipt_file_url:
+        return
+
+    try:
+        ReceiptDocumentHost().get_transaction_receipt_link(transaction)
+    except requests.exceptions.RequestException as e:
+        attempt += 1
+        if attempt >= getattr(settings, "RECEIPT_LINK_RESOLVE_MAX_ATTEMPTS"):
+            log.warning(
+                "The receipt link of the transaction %s wasn't resolved after %s attempts, e=%s",
+                transaction.transaction_id,
+                attempt,
+                e,
+            )
+            return
+        countdown = min(
+            getattr(settings, "RECEIPT_LINK_RESOLVE_BACKOFF_BASE") * 2 ** (attempt - 1),
+            getattr(settings, "RECEIPT_LINK_RESOLVE_BACKOFF_MAX"),
+        )
+        resolve_receipt_link_task.apply_async(args=[transaction_id, attempt], countdown=countdown)
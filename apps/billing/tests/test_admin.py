@@ -0,0 +1,88 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib import admin, messages
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from apps.billing.admin import RetryListFilter, SageX3TransactionInformationAdmin
+from apps.billing.factories import SageX3TransactionInformationFactory, TransactionFactory, TransactionItemFactory
+from apps.billing.models import SageX3TransactionInformation
+from apps.billing.tests.test_utils import processor_success_response
+
+
+@override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
+class SageX3TransactionInformationAdminTestCase(TestCase):
+    """
+    Tests the admin of the `SageX3TransactionInformation`.
+    """
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_retry_sage_transaction_action(self, mocked_post):
+        """
+        The admin action sends the selected transactions as a batch, with a message for each one.
+        """
+        informations = []
+        for transaction in TransactionFactory.create_batch(3):
+            TransactionItemFactory.create(transaction=transaction)
+            informations.append(
+                SageX3TransactionInformationFactory.create(
+                    transaction=transaction, status=SageX3TransactionInformation.FAILED
+                )
+            )
+        model_admin = SageX3TransactionInformationAdmin(SageX3TransactionInformation, admin.site)
+
+        with mock.patch.object(model_admin, "message_user") as mocked_message_user:
+            model_admin.retry_sage_transaction(
+                RequestFactory().post("/"),
+                SageX3TransactionInformation.objects.filter(pk__in=[i.pk for i in informations]),
+            )
+
+        self.assertEqual(mocked_post.call_count, 3)
+        self.assertEqual([call.args[2] for call in mocked_message_user.call_args_list], [messages.SUCCESS] * 3)
+        self.assertEqual(
+            SageX3TransactionInformation.objects.filter(status=SageX3TransactionInformation.SUCCESS).count(), 3
+        )
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_retry_sage_transaction_action_already_sent(self, mocked_post):
+        """
+        The admin action sends again the selected transactions already sent.
+        """
+        transaction = TransactionFactory.create()
+        TransactionItemFactory.create(transaction=transaction)
+        information = SageX3TransactionInformationFactory.create(
+            transaction=transaction, status=SageX3TransactionInformation.SUCCESS
+        )
+        model_admin = SageX3TransactionInformationAdmin(SageX3TransactionInformation, admin.site)
+
+        with mock.patch.object(model_admin, "message_user") as mocked_message_user:
+            model_admin.retry_sage_transaction(
+                RequestFactory().post("/"), SageX3TransactionInformation.objects.filter(pk=information.pk)
+            )
+
+        self.assertEqual(mocked_post.call_count, 1)
+        self.assertEqual([call.args[2] for call in mocked_message_user.call_args_list], [messages.SUCCESS])
+        information.refresh_from_db()
+        self.assertEqual(information.status, SageX3TransactionInformation.SUCCESS)
+
+    def test_retry_filter(self):
+        """
+        The transactions are filtered by their automatic retry.
+        """
+        now = timezone.now()
+        due = SageX3TransactionInformationFactory.create(
+            status=SageX3TransactionInformation.FAILED, next_retry_at=now - timedelta(minutes=1)
+        )
+        scheduled = SageX3TransactionInformationFactory.create(
+            status=SageX3TransactionInformation.FAILED, next_retry_at=now + timedelta(minutes=1)
+        )
+        SageX3TransactionInformationFactory.create(status=SageX3TransactionInformation.DEAD_LETTER, next_retry_at=None)
+        model_admin = SageX3TransactionInformationAdmin(SageX3TransactionInformation, admin.site)
+        request = RequestFactory().get("/")
+
+        for value, expected in (("due", due), ("scheduled", scheduled)):
+            retry_filter = RetryListFilter(request, {"retry": value}, SageX3TransactionInformation, model_admin)
+            self.assertEqual(
+                list(retry_filter.queryset(request, SageX3TransactionInformation.objects.all())), [expected]
+            )
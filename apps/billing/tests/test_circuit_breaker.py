@@ -0,0 +1,170 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.billing.factories import TransactionFactory, TransactionItemFactory
+from apps.billing.mocks import MockResponse
+from apps.billing.models import SageX3TransactionInformation
+from apps.billing.services.processor_service import SageX3Processor
+from apps.billing.services.transaction_service import TransactionService
+from apps.billing.tests.test_transaction_service import raise_timeout
+from apps.billing.tests.test_utils import processor_success_response
+from apps.util.circuit_breaker import CircuitBreaker
+
+
+@override_settings(
+    TRANSACTION_PROCESSOR_URL="http://fake-processor.com",
+    TRANSACTION_PROCESSOR_CIRCUIT_BREAKER_FAILURE_THRESHOLD=2,
+    TRANSACTION_PROCESSOR_CIRCUIT_BREAKER_RESET_TIMEOUT=30,
+)
+class SageX3CircuitBreakerTestCase(TestCase):
+    """
+    Tests the circuit breaker around the `Sage X3` service.
+    """
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def _send(self) -> SageX3TransactionInformation:
+        transaction = TransactionFactory.create()
+        TransactionItemFactory.create(transaction=transaction)
+        TransactionService(transaction).run_steps_to_send_transaction()
+        return SageX3TransactionInformation.objects.get(transaction=transaction)
+
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
+    def test_circuit_breaker_opens_after_consecutive_failures(self, mocked_post):
+        """
+        After the threshold of consecutive failures the sends are kept pending, without calling the service.
+        """
+        self.assertEqual(self._send().status, SageX3TransactionInformation.FAILED)
+        self.assertEqual(SageX3Processor.circuit_breaker().state, CircuitBreaker.CLOSED)
+        self.assertEqual(self._send().status, SageX3TransactionInformation.FAILED)
+        self.assertEqual(SageX3Processor.circuit_breaker().state, CircuitBreaker.OPEN)
+
+        with self.assertLogs(logger="apps.billing.services.transaction_service", level="WARNING") as cm:
+            information = self._send()
+
+        self.assertEqual(mocked_post.call_count, 2)
+        self.assertEqual(information.status, SageX3TransactionInformation.PENDING)
+        self.assertEqual(information.error_messages, "")
+        self.assertIsNotNone(information.next_retry_at)
+        self.assertIsNone(information.claimed_by)
+        self.assertIn("circuit breaker sage_x3 is open", "\n".join(cm.output))
+
+    @mock.patch("requests.Session.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
+    def test_circuit_breaker_counts_server_errors(self, mocked_post):
+        """
+        The server errors count as failures of the circuit breaker.
+        """
+        self._send()
+        self._send()
+
+        self.assertEqual(SageX3Processor.circuit_breaker().state, CircuitBreaker.OPEN)
+
+    def test_circuit_breaker_success_resets_failures(self):
+        """
+        Only consecutive failures open the circuit breaker.
+        """
+        with mock.patch("requests.Session.post", side_effect=raise_timeout):
+            self._send()
+        with mock.patch("requests.Session.post", side_effect=processor_success_response):
+            self._send()
+        with mock.patch("requests.Session.post", side_effect=raise_timeout):
+            self._send()
+
+        self.assertEqual(SageX3Processor.circuit_breaker().state, CircuitBreaker.CLOSED)
+
+    @mock.patch("apps.util.circuit_breaker.time.time")
+    def test_circuit_breaker_half_open_probe(self, mocked_time):
+        """
+        After the reset timeout a single send probes the service, closing the circuit breaker when it succeeds.
+        """
+        mocked_time.return_value = 1000
+        with mock.patch("requests.Session.post", side_effect=raise_timeout):
+            self._send()
+            self._send()
+
+        mocked_time.return_value = 1031
+        circuit_breaker = SageX3Processor.circuit_breaker()
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(circuit_breaker.allow_request())
+        self.assertFalse(circuit_breaker.allow_request())
+
+        circuit_breaker.record_success()
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.CLOSED)
+
+    @mock.patch("apps.util.circuit_breaker.time.time")
+    def test_circuit_breaker_half_open_probe_failure(self, mocked_time):
+        """
+        A failed probe opens the circuit breaker again.
+        """
+        mocked_time.return_value = 1000
+        with mock.patch("requests.Session.post", side_effect=raise_timeout):
+            self._send()
+            self._send()
+            mocked_time.return_value = 1031
+            self.assertEqual(self._send().status, SageX3TransactionInformation.FAILED)
+
+        self.assertEqual(SageX3Processor.circuit_breaker().state, CircuitBreaker.OPEN)
+
+    @mock.patch("apps.util.circuit_breaker.time.time")
+    def test_circuit_breaker_in_flight_failures_keep_open_window(self, mocked_time):
+        """
+        The failures of the calls in flight when the circuit breaker opened don't extend the time it is open.
+        """
+        circuit_breaker = SageX3Processor.circuit_breaker()
+        mocked_time.return_value = 1000
+        circuit_breaker.record_failure()
+        circuit_breaker.record_failure()
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.OPEN)
+
+        mocked_time.return_value = 1020
+        circuit_breaker.record_failure()
+
+        self.assertEqual(circuit_breaker.status()["opened_at"], 1000)
+        mocked_time.return_value = 1031
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.HALF_OPEN)
+
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
+    def test_processor_status_endpoint(self, mocked_post):
+        """
+        The state of the circuit breaker is exposed on the processor status endpoint.
+        """
+        self._send()
+        self._send()
+
+        user = get_user_model().objects.create(username="user_test", password="pwd_test")
+        api_client = APIClient()
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+        response = api_client.get("/api/billing/processor-status/")
+
+        self.assertEqual(response.status_code, 200)
+        circuit_breaker = response.data["response"]["circuit_breaker"]
+        self.assertEqual(circuit_breaker["name"], "sage_x3")
+        self.assertEqual(circuit_breaker["state"], CircuitBreaker.OPEN)
+        self.assertEqual(circuit_breaker["failure_threshold"], 2)
+
+    @override_settings(TRANSACTION_PROCESSOR="apps.billing.tests.test_processor_registry.FakeProcessor")
+    def test_processor_status_endpoint_without_circuit_breaker(self):
+        """
+        The processor status endpoint reads the circuit breaker of the configured processor, if it has one.
+        """
+        user = get_user_model().objects.create(username="user_test", password="pwd_test")
+        api_client = APIClient()
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+        response = api_client.get("/api/billing/processor-status/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data["response"]["circuit_breaker"])
+
+    def test_processor_status_endpoint_requires_authentication(self):
+        """
+        The processor status endpoint isn't public.
+        """
+        response = APIClient().get("/api/billing/processor-status/")
+
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,30 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.billing.models import Transaction
+
+
+class CommandBenchmarkSageX3ProcessorTestCase(TestCase):
+    """
+    Test the `benchmark_sagex3_processor` Django command.
+    """
+
+    def test_command_benchmark_sagex3_processor(self):
+        """
+        This test ensures the command reports a line for each number of items and one comparing the country names,
+        without keeping any transaction.
+        """
+        out = StringIO()
+
+        call_command("benchmark_sagex3_processor", "--items", "1", "3", "--iterations=1", stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith("1 items: "))
+        self.assertTrue(lines[1].startswith("3 items: "))
+        self.assertIn("µs per invoice", lines[0])
+        self.assertTrue(lines[2].startswith("country name: "))
+        self.assertIn("µs precomputed", lines[2])
+        self.assertEqual(Transaction.objects.count(), 0)
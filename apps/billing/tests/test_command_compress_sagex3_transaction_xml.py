@@ -0,0 +1,39 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.billing.factories import SageX3TransactionInformationFactory
+from apps.billing.models import SageX3TransactionInformation
+
+
+class CommandCompressSageX3TransactionXmlTestCase(TestCase):
+    """
+    Test the `compress_sagex3_transaction_xml` Django command.
+    """
+
+    def test_command_compress_sagex3_transaction_xml(self):
+        """
+        This test ensures the xml payloads stored as text are compressed, in batches,
+        keeping the payloads already compressed.
+        """
+        informations = SageX3TransactionInformationFactory.create_batch(3)
+        SageX3TransactionInformation.objects.filter(pk__in=[info.pk for info in informations[:2]]).update(
+            input_xml_text="<xml>input</xml>",
+            input_xml_compressed=None,
+            output_xml_text="<xml>output</xml>",
+            output_xml_compressed=None,
+        )
+        out = StringIO()
+
+        call_command("compress_sagex3_transaction_xml", "--batch-size=1", stdout=out)
+
+        self.assertIn("2 Transactions were compressed", out.getvalue())
+        for information, input_xml in zip(informations, ["<xml>input</xml>", "<xml>input</xml>", "<xml></xml>"]):
+            information = SageX3TransactionInformation.all_objects.get(pk=information.pk)
+            self.assertIsNone(information.input_xml_text)
+            self.assertIsNone(information.output_xml_text)
+            self.assertEqual(information.input_xml, input_xml)
+        self.assertEqual(
+            SageX3TransactionInformation.all_objects.get(pk=informations[0].pk).output_xml, "<xml>output</xml>"
+        )
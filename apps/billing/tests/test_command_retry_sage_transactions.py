@@ -2,7 +2,7 @@ from io import StringIO
 from unittest import mock
 
 from django.core.management import call_command
-from django.test import TestCase, override_settings
+from django.test import TestCase, TransactionTestCase, override_settings
 
 from apps.billing.factories import SageX3TransactionInformationFactory, TransactionFactory, TransactionItemFactory
 from apps.billing.mocks import MockResponse
@@ -17,7 +17,7 @@ class CommandRetrySageTransactionsTestCase(TestCase):
     """
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_command_retry_sage_transactions_no_transactions(self, mocked_post):
         """
         This test ensures the custom command functionality with no transactions to retry.
@@ -32,7 +32,7 @@ class CommandRetrySageTransactionsTestCase(TestCase):
         self.assertTrue(message in out.getvalue())
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_command_retry_sage_transactions_not_found_transaction(self, mocked_post):
         """
         This test ensures the custom command functionality with a not found `transaction_id`.
@@ -47,7 +47,7 @@ class CommandRetrySageTransactionsTestCase(TestCase):
         self.assertTrue(message in out.getvalue())
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_command_retry_sage_transactions_success_PENDIND_status(self, mocked_post):
         """
         This test ensures the custom command functionality for a transaction with `PENDING` status.
@@ -68,7 +68,7 @@ class CommandRetrySageTransactionsTestCase(TestCase):
         self.assertTrue(message in out.getvalue())
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_command_retry_sage_transactions_success_FAILED_status(self, mocked_post):
         """
         This test ensures the custom command functionality for a transaction with `FAILED` status.
@@ -87,7 +87,7 @@ class CommandRetrySageTransactionsTestCase(TestCase):
         self.assertTrue(message in out.getvalue())
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_command_retry_sage_transactions_success_without_transaction_id(self, mocked_post):
         """
         This test ensures the custom command functionality without providing a `transaction_id`.
@@ -114,7 +114,7 @@ class CommandRetrySageTransactionsTestCase(TestCase):
         self.assertTrue(message in out.getvalue())
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
+    @mock.patch("requests.Session.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
     def test_command_retry_sage_transactions_error_PENDIND_status(self, mocked_post):
         """
         This test ensures the custom command functionality receiving an internal server error
@@ -136,7 +136,7 @@ class CommandRetrySageTransactionsTestCase(TestCase):
         self.assertTrue(message in out.getvalue())
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
+    @mock.patch("requests.Session.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
     def test_command_retry_sage_transactions_error_FAILED_status(self, mocked_post):
         """
         This test ensures the custom command functionality receiving an internal server error
@@ -156,7 +156,7 @@ class CommandRetrySageTransactionsTestCase(TestCase):
         self.assertTrue(message in out.getvalue())
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
+    @mock.patch("requests.Session.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
     def test_command_retry_sage_transactions_error_without_transaction_id(self, mocked_post):
         """
         This test ensures the custom command functionality receiving an internal server error
@@ -184,7 +184,7 @@ class CommandRetrySageTransactionsTestCase(TestCase):
         self.assertTrue(message in out.getvalue())
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", side_effect=raise_timeout)
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
     def test_command_retry_sage_transactions_timeout_error_PENDIND_status(self, mocked_post):
         """
         This test ensures the custom command functionality receiving a timeout error
@@ -206,7 +206,7 @@ class CommandRetrySageTransactionsTestCase(TestCase):
         self.assertTrue(message in out.getvalue())
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", side_effect=raise_timeout)
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
     def test_command_retry_sage_transactions_timeout_error_FAILED_status(self, mocked_post):
         """
         This test ensures the custom command functionality receiving a timeout error
@@ -226,7 +226,7 @@ class CommandRetrySageTransactionsTestCase(TestCase):
         self.assertTrue(message in out.getvalue())
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", side_effect=raise_timeout)
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
     def test_command_retry_sage_transactions_timeout_error_without_transaction_id(self, mocked_post):
         """
         This test ensures the custom command functionality receiving a timeout error
@@ -254,7 +254,7 @@ class CommandRetrySageTransactionsTestCase(TestCase):
         self.assertTrue(message in out.getvalue())
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", side_effect=processor_duplicate_error_response)
+    @mock.patch("requests.Session.post", side_effect=processor_duplicate_error_response)
     def test_command_retry_sage_transactions_duplicate_error_PENDING_status(self, mocked_post):
         """
         This test ensures the custom command functionality receiving a duplicate error response
@@ -276,7 +276,7 @@ class CommandRetrySageTransactionsTestCase(TestCase):
         self.assertTrue(message in out.getvalue())
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", side_effect=processor_duplicate_error_response)
+    @mock.patch("requests.Session.post", side_effect=processor_duplicate_error_response)
     def test_command_retry_sage_transactions_duplicate_error_FAILED_status(self, mocked_post):
         """
         This test ensures the custom command functionality receiving a duplicate error response
@@ -296,7 +296,7 @@ class CommandRetrySageTransactionsTestCase(TestCase):
         self.assertTrue(message in out.getvalue())
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", side_effect=processor_duplicate_error_response)
+    @mock.patch("requests.Session.post", side_effect=processor_duplicate_error_response)
     def test_command_retry_sage_transactions_duplicate_error(self, mocked_post):
         """
         This test ensures the custom command functionality receiving a duplicate error response
@@ -322,3 +322,37 @@ class CommandRetrySageTransactionsTestCase(TestCase):
         message = "----- 20 Transactions were retried -----\n\nSUCCESSFULL RETRIES: 20 FAILED RETRIES: 0"
 
         self.assertTrue(message in out.getvalue())
+
+
+class CommandRetrySageTransactionsConcurrentTestCase(TransactionTestCase):
+    """
+    Test the `retry_sage_transactions` Django command sending the transactions concurrently.
+
+    The transactions need to be committed, so the worker threads can see them.
+    """
+
+    @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_command_retry_sage_transactions_workers(self, mocked_post):
+        """
+        This test ensures the counters and the throughput line when retrying with multiple workers.
+        """
+
+        out = StringIO()
+
+        for transaction in TransactionFactory.create_batch(6):
+            TransactionItemFactory.create(transaction=transaction)
+            SageX3TransactionInformationFactory.create(
+                transaction=transaction, status=SageX3TransactionInformation.FAILED
+            )
+
+        call_command("retry_sage_transactions", "--workers=3", stdout=out)
+
+        message = "----- 6 Transactions were retried -----\n\nSUCCESSFULL RETRIES: 6 FAILED RETRIES: 0"
+
+        self.assertIn(message, out.getvalue())
+        self.assertRegex(out.getvalue(), r"THROUGHPUT: [\d.]+ tx/s LATENCY p50: \d+ ms p95: \d+ ms")
+        self.assertEqual(mocked_post.call_count, 6)
+        self.assertEqual(
+            SageX3TransactionInformation.objects.filter(status=SageX3TransactionInformation.SUCCESS).count(), 6
+        )
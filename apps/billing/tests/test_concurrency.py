@@ -0,0 +1,33 @@
+import threading
+from unittest import mock
+
+from django.db import connections
+from django.test import TestCase
+
+from apps.util.concurrency import run_concurrently
+
+
+class RunConcurrentlyTestCase(TestCase):
+    """
+    Tests running the functions concurrently on a pool of threads.
+    """
+
+    def test_connections_closed_once_per_thread(self):
+        """
+        The database connection of each worker thread is reused by all its tasks, and closed after the pool.
+        """
+        used = {}
+
+        def task(item):
+            connections["default"].ensure_connection()
+            used[threading.get_ident()] = connections["default"]
+            return item
+
+        with mock.patch.object(type(connections["default"]), "close", autospec=True) as mocked_close:
+            results = list(run_concurrently(task, range(20), workers=3))
+
+        self.assertEqual(sorted(result.result for result in results), list(range(20)))
+        self.assertEqual(
+            sorted(id(call.args[0]) for call in mocked_close.call_args_list if call.args[0].alias == "default"),
+            sorted(id(thread_connection) for thread_connection in used.values()),
+        )
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.billing.factories import SageX3TransactionInformationFactory
+from apps.billing.models import SageX3TransactionInformation
+from apps.billing.services.payload_archive_service import PayloadArchiveService
+from apps.billing.tasks import archive_transaction_payloads_task
+
+
+@override_settings(
+    STORAGES={"default": {"BACKEND": "django.core.files.storage.InMemoryStorage"}},
+    TRANSACTION_PAYLOAD_ARCHIVE_AGE_DAYS=30,
+    TRANSACTION_PAYLOAD_ARCHIVE_BATCH_SIZE=2,
+    TRANSACTION_PAYLOAD_ARCHIVE_PREFIX="archive",
+)
+class PayloadArchiveServiceTestCase(TestCase):
+    """
+    Tests the archive of the xml payloads on the default storage.
+    """
+
+    def _create_information(self, status: str, days: int) -> SageX3TransactionInformation:
+        information = SageX3TransactionInformationFactory.create(
+            status=status, input_xml=f"<input>{status} {days}</input>", output_xml=f"<output>{status} {days}</output>"
+        )
+        SageX3TransactionInformation.objects.filter(pk=information.pk).update(
+            updated_at=timezone.now() - timedelta(days=days)
+        )
+        return information
+
+    def test_archive(self):
+        """
+        The payloads of the old successful sends are moved to bundles on the storage, and read back from there.
+        """
+        archived = [self._create_information(SageX3TransactionInformation.SUCCESS, days) for days in (31, 32, 33)]
+        recent = self._create_information(SageX3TransactionInformation.SUCCESS, 29)
+        failed = self._create_information(SageX3TransactionInformation.FAILED, 31)
+
+        counters = PayloadArchiveService().archive()
+
+        self.assertEqual(counters, {"transactions": 3, "bundles": 2})
+        for days, information in zip((31, 32, 33), archived):
+            information = SageX3TransactionInformation.objects.get(pk=information.pk)
+            self.assertTrue(information.payload_archive_key.startswith("archive/"))
+            self.assertTrue(default_storage.exists(information.payload_archive_key))
+            self.assertIsNone(information.input_xml_compressed)
+            self.assertIsNone(information.output_xml_compressed)
+            with self.assertNumQueries(1):
+                self.assertEqual(information.input_xml, f"<input>success {days}</input>")
+                self.assertEqual(information.output_xml, f"<output>success {days}</output>")
+        for information in (recent, failed):
+            information = SageX3TransactionInformation.objects.get(pk=information.pk)
+            self.assertIsNone(information.payload_archive_key)
+            self.assertIsNotNone(information.input_xml_compressed)
+
+    def test_archive_without_output(self):
+        """
+        The sends without some payload are archived without a query per row.
+        """
+        for days in (31, 32):
+            information = self._create_information(SageX3TransactionInformation.SUCCESS, days)
+            SageX3TransactionInformation.objects.filter(pk=information.pk).update(output_xml_compressed=None)
+
+        # the batch, its update and the empty next batch
+        with self.assertNumQueries(3):
+            counters = PayloadArchiveService().archive()
+
+        self.assertEqual(counters, {"transactions": 2, "bundles": 1})
+
+    def test_archive_twice(self):
+        """
+        The payloads already archived aren't archived again.
+        """
+        self._create_information(SageX3TransactionInformation.SUCCESS, 31)
+
+        PayloadArchiveService().archive()
+        counters = PayloadArchiveService().archive()
+
+        self.assertEqual(counters, {"transactions": 0, "bundles": 0})
+
+    def test_payload_written_after_archive(self):
+        """
+        A transaction sent again after being archived reads its new payloads from the database.
+        """
+        information = self._create_information(SageX3TransactionInformation.SUCCESS, 31)
+        PayloadArchiveService().archive()
+
+        information = SageX3TransactionInformation.objects.get(pk=information.pk)
+        information.input_xml = "<input>new</input>"
+        information.save()
+
+        information = SageX3TransactionInformation.objects.get(pk=information.pk)
+        self.assertEqual(information.input_xml, "<input>new</input>")
+        self.assertEqual(information.output_xml, "<output>success 31</output>")
+
+    def test_command_archive_sagex3_transaction_xml(self):
+        """
+        The command archives with the given age and batch size.
+        """
+        for days in (11, 13, 14):
+            self._create_information(SageX3TransactionInformation.SUCCESS, days)
+        out = StringIO()
+
+        call_command("archive_sagex3_transaction_xml", "--age-days=12", "--batch-size=10", stdout=out)
+
+        self.assertIn("2 Transactions were archived on 1 bundles", out.getvalue())
+
+    def test_archive_transaction_payloads_task(self):
+        """
+        The periodic task archives the payloads and is on the celery beat schedule.
+        """
+        self._create_information(SageX3TransactionInformation.SUCCESS, 31)
+
+        result = archive_transaction_payloads_task.delay().get()
+
+        self.assertEqual(result, {"transactions": 1, "bundles": 1})
+        tasks = [entry["task"] for entry in settings.CELERY_BEAT_SCHEDULE.values()]
+        self.assertIn("apps.billing.tasks.archive_transaction_payloads_task", tasks)
@@ -6,13 +6,25 @@ from unittest import mock
 
 import factory
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
 from apps.billing.factories import TransactionFactory, TransactionItemFactory
 from apps.billing.models import SageX3TransactionInformation, Transaction
-from apps.billing.serializers import TransactionItemSerializer, TransactionSerializer
+from apps.billing.serializers import (
+    ProcessTransactionListSerializerForAPI,
+    ProcessTransactionSerializerForAPI,
+    TransactionItemSerializer,
+    TransactionSerializer,
+)
+from apps.organization.factories import OrganizationFactory
+from apps.organization.models import Organization
+from apps.shared_revenue.factories import RevenueConfigurationFactory
+from apps.shared_revenue.models import RevenueConfiguration
 
 from .test_transaction_service import processor_success_response
 
@@ -45,7 +57,7 @@ class ProcessTransactionTest(TestCase):
         self.user = get_user_model().objects.create_user(username="testuser", password="testpass")
         self.token = Token.objects.create(user=self.user)
 
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_create_transaction(self, mock):
         """
         Test that a transaction can be created with a valid token.
@@ -72,7 +84,7 @@ class ProcessTransactionTest(TestCase):
 
         self.assertTrue(SageX3TransactionInformation.objects.filter(transaction=transaction).exists())
 
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_doest_not_send_transaction_with_zero_as_total_amount(self, mock):
         """
         Test that a transaction will not be sent to the processor if the total amound sold is zero.
@@ -103,6 +115,44 @@ class ProcessTransactionTest(TestCase):
 
         self.assertFalse(SageX3TransactionInformation.objects.filter(transaction=transaction).exists())
 
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_create_transaction_sent_after_commit(self, mocked_post):
+        """
+        Test that the transaction is only sent to the processor after the commit of the request.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post(self.endpoint, self.payload, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(callbacks), 1)
+        mocked_post.assert_not_called()
+        transaction = Transaction.objects.get(transaction_id=self.payload["transaction_id"])
+        self.assertEqual(transaction.sage_x3_transaction_information.status, SageX3TransactionInformation.PENDING)
+        # scheduled, so it is retried if the task is lost
+        self.assertIsNotNone(transaction.sage_x3_transaction_information.next_retry_at)
+
+        callbacks[0]()
+
+        mocked_post.assert_called_once()
+        transaction.sage_x3_transaction_information.refresh_from_db()
+        self.assertEqual(transaction.sage_x3_transaction_information.status, SageX3TransactionInformation.SUCCESS)
+
+    @mock.patch("apps.billing.serializers.create_and_async_send_transactions_to_processor_task")
+    def test_create_transaction_queues_only_primary_key(self, mocked_task):
+        """
+        Test that only the primary key of the transaction is sent on the task message.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.endpoint, self.payload, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        transaction = Transaction.objects.get(transaction_id=self.payload["transaction_id"])
+        mocked_task.delay.assert_called_once_with(transaction.pk)
+
     def test_create_transaction_without_token(self):
         """
         Test that a transaction cannot be created without a valid token.
@@ -172,7 +222,7 @@ class ProcessTransactionTest(TestCase):
         response = self.client.post(self.endpoint, self.payload, format="json")
         self.assertEqual(response.status_code, 400)
 
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_valid_transaction_item_discount(self, mock):
         """
         This test ensures that is possible to process a transaction with valid discount value in items
@@ -213,7 +263,7 @@ class ProcessTransactionTest(TestCase):
     #     self.assertEqual(response.status_code, 400)
     #     self.assertEqual(str(response.data["discount"][0]), "Ensure this value is greater than or equal to 0.")
 
-    # @mock.patch("requests.post", side_effect=processor_success_response)
+    # @mock.patch("requests.Session.post", side_effect=processor_success_response)
     # def test_invalid_transaction_item_discount_none(self, mock):
     #     """
     #     This test ensures that is not possible to process a transaction without a discount value in items
@@ -225,3 +275,275 @@ class ProcessTransactionTest(TestCase):
     #     response = self.client.post(self.endpoint, invalid_payload, format="json")
 
     #     self.assertEqual(response.status_code, 201)
+
+
+class ProcessTransactionBulkTest(TestCase):
+    """
+    A test case for the ProcessTransactionBulk view.
+    """
+
+    def setUp(self):
+        """
+        Set up the test case by creating a client, endpoint and a payload with multiple transactions.
+        Also create a new user and generate a token for that user.
+        """
+        self.client = APIClient()
+        self.endpoint = "/api/billing/transaction-complete/bulk/"
+        self.payload = [self._build_transaction_payload() for _ in range(3)]
+
+        self.user = get_user_model().objects.create_user(username="testuser", password="testpass")
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    @staticmethod
+    def _build_transaction_payload(items_count: int = 1) -> dict:
+        transaction = TransactionFactory.build()
+        data = factory.build(dict, **TransactionSerializer(transaction).data)
+        data["items"] = [
+            factory.build(
+                dict, **TransactionItemSerializer(TransactionItemFactory.build(transaction=transaction)).data
+            )
+            for _ in range(items_count)
+        ]
+        return data
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_create_transactions_bulk(self, mocked_post):
+        """
+        Test that all the transactions and its items are created and sent to the processor.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.endpoint, self.payload, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        results = response.data["data"]
+        self.assertEqual(len(results), 3)
+        for entry, result in zip(self.payload, results):
+            self.assertEqual(result["transaction_id"], entry["transaction_id"])
+            self.assertEqual(result["status"], "created")
+
+            transaction = Transaction.objects.get(transaction_id=entry["transaction_id"])
+            self.assertEqual(transaction.transaction_items.count(), 1)
+            self.assertEqual(transaction.sage_x3_transaction_information.status, SageX3TransactionInformation.SUCCESS)
+
+        self.assertEqual(mocked_post.call_count, 3)
+
+    @override_settings(TRANSACTION_RETRY_BACKOFF_BASE=60)
+    @mock.patch("apps.billing.serializers.send_transactions_to_processor_task")
+    def test_create_transactions_bulk_scheduled(self, mocked_task):
+        """
+        Test that the transactions are scheduled to be retried, in case their send task is lost.
+        """
+        response = self.client.post(self.endpoint, self.payload, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        mocked_task.delay.assert_not_called()
+        for information in SageX3TransactionInformation.objects.all():
+            self.assertEqual(information.status, SageX3TransactionInformation.PENDING)
+            self.assertAlmostEqual((information.next_retry_at - timezone.now()).total_seconds(), 60, delta=10)
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_create_transactions_bulk_partial_errors(self, mocked_post):
+        """
+        Test that the valid entries are created and that the invalid ones are reported with its errors.
+        """
+        self.payload[0] = self._build_transaction_payload(items_count=2)
+        TransactionFactory.create(transaction_id=self.payload[1]["transaction_id"])
+        del self.payload[2]["items"]
+
+        response = self.client.post(self.endpoint, self.payload, format="json")
+
+        self.assertEqual(response.status_code, 207)
+        results = response.data["data"]
+        self.assertEqual(results[0]["status"], "created")
+        self.assertEqual(results[1]["status"], "error")
+        self.assertEqual(
+            str(results[1]["errors"]["transaction_id"][0]), "transaction with this transaction id already exists."
+        )
+        self.assertEqual(results[2]["status"], "error")
+        self.assertIn("items", results[2]["errors"])
+        self.assertEqual(
+            Transaction.objects.get(transaction_id=self.payload[0]["transaction_id"]).transaction_items.count(), 2
+        )
+        self.assertFalse(Transaction.objects.filter(transaction_id=self.payload[2]["transaction_id"]).exists())
+
+    def test_create_transactions_bulk_duplicated_transaction_id(self):
+        """
+        Test that a transaction id repeated on the same request is only created once.
+        """
+        self.payload[1]["transaction_id"] = self.payload[0]["transaction_id"]
+
+        response = self.client.post(self.endpoint, self.payload[:2], format="json")
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data["data"][0]["status"], "created")
+        self.assertEqual(response.data["data"][1]["status"], "error")
+        self.assertEqual(Transaction.objects.filter(transaction_id=self.payload[0]["transaction_id"]).count(), 1)
+
+    @mock.patch("apps.billing.serializers.send_transactions_to_processor_task")
+    def test_create_transactions_bulk_concurrent_transaction_id(self, mocked_task):
+        """
+        Test that a transaction id created by a concurrent request, after the validation, is reported as an error
+        while the other entries are still created.
+        """
+        conflicting_transaction_id = self.payload[1]["transaction_id"]
+        create = ProcessTransactionListSerializerForAPI.create
+
+        def create_after_concurrent_request(serializer, validated_data):
+            if not Transaction.objects.filter(transaction_id=conflicting_transaction_id).exists():
+                TransactionFactory.create(transaction_id=conflicting_transaction_id)
+            return create(serializer, validated_data)
+
+        with mock.patch.object(
+            ProcessTransactionListSerializerForAPI,
+            "create",
+            autospec=True,
+            side_effect=create_after_concurrent_request,
+        ):
+            response = self.client.post(self.endpoint, self.payload, format="json")
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result["status"] for result in response.data["data"]], ["created", "error", "created"])
+        self.assertIn("transaction_id", response.data["data"][1]["errors"])
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.assertEqual(SageX3TransactionInformation.objects.count(), 2)
+
+    def test_create_transactions_bulk_all_invalid(self):
+        """
+        Test that nothing is created if all the entries are invalid.
+        """
+        for entry in self.payload:
+            del entry["transaction_id"]
+
+        response = self.client.post(self.endpoint, self.payload, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_create_transactions_bulk_zero_amount_not_sent(self):
+        """
+        Test that a transaction with zero as total amount is created but not marked to be sent.
+        """
+        self.payload[0]["total_amount_include_vat"] = 0
+
+        response = self.client.post(self.endpoint, self.payload[:1], format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(
+            SageX3TransactionInformation.objects.filter(
+                transaction__transaction_id=self.payload[0]["transaction_id"]
+            ).exists()
+        )
+
+    def test_create_transactions_bulk_not_a_list(self):
+        """
+        Test that the payload needs to be a list.
+        """
+        response = self.client.post(self.endpoint, self.payload[0], format="json")
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(TRANSACTION_BULK_MAX_SIZE=2)
+    def test_create_transactions_bulk_max_size(self):
+        """
+        Test that the number of transactions per request is limited.
+        """
+        response = self.client.post(self.endpoint, self.payload, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_create_transactions_bulk_without_token(self):
+        """
+        Test that the transactions cannot be created without a valid token.
+        """
+        self.client.credentials()
+        response = self.client.post(self.endpoint, self.payload, format="json")
+        self.assertEqual(response.status_code, 401)
+
+
+class ProcessTransactionSharedRevenueResourcesTest(TestCase):
+    """
+    A test case for the organization and revenue configuration resolution when processing transactions.
+    """
+
+    def setUp(self):
+        self.serializer = ProcessTransactionSerializerForAPI()
+        self.transaction = TransactionFactory.create()
+
+    def test_create_missing_organizations_and_revenue_configurations(self):
+        """
+        Test that an organization and a revenue configuration are created for each item.
+        """
+        items = TransactionItemFactory.create_batch(3, transaction=self.transaction)
+
+        self.serializer._execute_shared_revenue_resources(items=items)
+
+        for item in items:
+            organization = Organization.objects.get(short_name=item.organization_code)
+            self.assertTrue(
+                RevenueConfiguration.objects.filter(organization=organization, product_id=item.product_id).exists()
+            )
+
+    def test_existing_revenue_configuration_is_not_duplicated(self):
+        """
+        Test that a revenue configuration isn't created if one already exists for the same organization and product.
+        """
+        item = TransactionItemFactory.create(transaction=self.transaction)
+        organization = OrganizationFactory.create(short_name=item.organization_code)
+        RevenueConfigurationFactory.create(organization=organization, product_id=item.product_id)
+
+        self.serializer._execute_shared_revenue_resources(items=[item, item])
+
+        self.assertEqual(Organization.objects.filter(short_name=item.organization_code).count(), 1)
+        self.assertEqual(RevenueConfiguration.objects.filter(product_id=item.product_id).count(), 1)
+
+    def test_revenue_configuration_partner_percentage_not_exceeded(self):
+        """
+        Test that a revenue configuration isn't created if the partner percentage of the product would exceed 100%.
+        """
+        items = TransactionItemFactory.create_batch(2, transaction=self.transaction, product_id="same-product")
+
+        self.serializer._execute_shared_revenue_resources(items=items)
+
+        self.assertEqual(RevenueConfiguration.objects.filter(product_id="same-product").count(), 1)
+
+    def test_organization_error_is_raised(self):
+        """
+        Test that an error resolving the organizations isn't swallowed, as the transaction needs them.
+        """
+        items = TransactionItemFactory.create_batch(2, transaction=self.transaction)
+
+        with mock.patch.object(
+            ProcessTransactionSerializerForAPI, "_get_or_create_organizations", side_effect=DatabaseError("failed")
+        ):
+            with self.assertRaises(DatabaseError):
+                self.serializer._execute_shared_revenue_resources(items=items)
+
+        self.assertFalse(RevenueConfiguration.objects.exists())
+
+    def test_revenue_configuration_error_is_logged(self):
+        """
+        Test that an error creating the revenue configurations is only logged, the organizations are kept.
+        """
+        item = TransactionItemFactory.create(transaction=self.transaction)
+
+        with mock.patch.object(RevenueConfiguration.objects, "bulk_create", side_effect=DatabaseError("failed")):
+            with self.assertLogs("apps.billing.serializers", level="ERROR"):
+                self.serializer._execute_shared_revenue_resources(items=[item])
+
+        self.assertTrue(Organization.objects.filter(short_name=item.organization_code).exists())
+
+    def test_number_of_queries_does_not_depend_on_the_number_of_items(self):
+        """
+        Test that the resolution uses the same number of queries for one or for many items.
+        """
+        with CaptureQueriesContext(connection) as single_item_queries:
+            self.serializer._execute_shared_revenue_resources(
+                items=[TransactionItemFactory.build(transaction=self.transaction)]
+            )
+
+        with CaptureQueriesContext(connection) as many_items_queries:
+            self.serializer._execute_shared_revenue_resources(
+                items=TransactionItemFactory.build_batch(20, transaction=self.transaction)
+            )
+
+        self.assertEqual(len(single_item_queries), len(many_items_queries))
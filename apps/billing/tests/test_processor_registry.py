@@ -0,0 +1,63 @@
+from django.test import TestCase, override_settings
+
+from apps.billing.factories import TransactionFactory, TransactionItemFactory
+from apps.billing.models import SageX3TransactionInformation, Transaction
+from apps.billing.services.financial_processor_service import TransactionProcessorInterface
+from apps.billing.services.processor_registry import get_processor
+from apps.billing.services.processor_service import SageX3Processor
+from apps.billing.services.transaction_service import TransactionService
+
+
+class FakeProcessor(TransactionProcessorInterface):
+    """
+    A processor that keeps the sent data, instead of sending it.
+    """
+
+    def __init__(self, transaction: Transaction | None = None) -> None:
+        super().__init__(transaction)
+        self.sent = []
+
+    def generate_data(self, transaction: Transaction) -> bytes:
+        return f"<fake>{transaction.transaction_id}</fake>".encode("utf-8")
+
+    def send(self, transaction: Transaction, data: bytes):
+        self.sent.append(data)
+        return b"""<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"><soapenv:Body>
+            <resultXml><![CDATA[<RESULT><FLD NAME="NUM">FAKE-1</FLD></RESULT>]]></resultXml>
+        </soapenv:Body></soapenv:Envelope>"""
+
+
+class ProcessorRegistryTestCase(TestCase):
+    """
+    Tests the process wide transaction processor.
+    """
+
+    def test_get_processor_is_reused(self):
+        """
+        A single processor, of the `TRANSACTION_PROCESSOR` setting, is built per process.
+        """
+        self.assertIsInstance(get_processor(), SageX3Processor)
+        self.assertIs(get_processor(), get_processor())
+
+    def test_get_processor_is_rebuilt_on_setting_changed(self):
+        """
+        The processor is built again when the settings change, so it never keeps stale settings.
+        """
+        processor = get_processor()
+        with override_settings(TRANSACTION_PROCESSOR_URL="http://other-processor.com"):
+            self.assertIsNot(get_processor(), processor)
+
+    @override_settings(TRANSACTION_PROCESSOR="apps.billing.tests.test_processor_registry.FakeProcessor")
+    def test_transaction_service_uses_the_processor_setting(self):
+        """
+        The transactions are sent with the processor of the `TRANSACTION_PROCESSOR` setting.
+        """
+        transaction = TransactionFactory.create(transaction_id="TX-1")
+        TransactionItemFactory.create(transaction=transaction)
+
+        self.assertTrue(TransactionService(transaction).run_steps_to_send_transaction())
+
+        self.assertEqual(get_processor().sent, [b"<fake>TX-1</fake>"])
+        information = SageX3TransactionInformation.objects.get(transaction=transaction)
+        self.assertEqual(information.status, SageX3TransactionInformation.SUCCESS)
+        self.assertEqual(information.input_xml, "<fake>TX-1</fake>")
@@ -1,7 +1,11 @@
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
 
+import requests
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase, override_settings
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
@@ -16,6 +20,8 @@ from apps.billing.mocks import (
     MockResponse,
 )
 from apps.billing.models import Transaction
+from apps.billing.services.receipt_host_service import ReceiptDocumentHost
+from apps.billing.tests.test_transaction_service import raise_timeout
 
 
 @override_settings(
@@ -30,12 +36,13 @@ class ReceiptDocumentHostTest(TestCase):
         setting the required parameters to excute the tests.
         """
 
+        cache.clear()
         user = get_user_model().objects.create(username="user_test", password="pwd_test")
         self.token = Token.objects.create(user=user)
         self.api_client = APIClient()
         self.transaction: Transaction = TransactionFactory.create()
 
-    @mock.patch("requests.get", return_value=MockResponse(data=ILINK_RESPONSE_MOCK, status_code=200))
+    @mock.patch("requests.Session.get", return_value=MockResponse(data=ILINK_RESPONSE_MOCK, status_code=200))
     def test_get_document_success(self, mocked_post):
         """
         This test ensures to success getting a file link providing the
@@ -116,7 +123,7 @@ class ReceiptDocumentHostTest(TestCase):
 
         self.assertEqual(response.status_code, 404)
 
-    @mock.patch("requests.get", lambda *args, **kwargs: MockResponse("File not found", status_code=404))
+    @mock.patch("requests.Session.get", lambda *args, **kwargs: MockResponse("File not found", status_code=404))
     def test_get_document_file_not_found(self):
         """
         This test ensures that the file not found exception is correctly handled.
@@ -129,7 +136,7 @@ class ReceiptDocumentHostTest(TestCase):
         self.assertEqual(response.status_code, 404)
         self.assertEqual(response.data["response"], "File not found")
 
-    @mock.patch("requests.get", return_value=MockResponse(UNAUTHORIZED_ILINK_RESPONSE, status_code=500))
+    @mock.patch("requests.Session.get", return_value=MockResponse(UNAUTHORIZED_ILINK_RESPONSE, status_code=500))
     def test_get_document_unauthorized(self, mocked_post):
         """
         This test ensures that the unauthorized exception is correctly handled.
@@ -142,7 +149,7 @@ class ReceiptDocumentHostTest(TestCase):
         self.assertEqual(response.status_code, 500)
         self.assertEqual(response.data["response"], "Occurred an error getting the document")
 
-    @mock.patch("requests.get", lambda *args, **kwargs: MockResponse("File not found", status_code=404))
+    @mock.patch("requests.Session.get", lambda *args, **kwargs: MockResponse("File not found", status_code=404))
     def test_get_document_file_document_id_not_valid(self):
         """
         This test ensures when the `document_id` is not valid, it will return `404`
@@ -165,7 +172,9 @@ class ReceiptDocumentHostTest(TestCase):
         response = self.api_client.get(f"/api/billing/receipt-link/{self.transaction.transaction_id}/")
         self.assertEqual(response.status_code, 404)
 
-    @mock.patch("requests.get", lambda *args, **kwargs: MockResponse(ILINK_RESPONSE_MOCK_NO_DOCUMENT, status_code=200))
+    @mock.patch(
+        "requests.Session.get", lambda *args, **kwargs: MockResponse(ILINK_RESPONSE_MOCK_NO_DOCUMENT, status_code=200)
+    )
     def test_get_document_file_without_document(self):
         """
         This test ensures when `iLink` return a success response without any document link
@@ -178,7 +187,8 @@ class ReceiptDocumentHostTest(TestCase):
         self.assertEqual(response.status_code, 404)
 
     @mock.patch(
-        "requests.get", lambda *args, **kwargs: MockResponse(ILINK_RESPONSE_MOCK_NO_PDF_DOCUMENT, status_code=200)
+        "requests.Session.get",
+        lambda *args, **kwargs: MockResponse(ILINK_RESPONSE_MOCK_NO_PDF_DOCUMENT, status_code=200),
     )
     def test_get_document_file_without_pdf_document(self):
         """
@@ -192,7 +202,8 @@ class ReceiptDocumentHostTest(TestCase):
         self.assertEqual(response.status_code, 404)
 
     @mock.patch(
-        "requests.get", lambda *args, **kwargs: MockResponse(ILINK_RESPONSE_MOCK_WRONG_PDF_KEY, status_code=200)
+        "requests.Session.get",
+        lambda *args, **kwargs: MockResponse(ILINK_RESPONSE_MOCK_WRONG_PDF_KEY, status_code=200),
     )
     def test_get_document_file_wrong_pdf_key_in_response(self):
         """
@@ -204,3 +215,248 @@ class ReceiptDocumentHostTest(TestCase):
         response = self.api_client.get(f"/api/billing/receipt-link/{self.transaction.transaction_id}/")
 
         self.assertEqual(response.status_code, 200)
+
+    @mock.patch("requests.Session.get", return_value=MockResponse(data=ILINK_RESPONSE_MOCK, status_code=200))
+    def test_get_document_cached(self, mocked_get):
+        """
+        This test ensures the file link is cached, so the following requests don't call the receipt host.
+        """
+        self.api_client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+        responses = [
+            self.api_client.get(f"/api/billing/receipt-link/{self.transaction.transaction_id}/") for _ in range(3)
+        ]
+
+        self.assertEqual([response.status_code for response in responses], [200] * 3)
+        self.assertEqual(len({response.data["response"] for response in responses}), 1)
+        mocked_get.assert_called_once()
+
+    @mock.patch("requests.Session.get", return_value=MockResponse("File not found", status_code=404))
+    def test_get_document_file_not_found_cached(self, mocked_get):
+        """
+        This test ensures a file not found is cached for a shorter time, and is requested again after it.
+        """
+        self.api_client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        url = f"/api/billing/receipt-link/{self.transaction.transaction_id}/"
+
+        with override_settings(RECEIPT_LINK_NOT_FOUND_CACHE_TIMEOUT=30):
+            self.assertEqual(self.api_client.get(url).status_code, 404)
+            self.assertEqual(self.api_client.get(url).status_code, 404)
+        self.assertEqual(mocked_get.call_count, 1)
+
+        cache.delete(ReceiptDocumentHost.cache_key(self.transaction.document_id))
+        mocked_get.return_value = MockResponse(data=ILINK_RESPONSE_MOCK, status_code=200)
+        response = self.api_client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mocked_get.call_count, 2)
+
+    @mock.patch("requests.Session.get", return_value=MockResponse(UNAUTHORIZED_ILINK_RESPONSE, status_code=500))
+    def test_get_document_error_cached_briefly(self, mocked_get):
+        """
+        This test ensures the errors of the receipt host, other than a file not found, are only cached briefly.
+        """
+        self.api_client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        url = f"/api/billing/receipt-link/{self.transaction.transaction_id}/"
+
+        self.assertEqual(self.api_client.get(url).status_code, 500)
+        self.assertEqual(self.api_client.get(url).status_code, 500)
+        self.assertEqual(mocked_get.call_count, 1)
+
+        cache.delete(ReceiptDocumentHost.cache_key(self.transaction.document_id))
+        self.assertEqual(self.api_client.get(url).status_code, 500)
+        self.assertEqual(mocked_get.call_count, 2)
+
+    def test_get_document_coalesced(self):
+        """
+        This test ensures the concurrent lookups of the same document make a single call to the receipt host,
+        and all of them get its result.
+        """
+
+        def slow_receipt_host(*args, **kwargs):
+            time.sleep(0.2)
+            return MockResponse(data=ILINK_RESPONSE_MOCK, status_code=200)
+
+        with mock.patch("requests.Session.get", side_effect=slow_receipt_host) as mocked_get:
+            with ThreadPoolExecutor(max_workers=5) as executor:
+                links = list(
+                    executor.map(lambda _: ReceiptDocumentHost().get_document(self.transaction.document_id), range(5))
+                )
+
+        mocked_get.assert_called_once()
+        self.assertEqual(links, [ILINK_RESPONSE_MOCK["response"]["data"][0]["attachments"][0]["file"]] * 5)
+
+    def test_get_document_coalesced_error(self):
+        """
+        This test ensures the concurrent lookups of the same document fail with the error of the single call
+        to the receipt host, instead of calling it one after another.
+        """
+
+        def failing_receipt_host(*args, **kwargs):
+            time.sleep(0.2)
+            raise requests.exceptions.ConnectionError("Connection refused")
+
+        def get_document(_):
+            try:
+                return ReceiptDocumentHost().get_document(self.transaction.document_id)
+            except requests.exceptions.RequestException as e:
+                return e
+
+        with mock.patch("requests.Session.get", side_effect=failing_receipt_host) as mocked_get:
+            with ThreadPoolExecutor(max_workers=5) as executor:
+                errors = list(executor.map(get_document, range(5)))
+
+        mocked_get.assert_called_once()
+        self.assertTrue(all(isinstance(e, requests.exceptions.ConnectionError) for e in errors))
+
+    @override_settings(
+        RECEIPT_HOST_CONNECT_TIMEOUT=0.05, RECEIPT_HOST_READ_TIMEOUT=0.1, RECEIPT_HOST_CONNECT_RETRIES=0
+    )
+    @mock.patch("requests.Session.get", return_value=MockResponse(data=ILINK_RESPONSE_MOCK, status_code=200))
+    def test_get_document_lock_not_released(self, mocked_get):
+        """
+        This test ensures a lookup waits for a lock that isn't released only as long as the receipt host timeouts.
+        """
+        cache.add(f"{ReceiptDocumentHost.cache_key(self.transaction.document_id)}:lock", True, timeout=60)
+
+        start = time.monotonic()
+        with self.assertRaises(requests.exceptions.Timeout):
+            ReceiptDocumentHost().get_document(self.transaction.document_id)
+
+        self.assertLess(time.monotonic() - start, 1)
+        mocked_get.assert_not_called()
+
+    @override_settings(RECEIPT_HOST_CONNECT_TIMEOUT=2, RECEIPT_HOST_READ_TIMEOUT=7)
+    @mock.patch("requests.Session.get", side_effect=raise_timeout)
+    def test_get_document_timeout(self, mocked_get):
+        """
+        This test ensures the receipt host is called with the timeouts, and a timeout is answered as a 504.
+        """
+        self.api_client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+        response = self.api_client.get(f"/api/billing/receipt-link/{self.transaction.transaction_id}/")
+
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(response.data["response"], "The receipt host took too long to answer")
+        self.assertEqual(mocked_get.call_args.kwargs["timeout"], (2, 7))
+
+    @mock.patch("requests.Session.get", side_effect=requests.exceptions.ConnectionError("Connection refused"))
+    def test_get_document_connection_error(self, mocked_get):
+        """
+        This test ensures a receipt host that can't be reached is answered as a 503, also while it is cached.
+        """
+        self.api_client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        url = f"/api/billing/receipt-link/{self.transaction.transaction_id}/"
+
+        self.assertEqual(self.api_client.get(url).status_code, 503)
+        self.assertEqual(self.api_client.get(url).status_code, 503)
+
+        self.assertEqual(mocked_get.call_count, 1)
+
+    def test_pooled_session(self):
+        """
+        This test ensures the receipt host is called with a single session per process.
+        """
+        self.assertIs(ReceiptDocumentHost._session(), ReceiptDocumentHost._session())
+
+
+@override_settings(
+    RECEIPT_HOST_URL="https://receipt-fake.com/",
+    RECEIPT_BEARER_TOKEN="receipt_entity_public_key",
+    RECEIPT_ENTITY_PUBLIC_KEY="Bearer token",
+    RECEIPT_LINK_BULK_MAX_SIZE=5,
+    RECEIPT_LINK_BULK_WORKERS=3,
+)
+class ReceiptLinkBulkTest(TestCase):
+    """
+    A test case for the bulk receipt link api.
+    """
+
+    endpoint = "/api/billing/receipt-link/bulk/"
+
+    def setUp(self) -> None:
+        cache.clear()
+        user = get_user_model().objects.create(username="user_test", password="pwd_test")
+        self.api_client = APIClient()
+        self.api_client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+
+    def test_get_receipt_links_bulk(self):
+        """
+        This test ensures each transaction id gets its link or its error, on the order of the request,
+        calling the receipt host only for the links not saved or cached.
+        """
+        saved = TransactionFactory.create(receipt_file_url="https://receipt-fake.com/file/saved")
+        cached = TransactionFactory.create()
+        cache.set(ReceiptDocumentHost.cache_key(cached.document_id), "https://receipt-fake.com/file/cached")
+        fetched = TransactionFactory.create()
+        not_published = TransactionFactory.create()
+        file_url = ILINK_RESPONSE_MOCK["response"]["data"][0]["attachments"][0]["file"]
+
+        def receipt_host(*args, **kwargs):
+            if kwargs["params"]["document_number"] == fetched.document_id:
+                return MockResponse(data=ILINK_RESPONSE_MOCK, status_code=200)
+            return MockResponse("File not found", status_code=404)
+
+        transaction_ids = [
+            fetched.transaction_id,
+            "wrong-transaction-id",
+            saved.transaction_id,
+            not_published.transaction_id,
+            cached.transaction_id,
+        ]
+        with mock.patch("requests.Session.get", side_effect=receipt_host) as mocked_get:
+            # the token, the transactions and the update of the new links, within the savepoint of the request
+            with self.assertNumQueries(5):
+                response = self.api_client.post(self.endpoint, transaction_ids, format="json")
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(
+            [
+                (result["transaction_id"], result["status_code"], result["response"])
+                for result in response.data["data"]
+            ],
+            [
+                (fetched.transaction_id, 200, file_url),
+                ("wrong-transaction-id", 404, "Transaction not found"),
+                (saved.transaction_id, 200, "https://receipt-fake.com/file/saved"),
+                (not_published.transaction_id, 404, "File not found"),
+                (cached.transaction_id, 200, "https://receipt-fake.com/file/cached"),
+            ],
+        )
+        self.assertEqual(mocked_get.call_count, 2)
+        for transaction, receipt_file_url in ((fetched, file_url), (cached, "https://receipt-fake.com/file/cached")):
+            transaction.refresh_from_db()
+            self.assertEqual(transaction.receipt_file_url, receipt_file_url)
+            self.assertIsNotNone(transaction.receipt_resolved_at)
+
+    @mock.patch("requests.Session.get", return_value=MockResponse(data=ILINK_RESPONSE_MOCK, status_code=200))
+    def test_get_receipt_links_bulk_all_found(self, mocked_get):
+        """
+        This test ensures the response is a success when the links of all the transactions are found.
+        """
+        transactions = TransactionFactory.create_batch(3)
+
+        response = self.api_client.post(self.endpoint, [t.transaction_id for t in transactions], format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result["status_code"] for result in response.data["data"]], [200] * 3)
+
+    def test_get_receipt_links_bulk_invalid_request(self):
+        """
+        This test ensures the request must be a non empty list of transaction ids, up to the maximum size.
+        """
+        for payload in ([], {"transaction_id": "id"}, [1, 2], ["id"] * 6):
+            response = self.api_client.post(self.endpoint, payload, format="json")
+            self.assertEqual(response.status_code, 400, payload)
+
+    @mock.patch("django.core.cache.cache.get_many", side_effect=ConnectionError("The cache is down"))
+    def test_get_receipt_links_bulk_unexpected_error(self, mocked_get_many):
+        """
+        This test ensures a not expected error is answered with the response format of the api.
+        """
+        transaction = TransactionFactory.create()
+
+        response = self.api_client.post(self.endpoint, [transaction.transaction_id], format="json")
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.data["response"], "A not expected error ocurred getting the documents")
@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.billing.factories import SageX3TransactionInformationFactory, TransactionFactory, TransactionItemFactory
+from apps.billing.mocks import ILINK_RESPONSE_MOCK, MockResponse
+from apps.billing.models import SageX3TransactionInformation, Transaction
+from apps.billing.services.receipt_host_service import ReceiptDocumentHost
+from apps.billing.services.transaction_service import TransactionService
+from apps.billing.tasks import resolve_receipt_link_task
+from apps.billing.tests.test_utils import processor_success_response
+
+ILINK_FILE_URL = ILINK_RESPONSE_MOCK["response"]["data"][0]["attachments"][0]["file"]
+
+
+@override_settings(
+    TRANSACTION_PROCESSOR_URL="http://fake-processor.com",
+    RECEIPT_HOST_URL="https://receipt-fake.com/",
+    RECEIPT_LINK_RESOLVE_BACKOFF_BASE=60,
+    RECEIPT_LINK_RESOLVE_BACKOFF_MAX=300,
+    RECEIPT_LINK_RESOLVE_MAX_ATTEMPTS=3,
+)
+class ResolveReceiptLinkTestCase(TestCase):
+    """
+    Tests the resolution of the receipt links after the transactions are sent, and their use on the api.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    @mock.patch("requests.Session.get", return_value=MockResponse(data=ILINK_RESPONSE_MOCK, status_code=200))
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_resolved_after_send(self, mocked_post, mocked_get):
+        """
+        The receipt link is resolved and saved on the transaction once it is sent with success.
+        """
+        transaction = TransactionFactory.create(document_id=None)
+        TransactionItemFactory.create(transaction=transaction)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TransactionService(transaction).run_steps_to_send_transaction()
+
+        transaction.refresh_from_db()
+        self.assertIsNotNone(transaction.document_id)
+        self.assertEqual(transaction.receipt_file_url, ILINK_FILE_URL)
+        self.assertIsNotNone(transaction.receipt_resolved_at)
+        self.assertEqual(mocked_get.call_args.kwargs["params"]["document_number"], transaction.document_id)
+
+    @mock.patch("requests.Session.get", return_value=MockResponse("File not found", status_code=404))
+    def test_retried_with_backoff(self, mocked_get):
+        """
+        While the document isn't on the receipt host the resolution is retried with an exponential backoff,
+        until the maximum number of attempts.
+        """
+        transaction = TransactionFactory.create()
+
+        with mock.patch.object(resolve_receipt_link_task, "apply_async") as mocked_apply_async:
+            for attempt in range(3):
+                cache.clear()
+                resolve_receipt_link_task(transaction.pk, attempt)
+
+        self.assertEqual(
+            [call.kwargs for call in mocked_apply_async.call_args_list],
+            [{"args": [transaction.pk, 1], "countdown": 60}, {"args": [transaction.pk, 2], "countdown": 120}],
+        )
+        transaction.refresh_from_db()
+        self.assertIsNone(transaction.receipt_file_url)
+
+    @mock.patch("requests.Session.get")
+    def test_receipt_link_answered_from_database(self, mocked_get):
+        """
+        The receipt link api answers with the link saved on the transaction, without calling the receipt host.
+        """
+        transaction = TransactionFactory.create(receipt_file_url="https://receipt-fake.com/file/saved")
+        user = get_user_model().objects.create(username="user_test", password="pwd_test")
+        api_client = APIClient()
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+
+        response = api_client.get(f"/api/billing/receipt-link/{transaction.transaction_id}/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["response"], "https://receipt-fake.com/file/saved")
+        mocked_get.assert_not_called()
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_resend_clears_receipt_link(self, mocked_post):
+        """
+        A transaction sent again creates another document, so the receipt link of the previous one is cleared.
+        """
+        transaction = TransactionFactory.create(
+            document_id="FRN-OLD", receipt_file_url="https://receipt-fake.com/file/old", receipt_resolved_at=now()
+        )
+        TransactionItemFactory.create(transaction=transaction)
+        SageX3TransactionInformationFactory.create(
+            transaction=transaction, status=SageX3TransactionInformation.SUCCESS
+        )
+
+        TransactionService.retry_sending_transactions(transaction_id=transaction.transaction_id)
+
+        transaction.refresh_from_db()
+        self.assertNotEqual(transaction.document_id, "FRN-OLD")
+        self.assertIsNone(transaction.receipt_file_url)
+        self.assertIsNone(transaction.receipt_resolved_at)
+
+    @mock.patch("requests.Session.get", return_value=MockResponse(data=ILINK_RESPONSE_MOCK, status_code=200))
+    def test_stale_receipt_link_not_saved(self, mocked_get):
+        """
+        The link of a document is only saved while it is still the document of the transaction.
+        """
+        transaction, other = TransactionFactory.create_batch(2, document_id="FRN-OLD")
+        Transaction.objects.filter(pk__in=[transaction.pk, other.pk]).update(document_id="FRN-NEW")
+
+        self.assertEqual(ReceiptDocumentHost().get_transaction_receipt_link(transaction), ILINK_FILE_URL)
+        (result,) = ReceiptDocumentHost().get_transactions_receipt_links([other])
+        self.assertEqual(result.result, ILINK_FILE_URL)
+
+        for stale in (transaction, other):
+            stale.refresh_from_db()
+            self.assertIsNone(stale.receipt_file_url)
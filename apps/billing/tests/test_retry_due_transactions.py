@@ -0,0 +1,216 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.billing.factories import SageX3TransactionInformationFactory, TransactionFactory, TransactionItemFactory
+from apps.billing.models import SageX3TransactionInformation
+from apps.billing.services.transaction_service import TransactionService
+from apps.billing.tasks import retry_due_transactions_task
+from apps.billing.tests.test_transaction_service import raise_timeout
+from apps.billing.tests.test_utils import processor_success_response
+from nau_financial_manager.celery import app as celery_app
+
+
+@override_settings(
+    TRANSACTION_PROCESSOR_URL="http://fake-processor.com",
+    TRANSACTION_RETRY_BACKOFF_BASE=60,
+    TRANSACTION_RETRY_BACKOFF_MAX=600,
+    TRANSACTION_RETRY_MAX_ATTEMPTS=3,
+)
+class RetryBackoffTestCase(TestCase):
+    """
+    Tests the scheduling of the automatic retries of the sends to the processor.
+    """
+
+    def _create_information(self, **kwargs) -> SageX3TransactionInformation:
+        transaction = TransactionFactory.create()
+        TransactionItemFactory.create(transaction=transaction)
+        return SageX3TransactionInformationFactory.create(transaction=transaction, **kwargs)
+
+    def assertScheduledIn(self, information: SageX3TransactionInformation, seconds: int):
+        information.refresh_from_db()
+        expected = timezone.now() + timedelta(seconds=seconds)
+        self.assertAlmostEqual(information.next_retry_at, expected, delta=timedelta(seconds=5))
+
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
+    def test_failed_send_is_scheduled_with_exponential_backoff(self, mocked_post):
+        """
+        Each failed send doubles the delay until the next automatic retry, up to the maximum delay.
+        """
+        information = self._create_information(status=SageX3TransactionInformation.PENDING, retries=0)
+        service = TransactionService(information.transaction)
+
+        service.run_steps_to_send_transaction()
+        self.assertEqual(information.retries, 1)
+        self.assertScheduledIn(information, 60)
+
+        service.run_steps_to_send_transaction()
+        self.assertEqual(information.retries, 2)
+        self.assertScheduledIn(information, 120)
+
+    @override_settings(TRANSACTION_RETRY_MAX_ATTEMPTS=20)
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
+    def test_failed_send_backoff_is_capped(self, mocked_post):
+        """
+        The delay until the next automatic retry never goes over the maximum delay.
+        """
+        information = self._create_information(status=SageX3TransactionInformation.FAILED, retries=10)
+
+        TransactionService(information.transaction).run_steps_to_send_transaction()
+
+        self.assertScheduledIn(information, 600)
+
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
+    def test_failed_send_after_max_attempts_is_not_scheduled(self, mocked_post):
+        """
+        After the maximum number of attempts the send is a dead letter, and isn't automatically retried anymore.
+        """
+        information = self._create_information(status=SageX3TransactionInformation.FAILED, retries=2)
+
+        TransactionService(information.transaction).run_steps_to_send_transaction()
+
+        information.refresh_from_db()
+        self.assertEqual(information.retries, 3)
+        self.assertEqual(information.status, SageX3TransactionInformation.DEAD_LETTER)
+        self.assertIsNone(information.next_retry_at)
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_dead_letters_are_not_retried(self, mocked_post):
+        """
+        The dead letters are only retried when forced by their `transaction_id`, or after being requeued.
+        """
+        information = self._create_information(status=SageX3TransactionInformation.DEAD_LETTER, retries=3)
+
+        counters = TransactionService.retry_sending_transactions(transaction_id=None)
+        self.assertEqual(counters["total_count"], 0)
+
+        out = StringIO()
+        call_command("requeue_dead_letter_transactions", stdout=out)
+        self.assertIn("1 dead letter transactions were requeued", out.getvalue())
+        information.refresh_from_db()
+        self.assertEqual(information.status, SageX3TransactionInformation.FAILED)
+        self.assertEqual(information.retries, 0)
+
+        counters = TransactionService.retry_due_transactions()
+        self.assertEqual(counters["success"], 1)
+
+    def test_requeue_dead_letters_by_transaction_id(self):
+        """
+        Only the dead letters of the given transactions are requeued.
+        """
+        requeued, kept = (
+            self._create_information(status=SageX3TransactionInformation.DEAD_LETTER, retries=3) for _ in range(2)
+        )
+        failed = self._create_information(status=SageX3TransactionInformation.FAILED, retries=1)
+
+        count = TransactionService.requeue_dead_letters(
+            transaction_ids=[requeued.transaction.transaction_id, failed.transaction.transaction_id]
+        )
+
+        self.assertEqual(count, 1)
+        for information, status, retries in (
+            (requeued, SageX3TransactionInformation.FAILED, 0),
+            (kept, SageX3TransactionInformation.DEAD_LETTER, 3),
+            (failed, SageX3TransactionInformation.FAILED, 1),
+        ):
+            information.refresh_from_db()
+            self.assertEqual((information.status, information.retries), (status, retries))
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_successful_send_is_not_scheduled(self, mocked_post):
+        """
+        A successful send clears its automatic retry.
+        """
+        information = self._create_information(
+            status=SageX3TransactionInformation.FAILED, retries=1, next_retry_at=timezone.now()
+        )
+
+        TransactionService(information.transaction).run_steps_to_send_transaction()
+
+        information.refresh_from_db()
+        self.assertEqual(information.status, SageX3TransactionInformation.SUCCESS)
+        self.assertIsNone(information.next_retry_at)
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_retry_due_transactions(self, mocked_post):
+        """
+        Only the transactions whose automatic retry is due are retried.
+        """
+        now = timezone.now()
+        due = self._create_information(
+            status=SageX3TransactionInformation.FAILED, retries=1, next_retry_at=now - timedelta(minutes=1)
+        )
+        not_due = self._create_information(
+            status=SageX3TransactionInformation.FAILED, retries=1, next_retry_at=now + timedelta(minutes=1)
+        )
+        not_scheduled = self._create_information(
+            status=SageX3TransactionInformation.FAILED, retries=3, next_retry_at=None
+        )
+
+        counters = TransactionService.retry_due_transactions()
+
+        self.assertEqual(counters["total_count"], 1)
+        self.assertEqual(counters["success"], 1)
+        for information, status in (
+            (due, SageX3TransactionInformation.SUCCESS),
+            (not_due, SageX3TransactionInformation.FAILED),
+            (not_scheduled, SageX3TransactionInformation.FAILED),
+        ):
+            information.refresh_from_db()
+            self.assertEqual(information.status, status)
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_retry_due_transactions_batch_size(self, mocked_post):
+        """
+        At most a batch of transactions is retried on each run, the ones waiting for longer first.
+        """
+        now = timezone.now()
+        informations = [
+            self._create_information(
+                status=SageX3TransactionInformation.FAILED, retries=1, next_retry_at=now - timedelta(minutes=minutes)
+            )
+            for minutes in (1, 3, 2)
+        ]
+
+        counters = TransactionService.retry_due_transactions(batch_size=2)
+
+        self.assertEqual(counters["total_count"], 2)
+        statuses = []
+        for information in informations:
+            information.refresh_from_db()
+            statuses.append(information.status)
+        self.assertEqual(
+            statuses,
+            [
+                SageX3TransactionInformation.FAILED,
+                SageX3TransactionInformation.SUCCESS,
+                SageX3TransactionInformation.SUCCESS,
+            ],
+        )
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_retry_due_transactions_task(self, mocked_post):
+        """
+        The periodic task retries the due transactions and returns the counters.
+        """
+        self._create_information(
+            status=SageX3TransactionInformation.FAILED, retries=1, next_retry_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        result = retry_due_transactions_task.delay().get()
+
+        self.assertEqual(result, {"success": 1, "failed": 0, "total_count": 1})
+
+    def test_retry_due_transactions_task_is_scheduled(self):
+        """
+        The periodic task is on the celery beat schedule.
+        """
+        tasks = [entry["task"] for entry in settings.CELERY_BEAT_SCHEDULE.values()]
+
+        self.assertIn("apps.billing.tasks.retry_due_transactions_task", tasks)
+        self.assertIn("apps.billing.tasks.retry_due_transactions_task", celery_app.tasks)
@@ -0,0 +1,91 @@
+from xml.parsers.expat import ExpatError
+
+from django.test import TestCase, override_settings
+
+from apps.billing.mocks import xml_duplicate_error_response_mock
+from apps.billing.services.sage_x3_response_parser import DocumentIdNotFoundError, extract_document_id
+
+SUCCESS_RESPONSE = """<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:wss="http://www.adonix.com/WSS">
+<soapenv:Body>
+    <wss:saveResponse>
+        <saveReturn>
+            <resultXml><![CDATA[
+<?xml version="1.0" encoding="UTF-8"?>
+<RESULT>
+    <GRP ID="SIH0_1">
+        <FLD NAME="SALFCY" TYPE="Char">SED</FLD>
+        <FLD NAME="NUM" TYPE="Char">{num}</FLD>
+        <FLD NAME="BPINAM" TYPE="Char">Ana Rosário</FLD>
+    </GRP>
+    <GRP ID="SIH0_2">
+        <FLD NAME="NUM" TYPE="Char">FRN-23/00002</FLD>
+    </GRP>
+</RESULT>]]></resultXml>
+        </saveReturn>
+    </wss:saveResponse>
+</soapenv:Body>
+</soapenv:Envelope>"""
+
+
+class SageX3ResponseParserTestCase(TestCase):
+    """
+    Tests the extraction of the document id from the `Sage X3` responses.
+    """
+
+    def test_extract_document_id_success(self):
+        """
+        The document id is the first `NUM` field of the result xml.
+        """
+        response = SUCCESS_RESPONSE.format(num="FRN-23/00001").encode()
+
+        self.assertEqual(extract_document_id(response), "FRN-23/00001")
+
+    def test_extract_document_id_success_as_text(self):
+        """
+        The response can also be received as text.
+        """
+        self.assertEqual(extract_document_id(SUCCESS_RESPONSE.format(num="FRN-23/00001")), "FRN-23/00001")
+
+    def test_extract_document_id_skips_empty_num(self):
+        """
+        An empty `NUM` field isn't a document id.
+        """
+        response = SUCCESS_RESPONSE.format(num="").encode()
+
+        self.assertEqual(extract_document_id(response), "FRN-23/00002")
+
+    @override_settings(DEFAULT_SERIES="QWERTY")
+    def test_extract_document_id_already_registered(self):
+        """
+        The document id of an already registered invoice comes on the `multiRef` message.
+        """
+        document_id = extract_document_id(xml_duplicate_error_response_mock().strip().encode())
+
+        self.assertTrue(document_id.startswith("QWERTY-"))
+        self.assertNotIn("registada", document_id)
+
+    def test_extract_document_id_not_found(self):
+        """
+        A response without the document id, as of a rejected invoice, raises an error with its message.
+        """
+        response = b"""<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
+            <soapenv:Body><resultXml/><multiRef><message>Other error</message></multiRef></soapenv:Body>
+        </soapenv:Envelope>"""
+
+        with self.assertRaisesRegex(DocumentIdNotFoundError, "Other error"):
+            extract_document_id(response)
+
+    def test_extract_document_id_stops_on_first_num(self):
+        """
+        The parsing stops on the document id, so the rest of the response isn't even read.
+        """
+        response = SUCCESS_RESPONSE.format(num="FRN-23/00001").replace("</soapenv:Envelope>", "<not-closed>")
+
+        self.assertEqual(extract_document_id(response), "FRN-23/00001")
+
+    def test_extract_document_id_invalid_xml(self):
+        """
+        A response that isn't xml raises an error.
+        """
+        with self.assertRaises(ExpatError):
+            extract_document_id(b"<html><body>Service Unavailable</body>")
@@ -52,3 +52,24 @@ class SageX3TransactionInformationTest(TestCase):
         self.sage_x3_transaction_info.save()
         retrieved_info = SageX3TransactionInformation.objects.get(id=self.sage_x3_transaction_info.id)
         self.assertEqual(retrieved_info.output_xml, "")
+
+    def test_xml_is_stored_compressed(self):
+        self.sage_x3_transaction_info.input_xml = "<xml>" + "a" * 1000 + "</xml>"
+        self.sage_x3_transaction_info.save()
+        retrieved_info = SageX3TransactionInformation.all_objects.get(id=self.sage_x3_transaction_info.id)
+        self.assertIsNone(retrieved_info.input_xml_text)
+        self.assertLess(len(retrieved_info.input_xml_compressed), 100)
+        self.assertEqual(retrieved_info.input_xml, "<xml>" + "a" * 1000 + "</xml>")
+
+    def test_xml_stored_as_text_can_be_read(self):
+        SageX3TransactionInformation.objects.filter(id=self.sage_x3_transaction_info.id).update(
+            input_xml_text="<xml>text</xml>", input_xml_compressed=None
+        )
+        retrieved_info = SageX3TransactionInformation.objects.get(id=self.sage_x3_transaction_info.id)
+        self.assertEqual(retrieved_info.input_xml, "<xml>text</xml>")
+
+    def test_xml_is_deferred_by_default(self):
+        retrieved_info = SageX3TransactionInformation.objects.get(id=self.sage_x3_transaction_info.id)
+        self.assertEqual(retrieved_info.get_deferred_fields(), set(SageX3TransactionInformation.PAYLOAD_FIELDS))
+        with self.assertNumQueries(1):
+            self.assertEqual(retrieved_info.input_xml, "<xml></xml>")
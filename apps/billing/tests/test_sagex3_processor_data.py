@@ -1,7 +1,9 @@
 import xml.etree.ElementTree as ET
 from datetime import datetime
+from unittest import mock
 
 from django.test import TestCase, override_settings
+from django.utils import translation
 
 from apps.billing.factories import SageX3TransactionInformationFactory, TransactionFactory, TransactionItemFactory
 from apps.billing.models import Transaction
@@ -124,6 +126,17 @@ class SageX3ProcessDataTest(TestCase):
         )
         self.assertEqual(object_xml_root.findtext(".//*/FLD[@NAME='YCRYNAM']"), "Reino Unido")
 
+    def test_data_processor_country_name_precomputed(self):
+        """
+        Test the SageX3Processor resolves the country name in portuguese, whatever the active language,
+        without activating the translations.
+        """
+        transaction = TransactionFactory(country_code="DE")
+        with translation.override("en"), mock.patch("django.utils.translation.override") as mocked_override:
+            object_xml_root: ET.Element = self.__class__._get_xml_element_from_transaction(transaction)
+        self.assertEqual(object_xml_root.findtext(".//*/FLD[@NAME='YCRYNAM']"), "Alemanha")
+        mocked_override.assert_not_called()
+
     def test_data_processor_country_code_none(self):
         """
         Test the SageX3Processor for country code field.
@@ -227,6 +240,16 @@ class SageX3ProcessDataTest(TestCase):
         xml = SageX3Processor(TransactionFactory(client_name="Ana Rosário Maria")).data
         self.assertIn(b"Ana Ros\xc3\xa1rio Maria", xml)
 
+    def test_data_processor_client_name_xml_special_characters(self):
+        """
+        Test the SageX3Processor for client name field with characters that have a meaning on xml.
+        """
+        client_name = "Tom & Jerry <Lda>"
+        object_xml_root: ET.Element = self.__class__._get_xml_element_from_transaction(
+            TransactionFactory(client_name=client_name)
+        )
+        self.assertEqual(object_xml_root.findtext(".//*/LST[@NAME='YBPRNAM']/ITM"), client_name)
+
     def test_data_processor_client_name_none(self):
         """
         Test the SageX3Processor for email field.
@@ -380,6 +403,21 @@ class SageX3ProcessDataTest(TestCase):
         self.assertIn(decoded_name, item_xml.find("./*[@NAME='ITMDES']").text)
         self.assertIn(decoded_name, item_xml.find("./*[@NAME='ITMDES1']").text)
 
+    def test_data_processor_items_description_xml_special_characters(self):
+        """
+        This test validates the content of `ITMDES` and `ITMDES1` fields with characters that have a meaning on xml.
+        """
+        transaction = TransactionFactory.create()
+        description = "Course <Python> & <Django>"
+        TransactionItemFactory.create(transaction=transaction, description=description)
+
+        object_xml_root: ET.Element = self.__class__._get_xml_element_from_transaction(transaction=transaction)
+        items_as_xml = object_xml_root.findall("./TAB/")
+
+        self.assertEqual(len(items_as_xml), 1)
+        self.assertEqual(items_as_xml[0].find("./*[@NAME='ITMDES']").text, description)
+        self.assertEqual(items_as_xml[0].find("./*[@NAME='ITMDES1']").text, description)
+
     def test_data_processor_items_QTY_field(self):
         """
         This test validates the content of `QTY` field.
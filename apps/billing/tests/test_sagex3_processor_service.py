@@ -4,6 +4,7 @@ from django.test import TestCase, override_settings
 
 from apps.billing.mocks import MockResponse
 from apps.billing.services.processor_service import SageX3Processor
+from apps.util.http_session import close_pooled_sessions
 
 
 class SageX3ProcessServiceTest(TestCase):
@@ -12,7 +13,7 @@ class SageX3ProcessServiceTest(TestCase):
     """
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com/somelocation")
-    @mock.patch("requests.post", return_value=MockResponse(data="", status_code=200))
+    @mock.patch("requests.Session.post", return_value=MockResponse(data="", status_code=200))
     @mock.patch("apps.billing.services.processor_service.SageX3Processor.data", side_effect=lambda: {"some": "thing"})
     def test_send_transaction_to_processor_transaction_processor_url_setting(self, mock_data, mock_post):
         """
@@ -24,7 +25,7 @@ class SageX3ProcessServiceTest(TestCase):
         self.assertEqual("http://fake-processor.com/somelocation", kwargs["url"])
 
     @override_settings(USER_PROCESSOR_AUTH="someuser", USER_PROCESSOR_PASSWORD="somepassword")
-    @mock.patch("requests.post", return_value=MockResponse(data="", status_code=200))
+    @mock.patch("requests.Session.post", return_value=MockResponse(data="", status_code=200))
     @mock.patch("apps.billing.services.processor_service.SageX3Processor.data", side_effect=lambda: {"some": "thing"})
     def test_send_transaction_to_processor_user_processor_auth_password(self, mock_data, mock_post):
         """
@@ -35,7 +36,7 @@ class SageX3ProcessServiceTest(TestCase):
         _, kwargs = mock_post.call_args
         self.assertEqual(("someuser", "somepassword"), kwargs["auth"])
 
-    @mock.patch("requests.post", return_value=MockResponse(data="", status_code=200))
+    @mock.patch("requests.Session.post", return_value=MockResponse(data="", status_code=200))
     @mock.patch("apps.billing.services.processor_service.SageX3Processor.data", side_effect=lambda: {"some": "thing"})
     def test_send_transaction_to_processor_header_content_type(self, mock_data, mock_post):
         """
@@ -46,7 +47,7 @@ class SageX3ProcessServiceTest(TestCase):
         called_headers = kwargs["headers"]
         self.assertEqual("text/xml; charset=utf-8", called_headers["Content-type"])
 
-    @mock.patch("requests.post", return_value=MockResponse(data="", status_code=200))
+    @mock.patch("requests.Session.post", return_value=MockResponse(data="", status_code=200))
     @mock.patch("apps.billing.services.processor_service.SageX3Processor.data", side_effect=lambda: {"some": "thing"})
     def test_send_transaction_to_processor_header_soapaction(self, mock_data, mock_post):
         """
@@ -56,3 +57,34 @@ class SageX3ProcessServiceTest(TestCase):
         _, kwargs = mock_post.call_args
         called_headers = kwargs["headers"]
         self.assertEqual("''", called_headers["SOAPAction"])
+
+    @override_settings(TRANSACTION_PROCESSOR_CONNECT_TIMEOUT=2, TRANSACTION_PROCESSOR_READ_TIMEOUT=30)
+    @mock.patch("requests.Session.post", return_value=MockResponse(data="", status_code=200))
+    @mock.patch("apps.billing.services.processor_service.SageX3Processor.data", side_effect=lambda: {"some": "thing"})
+    def test_send_transaction_to_processor_timeout(self, mock_data, mock_post):
+        """
+        Test the connect and read timeouts sent to SageX3 come from the settings.
+        """
+        SageX3Processor(None).send_transaction_to_processor()
+        _, kwargs = mock_post.call_args
+        self.assertEqual((2, 30), kwargs["timeout"])
+
+    def test_send_transaction_to_processor_session_is_reused(self):
+        """
+        Test the same HTTP session is used by the different processor instances.
+        """
+        self.assertIs(SageX3Processor(None)._session(), SageX3Processor(None)._session())
+
+    @override_settings(TRANSACTION_PROCESSOR_POOL_SIZE=7, TRANSACTION_PROCESSOR_CONNECT_RETRIES=2)
+    def test_send_transaction_to_processor_session_pool(self):
+        """
+        Test the connection pool size and the connect retries of the HTTP session come from the settings.
+        """
+        close_pooled_sessions()
+        self.addCleanup(close_pooled_sessions)
+
+        adapter = SageX3Processor(None)._session().get_adapter("https://fake-processor.com")
+
+        self.assertEqual(adapter._pool_maxsize, 7)
+        self.assertEqual(adapter.max_retries.connect, 2)
+        self.assertEqual(adapter.max_retries.read, 0)
@@ -0,0 +1,184 @@
+import gzip
+import os
+import socket
+import subprocess
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from apps.billing.factories import TransactionFactory, TransactionItemFactory
+from apps.billing.models import SageX3TransactionInformation
+from apps.billing.services.spool_processor import SPOOL_PREFIX
+from apps.billing.services.transaction_service import TransactionService
+from apps.billing.tests.test_transaction_service import raise_timeout
+from apps.billing.tests.test_utils import processor_success_response
+from apps.util.spool import OPEN_SUFFIX, SpoolWriter, read_spool, spool_files
+
+
+class SpoolWriterTestCase(TestCase):
+    """
+    Tests the rotating spool files.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def test_rotate(self):
+        """
+        The records are written to a new file after `max_records`, and the files are only replayed once closed.
+        """
+        writer = SpoolWriter(self.directory, prefix="test", max_records=2, fsync=False)
+        for i in range(5):
+            writer.write({"i": i})
+
+        self.assertEqual(len(spool_files(self.directory, "test")), 2)
+        self.assertEqual(len(spool_files(self.directory, "test", include_open=True)), 3)
+
+        writer.close()
+        files = spool_files(self.directory, "test")
+        self.assertEqual([[record["i"] for record in read_spool(path)] for path in files], [[0, 1], [2, 3], [4]])
+
+    def test_idle_writer_past_max_age(self):
+        """
+        A file idle for `max_age` is replayed as closed, and its writer rotates it before writing again.
+        """
+        writer = SpoolWriter(self.directory, prefix="test", max_age=60, fsync=False)
+        writer.write({"i": 0})
+        (path,) = spool_files(self.directory, "test", include_open=True)
+        self.assertEqual(spool_files(self.directory, "test", max_age=60), [])
+
+        with mock.patch("apps.util.spool.time.monotonic", return_value=time.monotonic() + 120):
+            os.utime(path, (time.time() - 120, time.time() - 120))
+            self.assertEqual(spool_files(self.directory, "test", max_age=60), [path])
+            self.assertEqual([record["i"] for record in read_spool(path)], [0])
+            path.unlink()
+            writer.write({"i": 1})
+
+        writer.close()
+        (path,) = spool_files(self.directory, "test", include_open=True)
+        self.assertEqual([record["i"] for record in read_spool(path)], [1])
+
+    def test_dead_writer(self):
+        """
+        A file open by a process of this host that is no longer running is replayed as closed.
+        """
+        process = subprocess.Popen(["true"])
+        process.wait()
+        path = self.directory / f"test-20260101T000000000000-{socket.gethostname()}-{process.pid}-1.jsonl.gz.open"
+        path.write_bytes(gzip.compress(b'{"i": 0}\n'))
+        live = self.directory / f"test-20260101T000000000000-{socket.gethostname()}-{os.getpid()}-1.jsonl.gz.open"
+        live.write_bytes(gzip.compress(b'{"i": 1}\n'))
+
+        self.assertEqual(spool_files(self.directory, "test"), [path])
+
+    def test_read_truncated_file(self):
+        """
+        The records of a file whose writer died while writing are read up to the truncated one.
+        """
+        writer = SpoolWriter(self.directory, prefix="test", fsync=False)
+        writer.write({"i": 0})
+        writer.write({"i": 1})
+        (path,) = spool_files(self.directory, "test", include_open=True)
+        with open(path, "ab") as f:
+            f.write(gzip.compress(b'{"i": 2}\n')[:12])
+
+        self.assertEqual([record["i"] for record in read_spool(path)], [0, 1])
+        writer.close()
+
+
+@override_settings(
+    TRANSACTION_PROCESSOR="apps.billing.services.spool_processor.SageX3SpoolProcessor",
+    TRANSACTION_PROCESSOR_URL="http://fake-processor.com",
+    TRANSACTION_SPOOL_FSYNC=False,
+)
+class SageX3SpoolProcessorTestCase(TestCase):
+    """
+    Tests the processor that writes the transactions to the spool, and their replay.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(TRANSACTION_SPOOL_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _spool(self, count: int = 2) -> list:
+        transactions = TransactionFactory.create_batch(count)
+        for transaction in transactions:
+            TransactionItemFactory.create(transaction=transaction)
+        with mock.patch("requests.Session.post") as mocked_post:
+            results = TransactionService.send_transactions(transactions)
+        mocked_post.assert_not_called()
+        self.assertTrue(all(result.result for result in results))
+        return transactions
+
+    def test_spool(self):
+        """
+        The data of the transactions is written to the spool instead of being sent, and they are saved as spooled.
+        """
+        transactions = self._spool()
+
+        for transaction in transactions:
+            information = SageX3TransactionInformation.objects.get(transaction=transaction)
+            self.assertEqual(information.status, SageX3TransactionInformation.SPOOLED)
+            self.assertIsNone(information.next_retry_at)
+            self.assertIsNone(information.claimed_by)
+        (path,) = spool_files(self.directory, SPOOL_PREFIX, include_open=True)
+        self.assertTrue(path.name.endswith(OPEN_SUFFIX))
+        records = list(read_spool(path))
+        self.assertEqual([record["transaction_id"] for record in records], [t.transaction_id for t in transactions])
+        self.assertEqual(
+            records[0]["data"], SageX3TransactionInformation.objects.get(transaction=transactions[0]).input_xml
+        )
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_replay(self, mocked_post):
+        """
+        The replay sends the spooled data, deletes the replayed files and skips the transactions already sent.
+        """
+        transactions = self._spool()
+        with override_settings(TRANSACTION_PROCESSOR="apps.billing.services.processor_service.SageX3Processor"):
+            # the spool file is closed when the processor is replaced
+            out = StringIO()
+            call_command("replay_transaction_spool", stdout=out)
+
+        self.assertIn("SENT: 2 FAILED: 0 SKIPPED: 0", out.getvalue())
+        self.assertEqual(mocked_post.call_count, 2)
+        self.assertEqual(
+            [call.kwargs["data"] for call in mocked_post.call_args_list],
+            [SageX3TransactionInformation.objects.get(transaction=t).input_xml.encode("utf-8") for t in transactions],
+        )
+        for transaction in transactions:
+            information = SageX3TransactionInformation.objects.get(transaction=transaction)
+            self.assertEqual(information.status, SageX3TransactionInformation.SUCCESS)
+            transaction.refresh_from_db()
+            self.assertIsNotNone(transaction.document_id)
+        self.assertEqual(spool_files(self.directory, SPOOL_PREFIX, include_open=True), [])
+
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
+    def test_replay_failed(self, mocked_post):
+        """
+        The transactions that fail to be replayed are failed, to be retried as any other failure,
+        and the ones no longer spooled are skipped.
+        """
+        self._spool(count=3)
+        SageX3TransactionInformation.objects.filter(pk=SageX3TransactionInformation.objects.first().pk).update(
+            status=SageX3TransactionInformation.SUCCESS
+        )
+        out = StringIO()
+        call_command("replay_transaction_spool", "--include-open", "--keep", stdout=out)
+
+        self.assertIn("SENT: 0 FAILED: 2 SKIPPED: 1", out.getvalue())
+        self.assertEqual(
+            SageX3TransactionInformation.objects.filter(status=SageX3TransactionInformation.FAILED).count(), 2
+        )
+        self.assertEqual(len(spool_files(self.directory, SPOOL_PREFIX, include_open=True)), 1)
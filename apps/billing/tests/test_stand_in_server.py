@@ -0,0 +1,97 @@
+from io import StringIO
+
+import requests
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from apps.billing.factories import TransactionFactory, TransactionItemFactory
+from apps.billing.mocks import ILINK_RESPONSE_MOCK
+from apps.billing.models import Transaction
+from apps.billing.services.processor_service import SageX3Processor
+from apps.billing.services.sage_x3_response_parser import extract_document_id
+from apps.billing.stand_in_server import StandInConfig, StandInServer
+
+
+class StandInServerTestCase(TestCase):
+    """
+    Tests the local stand-in server of `Sage X3` and `iLink`.
+    """
+
+    def _start_server(self, config: StandInConfig | None = None) -> StandInServer:
+        server = StandInServer(("127.0.0.1", 0), config)
+        server.start_in_background()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_sage_x3_response(self):
+        """
+        The `POST` requests are answered as a successful save on `Sage X3`, of the invoice on the request.
+        """
+        server = self._start_server()
+        transaction = TransactionFactory.create()
+        TransactionItemFactory.create(transaction=transaction)
+
+        response = requests.post(server.url, data=SageX3Processor(transaction).data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(transaction.transaction_id, response.text)
+        self.assertTrue(extract_document_id(response.content))
+        self.assertEqual(server.stats, {"POST 200": 1})
+
+    def test_ilink_response(self):
+        """
+        The `GET` requests are answered as `iLink`.
+        """
+        server = self._start_server()
+
+        response = requests.get(server.url, params={"document_number": "FRN-23/00001"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), ILINK_RESPONSE_MOCK)
+
+    def test_error_rate(self):
+        """
+        The configured ratio of requests fail with a server error.
+        """
+        server = self._start_server(StandInConfig(error_rate=1))
+
+        self.assertEqual(requests.get(server.url).status_code, 500)
+        self.assertEqual(requests.post(server.url, data="").status_code, 500)
+        self.assertEqual(server.stats, {"GET 500": 1, "POST 500": 1})
+
+
+@override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
+class CommandLoadTestProcessorTestCase(TestCase):
+    """
+    Test the `load_test_processor` Django command.
+    """
+
+    def test_command_load_test_processor(self):
+        """
+        The transactions are sent and their receipts requested to the stand-in server,
+        reporting each step and deleting the transactions at the end.
+        """
+        out = StringIO()
+
+        call_command("load_test_processor", "--transactions=3", "--items=2", stdout=out)
+
+        output = out.getvalue()
+        self.assertIn("SEND: 3 succeeded 0 failed THROUGHPUT: ", output)
+        self.assertIn("RECEIPT: 3 succeeded 0 failed THROUGHPUT: ", output)
+        self.assertIn("p95: ", output)
+        self.assertIn("'POST 200': 3", output)
+        self.assertEqual(Transaction.all_objects.count(), 0)
+
+    def test_command_load_test_processor_errors(self):
+        """
+        The failed sends are reported, and their receipts aren't requested.
+        """
+        out = StringIO()
+
+        call_command("load_test_processor", "--transactions=2", "--error-rate=1", "--keep", stdout=out)
+
+        output = out.getvalue()
+        self.assertIn("SEND: 0 succeeded 2 failed", output)
+        self.assertIn("RECEIPT: 0 succeeded 0 failed", output)
+        self.assertEqual(Transaction.objects.count(), 2)
@@ -0,0 +1,198 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.billing.factories import SageX3TransactionInformationFactory, TransactionFactory, TransactionItemFactory
+from apps.billing.models import SageX3TransactionInformation
+from apps.billing.services.transaction_service import TransactionService
+from apps.billing.tasks import send_transactions_to_processor_task
+from apps.billing.tests.test_transaction_service import raise_timeout
+from apps.billing.tests.test_utils import processor_success_response
+
+
+@override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", TRANSACTION_PROCESSOR_CLAIM_TIMEOUT=60)
+class TransactionClaimTestCase(TestCase):
+    """
+    Tests the claims that prevent multiple workers from sending the same transaction.
+    """
+
+    def _create_information(self, **kwargs) -> SageX3TransactionInformation:
+        transaction = TransactionFactory.create()
+        TransactionItemFactory.create(transaction=transaction)
+        return SageX3TransactionInformationFactory.create(transaction=transaction, retries=0, **kwargs)
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_send_claimed_by_other_worker(self, mocked_post):
+        """
+        A transaction claimed by another worker isn't sent.
+        """
+        information = self._create_information(
+            status=SageX3TransactionInformation.FAILED,
+            claimed_by="other-worker",
+            claimed_until=timezone.now() + timedelta(seconds=30),
+        )
+
+        self.assertFalse(TransactionService(information.transaction).run_steps_to_send_transaction())
+
+        information.refresh_from_db()
+        mocked_post.assert_not_called()
+        self.assertEqual(information.status, SageX3TransactionInformation.FAILED)
+        self.assertEqual(information.claimed_by, "other-worker")
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_send_with_expired_claim(self, mocked_post):
+        """
+        A transaction whose claim has expired is claimed and sent, releasing the claim at the end.
+        """
+        information = self._create_information(
+            status=SageX3TransactionInformation.FAILED,
+            claimed_by="other-worker",
+            claimed_until=timezone.now() - timedelta(seconds=1),
+        )
+
+        self.assertTrue(TransactionService(information.transaction).run_steps_to_send_transaction())
+
+        information.refresh_from_db()
+        self.assertEqual(information.status, SageX3TransactionInformation.SUCCESS)
+        self.assertIsNone(information.claimed_by)
+        self.assertIsNone(information.claimed_until)
+
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
+    def test_send_failure_releases_claim(self, mocked_post):
+        """
+        A failed send releases its claim, so the transaction can be retried by any worker.
+        """
+        information = self._create_information(status=SageX3TransactionInformation.PENDING)
+
+        self.assertFalse(TransactionService(information.transaction).run_steps_to_send_transaction())
+
+        information.refresh_from_db()
+        self.assertEqual(information.status, SageX3TransactionInformation.FAILED)
+        self.assertIsNone(information.claimed_by)
+
+    def test_claim_retry_candidates_are_disjoint(self):
+        """
+        Workers claiming at the same time never get the same transactions.
+        """
+        for _ in range(5):
+            self._create_information(status=SageX3TransactionInformation.FAILED)
+        candidates = SageX3TransactionInformation.objects.order_by("pk")
+
+        first = TransactionService.claim_retry_candidates(candidates, limit=3, claim_token="first")
+        second = TransactionService.claim_retry_candidates(candidates, limit=3, claim_token="second")
+        third = TransactionService.claim_retry_candidates(candidates, limit=3, claim_token="third")
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertEqual(third, [])
+        self.assertFalse({info.pk for info in first} & {info.pk for info in second})
+        self.assertEqual(SageX3TransactionInformation.objects.filter(claimed_by="first").count(), 3)
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_retry_due_transactions_skips_claimed(self, mocked_post):
+        """
+        The periodic retry leaves alone the due transactions being sent by other workers.
+        """
+        due = timezone.now() - timedelta(minutes=1)
+        claimed = self._create_information(
+            status=SageX3TransactionInformation.PENDING,
+            next_retry_at=due,
+            claimed_by="other-worker",
+            claimed_until=timezone.now() + timedelta(seconds=30),
+        )
+        not_claimed = self._create_information(status=SageX3TransactionInformation.FAILED, next_retry_at=due)
+
+        counters = TransactionService.retry_due_transactions()
+
+        self.assertEqual(counters["total_count"], 1)
+        self.assertEqual(counters["success"], 1)
+        claimed.refresh_from_db()
+        not_claimed.refresh_from_db()
+        self.assertEqual(claimed.status, SageX3TransactionInformation.PENDING)
+        self.assertEqual(not_claimed.status, SageX3TransactionInformation.SUCCESS)
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_retry_sending_transactions_skips_claimed(self, mocked_post):
+        """
+        The retry command leaves alone the transactions being sent by other workers.
+        """
+        self._create_information(
+            status=SageX3TransactionInformation.FAILED,
+            claimed_by="other-worker",
+            claimed_until=timezone.now() + timedelta(seconds=30),
+        )
+        self._create_information(status=SageX3TransactionInformation.FAILED)
+
+        counters = TransactionService.retry_sending_transactions(transaction_id=None)
+
+        self.assertEqual(counters["total_count"], 1)
+        self.assertEqual(counters["success"], 1)
+        self.assertEqual(mocked_post.call_count, 1)
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_expired_claim_of_sent_transaction(self, mocked_post):
+        """
+        A worker whose claim has expired, and meanwhile the transaction was sent by another one, doesn't send it again.
+        """
+        information = self._create_information(status=SageX3TransactionInformation.FAILED)
+        SageX3TransactionInformation.objects.filter(pk=information.pk).update(
+            claimed_by="A", claimed_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertTrue(TransactionService(information.transaction).run_steps_to_send_transaction())
+
+        (result,) = TransactionService.send_transactions([information.transaction], claim_token="A")
+
+        self.assertFalse(result.result)
+        self.assertEqual(mocked_post.call_count, 1)
+        information.refresh_from_db()
+        self.assertEqual(information.status, SageX3TransactionInformation.SUCCESS)
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_send_task_skips_sent_transactions(self, mocked_post):
+        """
+        The batch send task only sends the transactions not yet sent.
+        """
+        sent = self._create_information(status=SageX3TransactionInformation.SUCCESS)
+        pending = self._create_information(status=SageX3TransactionInformation.PENDING)
+
+        send_transactions_to_processor_task([sent.transaction.pk, pending.transaction.pk])
+
+        self.assertEqual(mocked_post.call_count, 1)
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, SageX3TransactionInformation.SUCCESS)
+
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_forced_send_of_sent_transaction(self, mocked_post):
+        """
+        A transaction already sent is only sent again when forced by its `transaction_id`.
+        """
+        information = self._create_information(status=SageX3TransactionInformation.SUCCESS)
+
+        counters = TransactionService.retry_sending_transactions(transaction_id=None)
+        self.assertEqual(counters["total_count"], 0)
+
+        counters = TransactionService.retry_sending_transactions(transaction_id=information.transaction.transaction_id)
+        self.assertEqual(counters["success"], 1)
+        self.assertEqual(mocked_post.call_count, 1)
+
+    @override_settings(TRANSACTION_PROCESSOR_SEND_BATCH_SIZE=1)
+    @mock.patch("requests.Session.post")
+    def test_retry_claims_each_batch(self, mocked_post):
+        """
+        The retry claims each batch just before sending it, so the claims don't expire while the others are sent.
+        """
+        informations = [self._create_information(status=SageX3TransactionInformation.FAILED) for _ in range(2)]
+        claimed_by = []
+
+        def send(*args, **kwargs):
+            claimed_by.append(SageX3TransactionInformation.objects.get(pk=informations[1].pk).claimed_by)
+            return processor_success_response(*args, **kwargs)
+
+        mocked_post.side_effect = send
+        counters = TransactionService.retry_sending_transactions(transaction_id=None)
+
+        self.assertEqual(counters["success"], 2)
+        self.assertIsNone(claimed_by[0])
+        self.assertIsNotNone(claimed_by[1])
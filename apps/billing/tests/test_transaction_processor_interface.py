@@ -18,3 +18,24 @@ class TransactionServiceTestCase(TestCase):
             expected_message="This method needs to be implemented",
         ):
             TransactionProcessorInterface(None).send_transaction_to_processor()
+
+    def test_send_transactions_to_processor(self):
+        """
+        This test ensures the default batch send returns a result per transaction, in their order,
+        with the response or the exception of each send.
+        """
+
+        class EchoProcessor(TransactionProcessorInterface):
+            def send(self, transaction, data):
+                if data == b"error":
+                    raise ValueError("Some error")
+                return data.upper()
+
+        results = EchoProcessor().send_transactions_to_processor(
+            [("t1", b"one"), ("t2", b"error"), ("t3", b"three")], workers=3
+        )
+
+        self.assertEqual([result.item for result in results], ["t1", "t2", "t3"])
+        self.assertEqual(results[0].result, b"ONE")
+        self.assertIsInstance(results[1].exception, ValueError)
+        self.assertEqual(results[2].result, b"THREE")
@@ -1,12 +1,14 @@
 from unittest import mock
 
+from django.db import connection
 from django.test import override_settings
 from django.test.testcases import TestCase
+from django.test.utils import CaptureQueriesContext
 from requests.exceptions import Timeout
 
 from apps.billing.factories import SageX3TransactionInformationFactory, TransactionFactory, TransactionItemFactory
 from apps.billing.mocks import MockResponse
-from apps.billing.models import SageX3TransactionInformation
+from apps.billing.models import SageX3TransactionInformation, Transaction
 from apps.billing.services.transaction_service import TransactionService
 from apps.billing.tests.test_utils import processor_duplicate_error_response, processor_success_response
 
@@ -21,7 +23,7 @@ class TransactionServiceTestCase(TestCase):
     """
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_transaction_to_processor_success(self, mocked_post):
         """
         This test ensures the success result from the processor.
@@ -40,7 +42,7 @@ class TransactionServiceTestCase(TestCase):
         self.assertTrue(document_id.startswith("AAA-"))
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="QWERTY")
-    @mock.patch("requests.post", side_effect=processor_duplicate_error_response)
+    @mock.patch("requests.Session.post", side_effect=processor_duplicate_error_response)
     def test_transaction_to_processor_duplicate_error(self, mocked_post):
         """
         This test ensures the duplicate result from the processor.
@@ -59,7 +61,7 @@ class TransactionServiceTestCase(TestCase):
         self.assertTrue(document_id.startswith("QWERTY-"))
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_run_steps_to_send_transaction(self, mocked_post):
         """
         This test ensures the success triggering the method that runs each step to send a
@@ -73,7 +75,7 @@ class TransactionServiceTestCase(TestCase):
         self.assertEqual(transaction.sage_x3_transaction_information.status, SageX3TransactionInformation.SUCCESS)
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", side_effect=raise_timeout)
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
     def test_transaction_to_processor_timeout_error_log(self, mocked_post):
         """
         This test ensures that the transaction service correctly handles a timeout error from the processor.
@@ -119,7 +121,7 @@ class TransactionServiceTestCase(TestCase):
         )
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", side_effect=raise_timeout)
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
     def test_transaction_to_processor_timeout_error_messages(self, mocked_post):
         """
         This test ensures that the transaction service correctly handles a timeout error from the processor.
@@ -160,7 +162,7 @@ class TransactionServiceTestCase(TestCase):
         )
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", side_effect=raise_timeout)
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
     def test_transaction_to_processor_error_retries_increase(self, mocked_post):
         """
         This test ensures that the retries flag increase when some error occurs when sending
@@ -179,7 +181,7 @@ class TransactionServiceTestCase(TestCase):
         self.assertEqual(transaction.sage_x3_transaction_information.retries, 3)
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", side_effect=raise_timeout)
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
     def test_transaction_to_processor_error_with_input_xml(self, mocked_post):
         """
         This test ensures that in case of error sending to processor we still have the input_xml value.
@@ -197,7 +199,7 @@ class TransactionServiceTestCase(TestCase):
         self.assertEqual(transaction.sage_x3_transaction_information.retries, 1)
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
+    @mock.patch("requests.Session.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
     def test_transaction_to_processor_not_expected_error(self, mocked_post):
         """
         This test ensures the success triggering the method that runs each step to send a
@@ -216,7 +218,32 @@ class TransactionServiceTestCase(TestCase):
         )
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch(
+        "requests.Session.post",
+        return_value=MockResponse(
+            status_code=200,
+            data=b"""<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
+                <soapenv:Body><resultXml/><multiRef><message>Invoice rejected</message></multiRef></soapenv:Body>
+            </soapenv:Envelope>""",
+        ),
+    )
+    def test_transaction_to_processor_without_document_id(self, mocked_post):
+        """
+        A response without the document id, as of a rejected invoice, saves the send as failed.
+        """
+        transaction = TransactionFactory.create(document_id=None)
+        TransactionItemFactory.create(transaction=transaction)
+        self.assertFalse(TransactionService(transaction=transaction).run_steps_to_send_transaction())
+
+        transaction.refresh_from_db()
+        information = SageX3TransactionInformation.objects.get(transaction=transaction)
+        self.assertEqual(information.status, SageX3TransactionInformation.FAILED)
+        self.assertIn("Invoice rejected", information.error_messages)
+        self.assertIn("Invoice rejected", information.output_xml)
+        self.assertIsNone(transaction.document_id)
+
+    @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_transaction_to_processor_log_xml(self, mocked_post):
         """
         This test ensures that the data input xml and output xml is logged.
@@ -240,6 +267,54 @@ class TransactionServiceTestCase(TestCase):
         self.assertIn("Receiving from SageX3 the response", log_message_output)
         self.assertIn("<soapenv:Envelope", log_message_output)
 
+    @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_transaction_to_processor_success_writes(self, mocked_post):
+        """
+        This test ensures a successful send of a transaction loaded with its information
+        does only three small writes: the pending and success status and the document id.
+        """
+        transaction = TransactionFactory.create()
+        TransactionItemFactory.create(transaction=transaction)
+        SageX3TransactionInformationFactory.create(transaction=transaction, status=SageX3TransactionInformation.FAILED)
+        transaction = (
+            Transaction.objects.select_related("sage_x3_transaction_information")
+            .prefetch_related("transaction_items")
+            .get(pk=transaction.pk)
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertTrue(TransactionService(transaction=transaction).run_steps_to_send_transaction())
+
+        queries = [query["sql"] for query in context.captured_queries]
+        writes = [sql for sql in queries if not sql.startswith("SELECT")]
+        self.assertEqual(len(writes), 3, writes)
+        self.assertTrue(all(sql.startswith("UPDATE") for sql in writes))
+        self.assertNotIn('"billing_transaction"."client_name"', writes[2])
+        self.assertEqual(queries, writes)
+
+        transaction.refresh_from_db()
+        self.assertTrue(transaction.document_id.startswith("AAA-"))
+
+    @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
+    def test_transaction_to_processor_error_retries_concurrent_increase(self, mocked_post):
+        """
+        This test ensures the retries incremented by another worker meanwhile aren't lost.
+        """
+        transaction = TransactionFactory.create()
+        information = SageX3TransactionInformationFactory.create(
+            transaction=transaction, status=SageX3TransactionInformation.FAILED, retries=1
+        )
+        transaction_service = TransactionService(transaction=transaction)
+
+        SageX3TransactionInformation.objects.filter(pk=information.pk).update(retries=4)
+        transaction_service.run_steps_to_send_transaction()
+
+        information.refresh_from_db()
+        self.assertEqual(information.retries, 5)
+        self.assertEqual(information.status, SageX3TransactionInformation.FAILED)
+
     def test_sagex3_transaction_info_query_with_transaction_id_FAILED_status(self):
         """
         This test validates the query providing the `transaction_id` of a transaction
@@ -333,8 +408,57 @@ class TransactionServiceTestCase(TestCase):
         self.assertEqual(len(failed_transactions), 10)
         self.assertEqual(len(pending_transactions), 10)
 
+    def test_iterate_retry_candidates_queries_per_chunk(self):
+        """
+        This test validates the retry candidates are loaded with a fixed number of queries per chunk,
+        with their transaction and items and without the xml payloads.
+        """
+
+        for transaction in TransactionFactory.create_batch(5):
+            TransactionItemFactory.create_batch(2, transaction=transaction)
+            SageX3TransactionInformationFactory.create(
+                transaction=transaction, status=SageX3TransactionInformation.FAILED
+            )
+        SageX3TransactionInformationFactory.create(status=SageX3TransactionInformation.SUCCESS)
+
+        claim_token = TransactionService.new_claim_token()
+        with CaptureQueriesContext(connection) as context:
+            candidates = list(
+                TransactionService.iterate_retry_candidates(transaction_id=None, claim_token=claim_token, chunk_size=2)
+            )
+            items = [list(candidate.transaction.transaction_items.all()) for candidate in candidates]
+
+        # each of the 3 chunks is claimed and loaded with its items, then a last query finds no more rows
+        queries = [query["sql"] for query in context.captured_queries if "SAVEPOINT" not in query["sql"]]
+        self.assertEqual(len(queries), 3 * 4 + 1, queries)
+        self.assertEqual(len(candidates), 5)
+        self.assertTrue(all(candidate.claimed_by == claim_token for candidate in candidates))
+        self.assertEqual([len(transaction_items) for transaction_items in items], [2] * 5)
+        for candidate in candidates:
+            self.assertEqual(candidate.get_deferred_fields(), set(SageX3TransactionInformation.PAYLOAD_FIELDS))
+
+    @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
+    def test_retry_transaction_keeps_the_xml_payloads(self, mocked_post):
+        """
+        This test validates retrying a transaction loaded without the xml payloads saves the new payloads.
+        """
+
+        transaction = TransactionFactory.create()
+        TransactionItemFactory.create(transaction=transaction)
+        SageX3TransactionInformationFactory.create(
+            transaction=transaction, status=SageX3TransactionInformation.FAILED, input_xml="old", output_xml="old"
+        )
+
+        TransactionService.retry_sending_transactions(transaction_id=transaction.transaction_id)
+
+        information = SageX3TransactionInformation.objects.get(transaction=transaction)
+        self.assertEqual(information.status, SageX3TransactionInformation.SUCCESS)
+        self.assertIn("<soapenv:Envelope", information.input_xml)
+        self.assertIn("<soapenv:Envelope", information.output_xml)
+
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_retry_transaction_to_processor_success_FAILED_status(self, mocked_post):
         """
         This test validates retry sending transaction resources of a transaction
@@ -363,7 +487,7 @@ class TransactionServiceTestCase(TestCase):
         self.assertEqual(counters["failed"], 0)
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_retry_transaction_to_processor_success_PENDING_status(self, mocked_post):
         """
         This test validates retry sending transaction resources of a transaction
@@ -394,7 +518,7 @@ class TransactionServiceTestCase(TestCase):
         self.assertEqual(counters["failed"], 0)
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", side_effect=processor_duplicate_error_response)
+    @mock.patch("requests.Session.post", side_effect=processor_duplicate_error_response)
     def test_retry_transaction_to_processor_duplicate_error_response(self, mocked_post):
         """
         This test validates retry sending transaction resources when the respose is
@@ -423,7 +547,7 @@ class TransactionServiceTestCase(TestCase):
         self.assertEqual(counters["failed"], 0)
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_retry_transaction_to_processor_success_without_transaction_id(self, mocked_post):
         """
         This test validates retry sending transaction resources without providing a `transaction_id`
@@ -471,7 +595,7 @@ class TransactionServiceTestCase(TestCase):
         self.assertEqual(counters["failed"], 0)
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
+    @mock.patch("requests.Session.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
     def test_retry_transaction_to_processor_error_PENDING_status(self, mocked_post):
         """
         This test validates retry sending transaction resources of a transaction
@@ -502,7 +626,7 @@ class TransactionServiceTestCase(TestCase):
         self.assertEqual(counters["failed"], 1)
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
+    @mock.patch("requests.Session.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
     def test_retry_transaction_to_processor_error_FAILED_status(self, mocked_post):
         """
         This test validates retry sending transaction resources of a transaction
@@ -531,7 +655,7 @@ class TransactionServiceTestCase(TestCase):
         self.assertEqual(counters["failed"], 1)
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
+    @mock.patch("requests.Session.post", return_value=MockResponse(status_code=500, data="Some not expected error"))
     def test_retry_transaction_to_processor_error_without_transaction_id(self, mocked_post):
         """
         This test validates retry sending transaction resources without providing a `transaction_id`
@@ -580,7 +704,7 @@ class TransactionServiceTestCase(TestCase):
         self.assertEqual(counters["failed"], 20)
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com", DEFAULT_SERIES="AAA")
-    @mock.patch("requests.post", side_effect=processor_success_response)
+    @mock.patch("requests.Session.post", side_effect=processor_success_response)
     def test_retry_transaction_to_processor_no_transactions(self, mocked_post):
         """
         This test validates retry sending transaction resources without transactions
@@ -594,7 +718,7 @@ class TransactionServiceTestCase(TestCase):
         self.assertEqual(counters["failed"], 0)
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", side_effect=raise_timeout)
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
     def test_retry_transaction_to_processor_timeout_FAILED_status(self, mocked_post):
         """
         This test validates retry sending transaction resources of a transaction
@@ -623,7 +747,7 @@ class TransactionServiceTestCase(TestCase):
         self.assertEqual(counters["failed"], 1)
 
     @override_settings(TRANSACTION_PROCESSOR_URL="http://fake-processor.com")
-    @mock.patch("requests.post", side_effect=raise_timeout)
+    @mock.patch("requests.Session.post", side_effect=raise_timeout)
     def test_retry_transaction_to_processor_timeout_PENDIND_status(self, mocked_post):
         """
         This test validates retry sending transaction resources of a transaction
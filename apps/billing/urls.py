@@ -8,9 +8,24 @@ urlpatterns = [
         views.ProcessTransaction.as_view(),
         name="transaction_complete",
     ),
+    path(
+        "transaction-complete/bulk/",
+        views.ProcessTransactionBulk.as_view(),
+        name="transaction_complete_bulk",
+    ),
+    path(
+        "receipt-link/bulk/",
+        views.get_receipt_links_bulk,
+        name="get_receipt_links_bulk",
+    ),
     path(
         "receipt-link/<str:transaction_id>/",
         views.get_receipt_link,
         name="get_receipt_link",
     ),
+    path(
+        "processor-status/",
+        views.get_processor_status,
+        name="get_processor_status",
+    ),
 ]
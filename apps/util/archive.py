@@ -0,0 +1,34 @@
+import zipfile
+from tempfile import SpooledTemporaryFile
+from typing import Iterable
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+# the bundles are kept in memory up to this size, the bigger ones are spooled to a temporary file
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+
+def write_bundle(name: str, entries: Iterable[tuple[str, str | bytes]]) -> str:
+    """
+    Write the entries, pairs of name and content, to a zip bundle saved on the default storage.
+
+    The entries are compressed one by one while they are iterated, so they don't need to be
+    all in memory. It returns the key of the bundle on the storage, that can differ from `name`.
+    """
+    with SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+        with zipfile.ZipFile(spool, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+            for entry_name, content in entries:
+                bundle.writestr(entry_name, content)
+        spool.seek(0)
+        return default_storage.save(name, File(spool, name=name))
+
+
+def read_bundle(key: str, entry_names: Iterable[str]) -> dict[str, bytes]:
+    """
+    Read some entries of a zip bundle saved on the default storage with `write_bundle`,
+    the entries that aren't on the bundle are missing from the returned dict.
+    """
+    with default_storage.open(key, "rb") as f, zipfile.ZipFile(f) as bundle:
+        names = set(bundle.namelist())
+        return {entry_name: bundle.read(entry_name) for entry_name in entry_names if entry_name in names}
@@ -0,0 +1,133 @@
+import logging
+import time
+
+from django.core.cache import caches
+
+log = logging.getLogger(__name__)
+
+
+class CircuitBreakerOpenError(Exception):
+    """
+    Raised when a call isn't made because the circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker whose state is kept on a Django cache, so it is shared by all the processes using that cache.
+
+    After `failure_threshold` consecutive failures the circuit opens and the calls are refused without being made.
+    When `reset_timeout` seconds have passed the circuit is half open: a single call is allowed as a probe,
+    if it succeeds the circuit closes, otherwise it opens again for another `reset_timeout` seconds.
+    A `failure_threshold` of 0 disables the circuit breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: int,
+        probe_timeout: int | None = None,
+        cache_alias: str = "default",
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # if the probe never reports back, another one is allowed after this timeout
+        self.probe_timeout = probe_timeout or reset_timeout
+        self.__cache = caches[cache_alias]
+        self.__failures_key = f"circuit_breaker:{name}:failures"
+        self.__opened_at_key = f"circuit_breaker:{name}:opened_at"
+        self.__probe_key = f"circuit_breaker:{name}:probe"
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    @property
+    def state(self) -> str:
+        return self.__state(self.__cache.get(self.__opened_at_key))
+
+    def __state(self, opened_at: float | None) -> str:
+        if opened_at is None:
+            return self.CLOSED
+        if time.time() - opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow_request(self) -> bool:
+        """
+        If a call can be made now, on a half open circuit only the first caller is allowed to probe.
+        """
+        if not self.enabled:
+            return True
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and self.__cache.add(self.__probe_key, True, timeout=self.probe_timeout):
+            log.info("Circuit breaker %s is half open, probing with a call", self.name)
+            return True
+        return False
+
+    def record_success(self) -> None:
+        """
+        A call has succeeded, so the circuit is closed and the consecutive failures are forgotten.
+        """
+        if not self.enabled:
+            return
+        if self.__cache.get(self.__opened_at_key) is not None:
+            log.warning("Circuit breaker %s is closed", self.name)
+        self.__cache.delete_many([self.__failures_key, self.__opened_at_key, self.__probe_key])
+
+    def record_failure(self) -> None:
+        """
+        A call has failed, the circuit opens when the consecutive failures reach the threshold
+        or when the probe of a half open circuit has failed.
+
+        The failures of the calls made before the circuit opened, and still in flight, don't extend the time
+        it is open, only the closed to open and the half open to open transitions set when it was opened.
+        """
+        if not self.enabled:
+            return
+        opened_at = self.__cache.get(self.__opened_at_key)
+        if opened_at is not None:
+            if self.__state(opened_at) == self.HALF_OPEN:
+                self.__open()
+            return
+        self.__cache.add(self.__failures_key, 0, timeout=None)
+        try:
+            failures = self.__cache.incr(self.__failures_key)
+        except ValueError:
+            # the key has expired or was evicted meanwhile
+            self.__cache.set(self.__failures_key, 1, timeout=None)
+            failures = 1
+        if failures >= self.failure_threshold:
+            # added, so the concurrent failures reaching the threshold open the circuit only once
+            self.__open(reopen=False)
+
+    def __open(self, reopen: bool = True) -> None:
+        if reopen:
+            self.__cache.set(self.__opened_at_key, time.time(), timeout=None)
+        elif not self.__cache.add(self.__opened_at_key, time.time(), timeout=None):
+            return
+        self.__cache.delete(self.__probe_key)
+        log.warning("Circuit breaker %s is open for %s seconds", self.name, self.reset_timeout)
+
+    def status(self) -> dict:
+        """
+        The current state of the circuit breaker, as a json serializable dict.
+        """
+        opened_at = self.__cache.get(self.__opened_at_key)
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "state": self.__state(opened_at),
+            "consecutive_failures": self.__cache.get(self.__failures_key, 0),
+            "failure_threshold": self.failure_threshold,
+            "opened_at": opened_at,
+            "reset_timeout": self.reset_timeout,
+        }
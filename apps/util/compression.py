@@ -0,0 +1,26 @@
+import zlib
+
+# a good balance for xml, higher levels are much slower for a few bytes less
+COMPRESSION_LEVEL = 6
+
+
+def compress_text(value: str | bytes | None) -> bytes | None:
+    """
+    Compress a text with zlib, to be stored on a binary field.
+    A text already encoded as `bytes` must be encoded with utf-8.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return zlib.compress(value, COMPRESSION_LEVEL)
+
+
+def decompress_text(value: bytes | memoryview | None) -> str | None:
+    """
+    Decompress a text compressed with `compress_text`,
+    the database drivers can return the binary fields as `bytes` or `memoryview`.
+    """
+    if value is None:
+        return None
+    return zlib.decompress(value).decode("utf-8")
@@ -0,0 +1,93 @@
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from django.db import connections
+
+
+@dataclass
+class TaskResult:
+    """
+    The outcome of running a function on an item with `run_concurrently`.
+    """
+
+    item: Any
+    result: Any = None
+    exception: Optional[BaseException] = None
+    elapsed: float = 0.0
+
+
+def _run_task(func: Callable, item: Any) -> TaskResult:
+    """
+    Run `func` on `item`, capturing its result or exception and how long it took.
+    """
+    start = time.perf_counter()
+    try:
+        return TaskResult(item=item, result=func(item), elapsed=time.perf_counter() - start)
+    except Exception as e:
+        return TaskResult(item=item, exception=e, elapsed=time.perf_counter() - start)
+
+
+def _close_connections(thread_connections: list) -> None:
+    """
+    Close the database connections of the worker threads, once the threads have exited.
+
+    The connections are per thread, so they are reused by all the tasks of a worker thread
+    and are only closed, from the calling thread, after the pool has been shut down.
+    """
+    for connection in thread_connections:
+        connection.inc_thread_sharing()
+        try:
+            connection.close()
+        finally:
+            connection.dec_thread_sharing()
+
+
+def run_concurrently(
+    func: Callable, items: Iterable, workers: int = 1, max_in_flight: Optional[int] = None
+) -> Iterator[TaskResult]:
+    """
+    Run `func` for each of the `items` on a pool of `workers` threads, yielding a `TaskResult` as each one finishes.
+
+    At most `max_in_flight` items are submitted to the pool at any time, by default the number of workers,
+    so the items are consumed lazily and a large backlog is never queued in memory at once.
+    With a single worker the items are run in order on the calling thread.
+    """
+    if workers <= 1:
+        for item in items:
+            yield _run_task(func, item)
+        return
+
+    max_in_flight = max_in_flight or workers
+    thread_connections = []
+    try:
+        with ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="run_concurrently",
+            # the database connections of each worker thread, created lazily when first used
+            initializer=lambda: thread_connections.extend(connections.all()),
+        ) as executor:
+            pending = set()
+            for item in items:
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(executor.submit(_run_task, func, item))
+
+            for future in as_completed(pending):
+                yield future.result()
+    finally:
+        _close_connections(thread_connections)
+
+
+def percentile(sorted_values: list[float], percent: int) -> float:
+    """
+    The nearest-rank percentile of the already sorted values, 0 when there aren't any.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(percent / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
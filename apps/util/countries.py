@@ -0,0 +1,25 @@
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping
+
+from django.utils import translation
+from django_countries import countries
+
+
+@lru_cache(maxsize=None)
+def country_names(language: str) -> Mapping[str, str]:
+    """
+    The read-only map of the country codes to the names of the countries in `language`.
+
+    It is built once per process and language, so resolving a name doesn't activate the translation
+    catalog nor evaluate the lazy translations of `django_countries` each time.
+    """
+    with translation.override(language):
+        return MappingProxyType({code: str(name) for code, name in countries})
+
+
+def country_name(code, language: str) -> str:
+    """
+    The name of the country in `language`, empty for an empty or unknown country code.
+    """
+    return country_names(language).get(str(code or ""), "")
@@ -0,0 +1,60 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+_sessions: dict[str, tuple[int, requests.Session]] = {}
+_sessions_lock = threading.Lock()
+
+
+def build_pooled_session(pool_size: int, connect_retries: int, backoff_factor: float = 0.5) -> requests.Session:
+    """
+    Build a `requests.Session` with a bounded keep-alive connection pool.
+
+    Only the failures establishing a connection are retried, because on those the request
+    has never reached the server, so it is safe to retry even non idempotent methods like POST.
+    """
+    retry = Retry(
+        total=connect_retries,
+        connect=connect_retries,
+        read=0,
+        redirect=0,
+        status=0,
+        other=0,
+        backoff_factor=backoff_factor,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_pooled_session(name: str, pool_size: int, connect_retries: int) -> requests.Session:
+    """
+    Return the process wide session identified by `name`, creating it on the first call.
+
+    The session is shared by all the threads of the process, and it is recreated after a fork,
+    so the celery worker processes don't share the sockets of their parent.
+    """
+    pid = os.getpid()
+    with _sessions_lock:
+        entry = _sessions.get(name)
+        if entry is None or entry[0] != pid:
+            entry = (pid, build_pooled_session(pool_size=pool_size, connect_retries=connect_retries))
+            _sessions[name] = entry
+        return entry[1]
+
+
+def close_pooled_sessions() -> None:
+    """
+    Close and forget all the process wide sessions.
+    """
+    with _sessions_lock:
+        for pid, session in _sessions.values():
+            if pid == os.getpid():
+                session.close()
+        _sessions.clear()
@@ -0,0 +1,164 @@
+import gzip
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+log = logging.getLogger(__name__)
+
+# the suffix of the spool files, while being written they also have the `OPEN_SUFFIX`
+SPOOL_SUFFIX = ".jsonl.gz"
+OPEN_SUFFIX = ".open"
+
+
+class SpoolWriter:
+    """
+    Appends records, as json lines, to rotating gzip compressed files on a local directory.
+
+    Each record is written as its own gzip member and flushed, so a file can always be read up to
+    its last record, even if the process dies. The file being written has the `OPEN_SUFFIX`,
+    that is removed when the file is rotated, after `max_records` records or `max_age` seconds,
+    or closed. The files are named by their creation time, host and process, so many processes
+    can write to the same directory, and sorting them by name sorts them by creation time.
+    The writer is thread safe.
+    """
+
+    def __init__(
+        self, directory: str | Path, prefix: str, max_records: int = 1000, max_age: float = 3600, fsync: bool = True
+    ) -> None:
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.max_records = max_records
+        self.max_age = max_age
+        self.fsync = fsync
+        self.__lock = threading.Lock()
+        self.__file = None
+        self.__path: Path | None = None
+        self.__pid = None
+        self.__records = 0
+        self.__opened_at = 0.0
+        self.__sequence = 0
+
+    def write(self, record: dict) -> Path:
+        """
+        Append the record to the current spool file, returning the path of the file once closed.
+        """
+        line = json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+        member = gzip.compress(line)
+        with self.__lock:
+            if self.__file is not None and (
+                self.__pid != os.getpid()
+                or self.__records >= self.max_records
+                or time.monotonic() - self.__opened_at >= self.max_age
+            ):
+                self.__close()
+            if self.__file is None:
+                self.__open()
+            self.__file.write(member)
+            self.__file.flush()
+            if self.fsync:
+                os.fsync(self.__file.fileno())
+            self.__records += 1
+            return self.__path
+
+    def rotate(self) -> None:
+        """
+        Close the current spool file, if any, so it can be replayed. The next record starts a new one.
+        """
+        with self.__lock:
+            self.__close()
+
+    def close(self) -> None:
+        """
+        Close the current spool file, as when the process stops.
+        """
+        self.rotate()
+
+    def __open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.__sequence += 1
+        created_at = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        name = f"{self.prefix}-{created_at}-{socket.gethostname()}-{os.getpid()}-{self.__sequence}{SPOOL_SUFFIX}"
+        self.__path = self.directory / name
+        self.__file = open(self.__path.with_name(name + OPEN_SUFFIX), "ab")
+        self.__pid = os.getpid()
+        self.__records = 0
+        self.__opened_at = time.monotonic()
+
+    def __close(self) -> None:
+        if self.__file is None:
+            return
+        if self.__pid == os.getpid():
+            self.__file.close()
+            try:
+                os.replace(self.__path.with_name(self.__path.name + OPEN_SUFFIX), self.__path)
+            except FileNotFoundError:
+                # the file was already replayed, as it was idle for longer than `max_age`
+                log.info("The spool file %s was replayed before being closed", self.__path)
+        # a file inherited from the parent process is left to the parent
+        self.__file = None
+        self.__path = None
+
+
+def _is_abandoned(path: Path, prefix: str, max_age: float | None) -> bool:
+    """
+    If the open spool file won't be written anymore, as its writer process, on this host, is no longer running,
+    or it hasn't been written for `max_age` seconds, after which its writer rotates it before writing again.
+    """
+    try:
+        if max_age is not None and time.time() - path.stat().st_mtime >= max_age:
+            return True
+        # the name ends with the host, the process id and the sequence, and the host may have dashes
+        name = path.name.removeprefix(f"{prefix}-").removesuffix(SPOOL_SUFFIX + OPEN_SUFFIX)
+        host, pid, _ = name.split("-", 1)[1].rsplit("-", 2)
+        if host != socket.gethostname():
+            return False
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (OSError, ValueError):
+        # closed meanwhile, not named by a writer or its process is running as another user
+        return False
+    return False
+
+
+def spool_files(
+    directory: str | Path, prefix: str, include_open: bool = False, max_age: float | None = None
+) -> list[Path]:
+    """
+    The spool files of the directory, the oldest first.
+
+    The files still open are only included with `include_open`, or when abandoned: their writer processes,
+    on this host, are no longer running, like when killed, or they have been idle for `max_age` seconds.
+    """
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    files = []
+    for path in directory.iterdir():
+        if not path.name.startswith(f"{prefix}-"):
+            continue
+        if path.name.endswith(SPOOL_SUFFIX):
+            files.append(path)
+        elif path.name.endswith(SPOOL_SUFFIX + OPEN_SUFFIX) and (include_open or _is_abandoned(path, prefix, max_age)):
+            files.append(path)
+    return sorted(files)
+
+
+def read_spool(path: str | Path) -> Iterator[dict]:
+    """
+    Iterate over the records of a spool file, streaming it.
+
+    The last record of a file whose writer died while writing it is truncated, and is skipped.
+    """
+    with gzip.open(path, "rb") as f:
+        try:
+            for line in f:
+                yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+            log.warning("The spool file %s ends with a truncated record, e=%s", path, e)
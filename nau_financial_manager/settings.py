@@ -183,6 +183,20 @@ CELERY_TASK_SERIALIZER = CONFIG.get("CELERY_TASK_SERIALIZER", "json")
 CELERY_RESULT_SERIALIZER = CONFIG.get("CELERY_RESULT_SERIALIZER", "json")
 CELERY_RESULTS_EXTENDED = CONFIG.get("CELERY_RESULTS_EXTENDED", True)
 CELERY_BEAT_SCHEDULER = CONFIG.get("CELERY_BEAT_SCHEDULER", "django_celery_beat.schedulers:DatabaseScheduler")
+# The periodic tasks, the database scheduler stores them on the first run of celery beat
+CELERY_BEAT_SCHEDULE = CONFIG.get(
+    "CELERY_BEAT_SCHEDULE",
+    {
+        "retry-due-transactions": {
+            "task": "apps.billing.tasks.retry_due_transactions_task",
+            "schedule": CONFIG.get("TRANSACTION_RETRY_INTERVAL", 60),
+        },
+        "archive-transaction-payloads": {
+            "task": "apps.billing.tasks.archive_transaction_payloads_task",
+            "schedule": CONFIG.get("TRANSACTION_PAYLOAD_ARCHIVE_INTERVAL", 24 * 60 * 60),
+        },
+    },
+)
 # WORKAROUND TO CELERY USING MYSQL
 DJANGO_CELERY_RESULTS_TASK_ID_MAX_LENGTH = 191
 
@@ -270,6 +284,8 @@ EMAIL_SSL_CERTFILE = CONFIG.get("EMAIL_SSL_CERTFILE", "")
 FILE_PATH_LINK = CONFIG.get("FILE_PATH_LINK", "")
 
 # Sage X3 - Transaction processor settings
+# The class of the transaction processor, a single instance is built per process
+TRANSACTION_PROCESSOR = CONFIG.get("TRANSACTION_PROCESSOR", "apps.billing.services.processor_service.SageX3Processor")
 TRANSACTION_PROCESSOR_URL = CONFIG.get("TRANSACTION_PROCESSOR_URL", "")
 POOL_ALIAS = CONFIG.get("POOL_ALIAS", "WSTEST")
 IVA_VACITM1_FIELD = CONFIG.get("IVA_VACITM1_FIELD", "NOR")
@@ -277,16 +293,90 @@ GEOGRAPHIC_ACTIVITY_VACBPR_FIELD = CONFIG.get("GEOGRAPHIC_ACTIVITY_VACBPR_FIELD"
 USER_PROCESSOR_AUTH = CONFIG.get("USER_PROCESSOR_AUTH", "")
 USER_PROCESSOR_PASSWORD = CONFIG.get("USER_PROCESSOR_PASSWORD", "")
 DEFAULT_SERIES = CONFIG.get("DEFAULT_SERIES", "FRN")
+# The HTTP connection pool used to call the transaction processor, the timeouts are in seconds
+TRANSACTION_PROCESSOR_POOL_SIZE = CONFIG.get("TRANSACTION_PROCESSOR_POOL_SIZE", 10)
+TRANSACTION_PROCESSOR_CONNECT_TIMEOUT = CONFIG.get("TRANSACTION_PROCESSOR_CONNECT_TIMEOUT", 5)
+TRANSACTION_PROCESSOR_READ_TIMEOUT = CONFIG.get("TRANSACTION_PROCESSOR_READ_TIMEOUT", 60)
+# Number of retries when failing to connect to the transaction processor
+TRANSACTION_PROCESSOR_CONNECT_RETRIES = CONFIG.get("TRANSACTION_PROCESSOR_CONNECT_RETRIES", 3)
+# Number of consecutive failures calling the transaction processor that open its circuit breaker, 0 to disable it
+TRANSACTION_PROCESSOR_CIRCUIT_BREAKER_FAILURE_THRESHOLD = CONFIG.get(
+    "TRANSACTION_PROCESSOR_CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5
+)
+# Seconds that the circuit breaker stays open before probing the transaction processor again
+TRANSACTION_PROCESSOR_CIRCUIT_BREAKER_RESET_TIMEOUT = CONFIG.get(
+    "TRANSACTION_PROCESSOR_CIRCUIT_BREAKER_RESET_TIMEOUT", 60
+)
+# Number of transactions sent concurrently to the transaction processor, on each batch
+TRANSACTION_PROCESSOR_SEND_WORKERS = CONFIG.get("TRANSACTION_PROCESSOR_SEND_WORKERS", 4)
+# Number of transactions retried on each batch sent to the transaction processor
+TRANSACTION_PROCESSOR_SEND_BATCH_SIZE = CONFIG.get("TRANSACTION_PROCESSOR_SEND_BATCH_SIZE", 50)
+# Seconds that a worker keeps a transaction claimed while sending it, after which other workers can send it
+TRANSACTION_PROCESSOR_CLAIM_TIMEOUT = CONFIG.get("TRANSACTION_PROCESSOR_CLAIM_TIMEOUT", 300)
+# Number of transactions loaded per query when retrying the sends to the transaction processor
+TRANSACTION_RETRY_CHUNK_SIZE = CONFIG.get("TRANSACTION_RETRY_CHUNK_SIZE", 500)
+# Seconds to wait before automatically retrying a failed send, doubled on each failed retry
+TRANSACTION_RETRY_BACKOFF_BASE = CONFIG.get("TRANSACTION_RETRY_BACKOFF_BASE", 300)
+# Maximum seconds to wait before automatically retrying a failed send
+TRANSACTION_RETRY_BACKOFF_MAX = CONFIG.get("TRANSACTION_RETRY_BACKOFF_MAX", 6 * 60 * 60)
+# Number of failed retries after which a send is moved to dead letter, and isn't automatically retried anymore
+TRANSACTION_RETRY_MAX_ATTEMPTS = CONFIG.get("TRANSACTION_RETRY_MAX_ATTEMPTS", 10)
+# Maximum number of transactions retried by each run of the periodic retry task
+TRANSACTION_RETRY_BATCH_SIZE = CONFIG.get("TRANSACTION_RETRY_BATCH_SIZE", 100)
+# Days after a successful send when its xml payloads are archived from the database to the default storage
+TRANSACTION_PAYLOAD_ARCHIVE_AGE_DAYS = CONFIG.get("TRANSACTION_PAYLOAD_ARCHIVE_AGE_DAYS", 90)
+# Number of transactions whose xml payloads are archived on each bundle
+TRANSACTION_PAYLOAD_ARCHIVE_BATCH_SIZE = CONFIG.get("TRANSACTION_PAYLOAD_ARCHIVE_BATCH_SIZE", 500)
+# Path on the default storage where the archive bundles are saved
+TRANSACTION_PAYLOAD_ARCHIVE_PREFIX = CONFIG.get("TRANSACTION_PAYLOAD_ARCHIVE_PREFIX", "sagex3-payloads")
+# The local directory where the spool processor writes the transactions, instead of sending them
+TRANSACTION_SPOOL_DIR = CONFIG.get("TRANSACTION_SPOOL_DIR", f"{BASE_DIR}/spool")
+# Number of transactions and seconds after which the spool processor starts a new spool file
+TRANSACTION_SPOOL_MAX_RECORDS = CONFIG.get("TRANSACTION_SPOOL_MAX_RECORDS", 1000)
+TRANSACTION_SPOOL_MAX_AGE = CONFIG.get("TRANSACTION_SPOOL_MAX_AGE", 60 * 60)
+# Sync each transaction written by the spool processor to the disk, so none is lost if the machine stops
+TRANSACTION_SPOOL_FSYNC = CONFIG.get("TRANSACTION_SPOOL_FSYNC", True)
+# The class of the transaction processor that sends the spooled transactions when replayed
+TRANSACTION_SPOOL_REPLAY_PROCESSOR = CONFIG.get(
+    "TRANSACTION_SPOOL_REPLAY_PROCESSOR", "apps.billing.services.processor_service.SageX3Processor"
+)
 
 # iLink - Receipt host information
 RECEIPT_HOST_URL = CONFIG.get("RECEIPT_HOST_URL", "")
 RECEIPT_ENTITY_PUBLIC_KEY = CONFIG.get("RECEIPT_ENTITY_PUBLIC_KEY", "")
 RECEIPT_BEARER_TOKEN = CONFIG.get("RECEIPT_BEARER_TOKEN", "")
+# The HTTP connection pool used to call the receipt host, the timeouts are in seconds
+RECEIPT_HOST_POOL_SIZE = CONFIG.get("RECEIPT_HOST_POOL_SIZE", 10)
+RECEIPT_HOST_CONNECT_TIMEOUT = CONFIG.get("RECEIPT_HOST_CONNECT_TIMEOUT", 3)
+RECEIPT_HOST_READ_TIMEOUT = CONFIG.get("RECEIPT_HOST_READ_TIMEOUT", 10)
+# Number of retries when failing to connect to the receipt host
+RECEIPT_HOST_CONNECT_RETRIES = CONFIG.get("RECEIPT_HOST_CONNECT_RETRIES", 2)
+# Seconds that the links of the documents on the receipt host are cached
+RECEIPT_LINK_CACHE_TIMEOUT = CONFIG.get("RECEIPT_LINK_CACHE_TIMEOUT", 60 * 60)
+# Seconds that a document not found on the receipt host is cached, as the ones not published yet
+RECEIPT_LINK_NOT_FOUND_CACHE_TIMEOUT = CONFIG.get("RECEIPT_LINK_NOT_FOUND_CACHE_TIMEOUT", 30)
+# Seconds to wait before retrying to resolve the receipt link of a sent transaction, doubled on each retry
+RECEIPT_LINK_RESOLVE_BACKOFF_BASE = CONFIG.get("RECEIPT_LINK_RESOLVE_BACKOFF_BASE", 60)
+# Maximum seconds to wait before retrying to resolve the receipt link of a sent transaction
+RECEIPT_LINK_RESOLVE_BACKOFF_MAX = CONFIG.get("RECEIPT_LINK_RESOLVE_BACKOFF_MAX", 60 * 60)
+# Number of attempts to resolve the receipt link of a sent transaction, after that it is resolved when requested
+RECEIPT_LINK_RESOLVE_MAX_ATTEMPTS = CONFIG.get("RECEIPT_LINK_RESOLVE_MAX_ATTEMPTS", 10)
+# Seconds that the errors of the receipt host are cached, so the lookups waiting for the failed call fail with it
+RECEIPT_LINK_ERROR_CACHE_TIMEOUT = CONFIG.get("RECEIPT_LINK_ERROR_CACHE_TIMEOUT", 5)
+# Seconds between the checks of the cache while waiting for the link of a document
+RECEIPT_LINK_WAIT_INTERVAL = CONFIG.get("RECEIPT_LINK_WAIT_INTERVAL", 0.05)
+# Maximum number of transaction ids accepted on a single request of the bulk receipt link api
+RECEIPT_LINK_BULK_MAX_SIZE = CONFIG.get("RECEIPT_LINK_BULK_MAX_SIZE", 100)
+# Number of receipt links got concurrently from the receipt host, on each request of the bulk receipt link api
+RECEIPT_LINK_BULK_WORKERS = CONFIG.get("RECEIPT_LINK_BULK_WORKERS", 8)
 
 SWAGGER_PROJECT_NAME = CONFIG.get("SWAGGER_PROJECT_NAME", "Nau Financial Manager")
 SWAGGER_PROJECT_VERSION = CONFIG.get("SWAGGER_PROJECT_VERSION", "1.0.0")
 SWAGGER_DESCRIPTION = CONFIG.get("SWAGGER_DESCRIPTION", "API for Nau Financial Manager")
 
+# Maximum number of transactions accepted on a single request of the bulk transaction api
+TRANSACTION_BULK_MAX_SIZE = CONFIG.get("TRANSACTION_BULK_MAX_SIZE", 500)
+
 # VAT / IVA
 VAT_TAX_RATE = CONFIG.get("VAT_TAX_RATE", 0.23)
 
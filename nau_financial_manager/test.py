@@ -7,3 +7,16 @@ DATABASES = {
         "ATOMIC_REQUESTS": True,
     },
 }
+
+# Run the celery tasks locally, without a broker
+CELERY_TASK_ALWAYS_EAGER = True
+
+# Use a local memory cache, without a Redis server
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+
+# The circuit breaker state would be shared between the tests, it is enabled only on its own tests
+TRANSACTION_PROCESSOR_CIRCUIT_BREAKER_FAILURE_THRESHOLD = 0